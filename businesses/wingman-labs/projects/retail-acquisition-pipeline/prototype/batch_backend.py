@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Message Batches Backend
+
+Offline email personalization through the Anthropic Message Batches API:
+every prompt is submitted as one asynchronous batch job, polled until it
+ends, and results are mapped back to retailer_id. Batches cost less than
+interactive calls and don't compete with the interactive rate limit, so
+this is the backend for large nightly runs.
+
+For local runs point ANTHROPIC_BASE_URL at stub_anthropic.py.
+"""
+
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from email_generator import EmailGenerator, EmailOutput, TokenUsage
+
+# API limit is 100,000 requests (and 256 MB) per batch
+MAX_BATCH_REQUESTS = 10000
+
+CUSTOM_ID_PATTERN = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+
+
+# SDK retries for batch create/retrieve/results calls
+BATCH_API_RETRIES = 3
+
+
+class BatchError(Exception):
+    """A batch that could not be submitted or did not finish in time."""
+
+
+class MessageBatchBackend:
+    """Submits, polls and collects email generation batches."""
+
+    def __init__(
+        self,
+        generator: EmailGenerator,
+        poll_interval: float = 30,
+        timeout_hours: float = 24
+    ):
+        if not generator.client:
+            raise BatchError("Message Batches need an Anthropic API key")
+        self.generator = generator
+        # Batch calls don't go through the generator's backoff loop, so
+        # they keep the SDK's own retries
+        self.client = generator.client.with_options(max_retries=BATCH_API_RETRIES)
+        self.poll_interval = poll_interval
+        self.timeout_seconds = timeout_hours * 3600
+
+    def submit(self, retailers: List[Dict], **sender) -> List[str]:
+        """
+        Submit one batch per MAX_BATCH_REQUESTS retailers.
+
+        Args:
+            retailers: Retailer dicts; each needs a retailer_id
+            **sender: Optional sender_name / sender_title / company
+
+        Returns:
+            Batch ids, in submission order
+        """
+        sender_args = {
+            "sender_name": sender.get("sender_name", "Alex"),
+            "sender_title": sender.get("sender_title", "Partnerships"),
+            "company": sender.get("company", "Wingman Labs")
+        }
+
+        batch_ids = []
+        for start in range(0, len(retailers), MAX_BATCH_REQUESTS):
+            chunk = retailers[start:start + MAX_BATCH_REQUESTS]
+            requests = [
+                {
+                    "custom_id": self._custom_id(r['retailer_id']),
+                    "params": self.generator._build_ai_request(
+                        self.generator._build_context(r), **sender_args
+                    )
+                }
+                for r in chunk
+            ]
+            batch = self.client.messages.batches.create(requests=requests)
+            print(f"Submitted batch {batch.id} with {len(requests)} requests")
+            batch_ids.append(batch.id)
+
+        return batch_ids
+
+    def wait(self, batch_id: str):
+        """Poll until the batch has ended."""
+        deadline = time.time() + self.timeout_seconds
+
+        while True:
+            batch = self.client.messages.batches.retrieve(batch_id)
+            counts = batch.request_counts
+            if batch.processing_status == "ended":
+                print(f"Batch {batch_id} ended: {counts.succeeded} succeeded, "
+                      f"{counts.errored} errored, {counts.expired} expired")
+                return batch
+
+            if time.time() > deadline:
+                raise BatchError(f"Batch {batch_id} still {batch.processing_status} after timeout")
+
+            print(f"Batch {batch_id} {batch.processing_status}: {counts.processing} processing")
+            time.sleep(self.poll_interval)
+
+    def collect(
+        self,
+        batch_id: str,
+        on_result: Optional[Callable[[str, EmailOutput], None]] = None
+    ) -> Dict[str, EmailOutput]:
+        """
+        Parse a finished batch's results.
+
+        Returns:
+            EmailOutput per custom_id (the retailer_id) for every request
+            that succeeded; errored/expired requests are reported and left
+            out so the caller can retry them
+        """
+        emails = {}
+        failed = 0
+
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type != "succeeded":
+                failed += 1
+                continue
+
+            self.generator.record_usage(entry.result.message.usage, batch=True)
+            email = self.generator.email_from_message(entry.result.message)
+            if email is None:
+                # Invalid output: left out, so the caller retries it interactively
+                failed += 1
+                continue
+
+            emails[entry.custom_id] = email
+            if on_result:
+                on_result(entry.custom_id, email)
+
+        if failed:
+            print(f"  {failed} requests in batch {batch_id} did not succeed")
+        return emails
+
+    def generate(
+        self,
+        retailers: List[Dict],
+        batch_ids: Optional[List[str]] = None,
+        on_submitted: Optional[Callable[[List[str]], None]] = None,
+        on_result: Optional[Callable[[str, EmailOutput], None]] = None
+    ) -> Dict[str, EmailOutput]:
+        """
+        Submit (unless batch_ids are given), wait, and collect.
+
+        Retailers with a cached email (see EmailGenerator.cache) are
+        answered from the cache and left out of the batch; batch results
+        are added to the cache.
+
+        on_submitted receives the new batch ids right after submission so
+        a caller can persist them and resume polling instead of paying for
+        a second batch.
+        """
+        emails = {}
+        by_id = {r['retailer_id']: r for r in retailers}
+
+        def deliver(retailer_id: str, email: EmailOutput):
+            emails[retailer_id] = email
+            if on_result:
+                on_result(retailer_id, email)
+
+        if not batch_ids:
+            uncached = []
+            for retailer in retailers:
+                cached = self.generator.cached_email(retailer)
+                if cached:
+                    deliver(retailer['retailer_id'], cached)
+                else:
+                    uncached.append(retailer)
+            if emails:
+                print(f"  {len(emails)} emails served from cache")
+            if not uncached:
+                return emails
+
+            batch_ids = self.submit(uncached)
+            if on_submitted:
+                on_submitted(batch_ids)
+
+        def store(retailer_id: str, email: EmailOutput):
+            if retailer_id in by_id:
+                self.generator.cache_email(by_id[retailer_id], email)
+            deliver(retailer_id, email)
+
+        usage_before = TokenUsage(**self.generator.usage.__dict__)
+        for batch_id in batch_ids:
+            self.wait(batch_id)
+            self.collect(batch_id, store)
+
+        used = self.generator.usage.since(usage_before)
+        print(f"  Token usage: {used.summary()} (~${used.cost_usd(self.generator.model, batch=True):.4f})")
+        return emails
+
+    @staticmethod
+    def _custom_id(retailer_id: str) -> str:
+        if not CUSTOM_ID_PATTERN.match(retailer_id):
+            raise BatchError(f"retailer_id {retailer_id!r} is not a valid batch custom_id")
+        return retailer_id
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Run Checkpoints
+
+Each pipeline run gets a run id and its own directory under data/runs/.
+Stage outputs are appended per record to the run's RecordStore as they
+complete, and run.json records the run's arguments, pipeline options and
+finished stages, so an interrupted run can be resumed with the same
+settings and without redoing (or re-paying for) any record that already
+made it through a stage.
+"""
+
+import os
+import json
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from storage import RecordStore, entry_stages
+
+
+def new_run_id() -> str:
+    """Sortable, unique run id, e.g. 20260131-032102-1a2b3c."""
+    return f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def read_manifest(data_dir: str, run_id: str) -> Dict:
+    """A run's run.json, or {} if there is no such run."""
+    path = f"{data_dir}/runs/{run_id}/run.json"
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+class RunCheckpoint:
+    """Manifest plus per-record stage state for one pipeline run."""
+
+    def __init__(self, data_dir: str, run_id: Optional[str] = None):
+        self.run_id = run_id or new_run_id()
+        self.run_dir = f"{data_dir}/runs/{self.run_id}"
+        self.manifest_path = f"{self.run_dir}/run.json"
+        self.store = RecordStore(f"{self.run_dir}/retailers.jsonl")
+        self.manifest: Dict = read_manifest(data_dir, self.run_id)
+
+        # Loaded once; resumed runs consult these instead of the log.
+        # Records themselves are read back per retailer (see record())
+        self._done: Dict[str, Set[str]] = {}
+        for entry in self.store.iter_entries():
+            for stage in entry_stages(entry):
+                self._done.setdefault(stage, set()).add(entry["key"])
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.manifest)
+
+    def start(self, mode: str, args: Dict, options: Optional[Dict] = None):
+        """
+        Create the manifest, or mark an existing run as resumed.
+
+        args are the run method's arguments, options the pipeline's
+        constructor options; a resumed run keeps the ones it started with.
+        """
+        if self.exists:
+            self.manifest["attempts"] = self.manifest.get("attempts", 1) + 1
+        else:
+            self.manifest = {
+                "run_id": self.run_id,
+                "created_at": datetime.utcnow().isoformat(),
+                "mode": mode,
+                "args": args,
+                "options": options or {},
+                "stages_completed": [],
+                "attempts": 1
+            }
+        self.manifest["status"] = "running"
+        self._save()
+
+    def stage_completed(self, stage: str) -> bool:
+        return stage in self.manifest.get("stages_completed", [])
+
+    def complete_stage(self, stage: str):
+        if not self.stage_completed(stage):
+            self.manifest["stages_completed"].append(stage)
+            self._save()
+
+    def update(self, **fields):
+        """Persist extra run state (e.g. submitted batch ids) in run.json."""
+        self.manifest.update(fields)
+        self._save()
+
+    def finish(self, status: str):
+        self.manifest["status"] = status
+        self.manifest["finished_at"] = datetime.utcnow().isoformat()
+        self._save()
+
+    def is_done(self, stage: str, retailer_id: str) -> bool:
+        """True if this run already stored stage output for the retailer."""
+        return retailer_id in self._done.get(stage, ())
+
+    def record(self, retailer_id: str) -> Dict:
+        """Stored fields for a retailer."""
+        return self.store.get(retailer_id) or {}
+
+    def discovered(self) -> List[Dict]:
+        """Retailers this run discovered, in discovery order."""
+        discovered = self._done.get("discover", ())
+        return [record for key, record in self.store.iter_latest() if key in discovered]
+
+    def _save(self):
+        os.makedirs(self.run_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
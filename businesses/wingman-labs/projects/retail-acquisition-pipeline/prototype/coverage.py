@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Coverage Planner
+
+Replaces overlapping zip-radius searches with a square grid over the
+target area. Each cell is searched with a Places locationRestriction
+rectangle, so cells never overlap; only cells that come back with a full
+page of results are subdivided and searched again.
+"""
+
+import math
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+from scraper import RetailerScraper, Retailer
+from discovery import AsyncDiscoveryEngine
+
+MILES_PER_DEGREE_LAT = 69.0
+
+# (south, west, north, east)
+Bounds = Tuple[float, float, float, float]
+
+
+@dataclass
+class Cell:
+    """One grid cell (degrees) and how many times it has been split."""
+    south: float
+    west: float
+    north: float
+    east: float
+    depth: int = 0
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        return ((self.south + self.north) / 2, (self.west + self.east) / 2)
+
+    @property
+    def rectangle(self) -> Bounds:
+        return (self.south, self.west, self.north, self.east)
+
+    @property
+    def key(self) -> str:
+        return "cell:" + ",".join(f"{v:.5f}" for v in self.rectangle)
+
+    def radius_meters(self) -> int:
+        """Circumscribed radius, used as the (ignored) bias radius."""
+        lat, _ = self.center
+        half_h = (self.north - self.south) / 2 * MILES_PER_DEGREE_LAT
+        half_w = (self.east - self.west) / 2 * MILES_PER_DEGREE_LAT * math.cos(math.radians(lat))
+        return int(math.hypot(half_h, half_w) * 1609.34)
+
+    def split(self) -> List["Cell"]:
+        """Quarter the cell."""
+        mid_lat, mid_lng = self.center
+        d = self.depth + 1
+        return [
+            Cell(self.south, self.west, mid_lat, mid_lng, d),
+            Cell(self.south, mid_lng, mid_lat, self.east, d),
+            Cell(mid_lat, self.west, self.north, mid_lng, d),
+            Cell(mid_lat, mid_lng, self.north, self.east, d),
+        ]
+
+
+@dataclass
+class CoverageReport:
+    """API cost of a coverage run."""
+    api_calls: int = 0
+    unique_places: int = 0
+    cells_searched: int = 0
+    cells_subdivided: int = 0
+    calls_by_depth: Dict[int, int] = field(default_factory=dict)
+    new_places_by_depth: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def calls_per_new_place(self) -> float:
+        return self.api_calls / self.unique_places if self.unique_places else float(self.api_calls)
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["calls_per_new_place"] = round(self.calls_per_new_place, 3)
+        return data
+
+
+def bounds_from_points(points: List[Tuple[float, float]], padding_miles: float = 0) -> Bounds:
+    """Bounding box around (lat, lng) points, padded on every side."""
+    lats = [p[0] for p in points]
+    lngs = [p[1] for p in points]
+    mid_lat = (min(lats) + max(lats)) / 2
+
+    pad_lat = padding_miles / MILES_PER_DEGREE_LAT
+    pad_lng = padding_miles / (MILES_PER_DEGREE_LAT * math.cos(math.radians(mid_lat)))
+    return (min(lats) - pad_lat, min(lngs) - pad_lng, max(lats) + pad_lat, max(lngs) + pad_lng)
+
+
+def point_in_polygon(lat: float, lng: float, polygon: List[Tuple[float, float]]) -> bool:
+    """Ray-casting test for a (lat, lng) polygon."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lng_i > lng) != (lng_j > lng):
+            cross_lat = lat_i + (lng - lng_i) * (lat_j - lat_i) / (lng_j - lng_i)
+            if lat < cross_lat:
+                inside = not inside
+        j = i
+    return inside
+
+
+def tile(
+    bounds: Bounds,
+    cell_size_miles: float,
+    polygon: Optional[List[Tuple[float, float]]] = None
+) -> List[Cell]:
+    """
+    Cover bounds with square cells of roughly cell_size_miles a side.
+
+    With a polygon, cells that don't touch it (no corner or center inside,
+    no polygon vertex inside the cell) are dropped.
+    """
+    south, west, north, east = bounds
+    mid_lat = (south + north) / 2
+    step_lat = cell_size_miles / MILES_PER_DEGREE_LAT
+    step_lng = cell_size_miles / (MILES_PER_DEGREE_LAT * math.cos(math.radians(mid_lat)))
+
+    rows = max(1, math.ceil((north - south) / step_lat))
+    cols = max(1, math.ceil((east - west) / step_lng))
+
+    cells = []
+    for r in range(rows):
+        for c in range(cols):
+            cell = Cell(
+                south + r * step_lat,
+                west + c * step_lng,
+                min(north, south + (r + 1) * step_lat),
+                min(east, west + (c + 1) * step_lng)
+            )
+            if polygon is None or _touches(cell, polygon):
+                cells.append(cell)
+    return cells
+
+
+def cell_size_for_density(places_per_sq_mile: float, result_cap: int) -> float:
+    """Side length (miles) at which a cell is expected to just fill result_cap."""
+    return math.sqrt(result_cap / places_per_sq_mile)
+
+
+def _touches(cell: Cell, polygon: List[Tuple[float, float]]) -> bool:
+    probes = [
+        cell.center,
+        (cell.south, cell.west), (cell.south, cell.east),
+        (cell.north, cell.west), (cell.north, cell.east),
+    ]
+    if any(point_in_polygon(lat, lng, polygon) for lat, lng in probes):
+        return True
+    return any(
+        cell.south <= lat <= cell.north and cell.west <= lng <= cell.east
+        for lat, lng in polygon
+    )
+
+
+class CoveragePlanner:
+    """
+    Adaptive grid search over an area.
+
+    Every (cell, query) pair is searched at the top level. A pair whose
+    result count hits the page cap is likely truncated, so that cell is
+    quartered and re-searched for that query only, down to max_depth.
+    Each level is dispatched concurrently through AsyncDiscoveryEngine,
+    and pairs still fresh in the engine's ScrapeStateStore are skipped.
+    """
+
+    def __init__(
+        self,
+        scraper: RetailerScraper,
+        engine: Optional[AsyncDiscoveryEngine] = None,
+        max_depth: int = 3,
+        expected_density: float = 15.0
+    ):
+        self.scraper = scraper
+        self.engine = engine or AsyncDiscoveryEngine(scraper)
+        self.max_depth = max_depth
+        # Rough retail places per square mile per query in dense LA areas
+        self.expected_density = expected_density
+        self.report = CoverageReport()
+
+    @property
+    def result_cap(self) -> int:
+        return self.scraper.PAGE_SIZE * self.scraper.max_pages
+
+    def plan_locations(self, locations: List[str], radius_miles: float) -> List[Cell]:
+        """Tile the bounding box of geocoded locations, padded by radius_miles."""
+        points = []
+        for location in locations:
+            coords = self.scraper._geocode(location)
+            if coords:
+                points.append(coords)
+            else:
+                print(f"Could not geocode location: {location}")
+
+        if not points:
+            return []
+
+        return tile(bounds_from_points(points, radius_miles), self._cell_size())
+
+    def plan_polygon(self, polygon: List[Tuple[float, float]]) -> List[Cell]:
+        """Tile a (lat, lng) polygon."""
+        return tile(bounds_from_points(polygon), self._cell_size(), polygon)
+
+    def search(
+        self,
+        cells: List[Cell],
+        business_types: Optional[List[str]] = None
+    ) -> List[Retailer]:
+        """
+        Search every cell for every query, subdividing saturated cells.
+
+        Returns:
+            Deduplicated retailers; cost is in self.report
+        """
+        self.report = CoverageReport()
+        plan = self.scraper.query_plan(business_types)
+        pending = [(cell, query, our_type) for cell in cells for query, our_type in plan]
+
+        retailers: List[Retailer] = []
+        seen = set()
+
+        state = self.engine.state
+
+        while pending:
+            depth = pending[0][0].depth
+            if state:
+                pending = [p for p in pending if not state.is_fresh(p[0].key, p[1])]
+                if not pending:
+                    break
+
+            calls_before = self.scraper.call_counts["search"]
+            print(f"Searching {len(pending)} cell/query pairs at depth {depth}...")
+
+            results = self.engine.run_searches([
+                {
+                    "query": query,
+                    "lat": cell.center[0],
+                    "lng": cell.center[1],
+                    "radius": cell.radius_meters(),
+                    "business_type": our_type,
+                    "rectangle": cell.rectangle
+                }
+                for cell, query, our_type in pending
+            ])
+
+            next_pending = []
+            new_places = 0
+            for (cell, query, our_type), found in zip(pending, results):
+                self.report.cells_searched += 1
+                if found is None:
+                    continue
+                if state:
+                    state.record_search(cell.key, query, [r.to_dict() for r in found])
+                for r in found:
+                    key = r.google_place_id or r.retailer_id
+                    if key not in seen:
+                        seen.add(key)
+                        retailers.append(r)
+                        new_places += 1
+
+                if len(found) >= self.result_cap and cell.depth < self.max_depth:
+                    self.report.cells_subdivided += 1
+                    next_pending.extend((child, query, our_type) for child in cell.split())
+
+            calls = self.scraper.call_counts["search"] - calls_before
+            self.report.api_calls += calls
+            self.report.calls_by_depth[depth] = calls
+            self.report.new_places_by_depth[depth] = new_places
+            pending = next_pending
+
+        self.report.unique_places = len(retailers)
+        print(
+            f"Found {len(retailers)} unique retailers with {self.report.api_calls} calls "
+            f"({self.report.calls_per_new_place:.2f} calls per new place)"
+        )
+        return retailers
+
+    def _cell_size(self) -> float:
+        return cell_size_for_density(self.expected_density, self.result_cap)
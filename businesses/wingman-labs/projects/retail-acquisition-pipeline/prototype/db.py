@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Local SQLite Helpers
+
+Shared connection setup for the small on-disk stores (caches, indexes,
+ledgers) used across the pipeline.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open a SQLite database in WAL mode, shareable across threads and processes."""
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    # Stores under data_dir are shared by concurrent shard processes too;
+    # wait for their write locks rather than failing
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SQLiteStore:
+    """
+    Base class for a single-file SQLite store.
+
+    Subclasses set SCHEMA; every statement goes through self._lock so one
+    store can be used from worker threads.
+    """
+
+    SCHEMA = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = connect(path)
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.executescript(self.SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
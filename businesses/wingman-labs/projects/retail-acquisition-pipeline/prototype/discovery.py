@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Concurrent Discovery Engine
+
+Fans out every (location, query) pair from RetailerScraper concurrently,
+behind a global concurrency limit and a token-bucket rate limiter, so a
+metro sweep is bounded by API quota instead of serial latency and sleeps.
+"""
+
+import asyncio
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from scraper import RetailerScraper, Retailer
+from geocache import normalize_location
+from http_client import HttpError
+from scrape_state import ScrapeStateStore
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available, then take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncDiscoveryEngine:
+    """
+    Runs RetailerScraper searches concurrently.
+
+    The scraper's HTTP calls are blocking, so each call runs on a worker
+    thread; the event loop only schedules work and enforces the limits:
+    - max_concurrency: calls in flight at once (geocodes and search pages;
+      each results page is its own call)
+    - requests_per_second / burst: token bucket shared by every call
+
+    With a ScrapeStateStore, (location, query) pairs scraped within its
+    freshness window are skipped and completed pairs are recorded as
+    pending (the pipeline marks them fresh once their leads are exported).
+
+    on_results, if given, is called on the event loop with each search's
+    retailers as soon as that search completes, so downstream stages can
+    start before the sweep finishes. A blocking callback (e.g. a full
+    bounded queue) pauses dispatch, which is the intended backpressure.
+    Once `stop` is set (e.g. by a callback that has enough retailers),
+    searches not yet started are skipped and searches part way through
+    their pages are dropped before the next page.
+    """
+
+    def __init__(
+        self,
+        scraper: RetailerScraper,
+        max_concurrency: int = 8,
+        requests_per_second: float = 5.0,
+        burst: Optional[float] = None,
+        state: Optional[ScrapeStateStore] = None,
+        on_results: Optional[Callable[[List[Retailer]], None]] = None,
+        stop: Optional[threading.Event] = None
+    ):
+        self.scraper = scraper
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.state = state
+        self.on_results = on_results
+        self.stop = stop
+
+    def run(
+        self,
+        locations: List[str],
+        radius_miles: float = 10,
+        business_types: Optional[List[str]] = None
+    ) -> List[Retailer]:
+        """Blocking entry point for callers outside an event loop."""
+        return asyncio.run(self.discover(locations, radius_miles, business_types))
+
+    async def discover(
+        self,
+        locations: List[str],
+        radius_miles: float = 10,
+        business_types: Optional[List[str]] = None
+    ) -> List[Retailer]:
+        """
+        Search every location for every query in the scraper's plan.
+
+        Args:
+            locations: Zip codes, cities or addresses to center searches on
+            radius_miles: Search radius in miles
+            business_types: Optional list of Google place types to search
+
+        Returns:
+            Deduplicated retailers, in (location, query) order
+        """
+        self._open()
+        try:
+            coords = await asyncio.gather(*[
+                self._call(self.scraper._geocode, location) for location in locations
+            ])
+
+            radius_meters = int(radius_miles * 1609.34)
+            plan = self.scraper.query_plan(business_types)
+            tasks = []
+            skipped = 0
+
+            for location, location_coords in zip(locations, coords):
+                if not location_coords:
+                    print(f"Could not geocode location: {location}")
+                    continue
+
+                lat, lng = location_coords
+                area_key = f"{normalize_location(location)}|{radius_miles}mi"
+                for query, our_type in plan:
+                    if self.state and self.state.is_fresh(area_key, query):
+                        skipped += 1
+                        continue
+                    tasks.append(self._search(
+                        location, area_key, query, our_type, lat, lng, radius_meters
+                    ))
+
+            if skipped:
+                print(f"Skipping {skipped} searches that are still fresh")
+            print(f"Dispatching {len(tasks)} searches across {len(locations)} locations...")
+            results = await asyncio.gather(*tasks)
+        finally:
+            self._close()
+
+        retailers = [r for batch in results for r in batch]
+        unique_retailers = self.scraper.dedupe(retailers)
+        print(f"Found {len(unique_retailers)} unique retailers")
+        if self.scraper.failures:
+            print(f"WARNING: {len(self.scraper.failures)} calls failed after retries; results are incomplete")
+        return unique_retailers
+
+    def run_searches(self, searches: List[Dict]) -> List[Optional[List[Retailer]]]:
+        """
+        Run many Places searches under the same limits.
+
+        Args:
+            searches: keyword arguments for each search (as for
+                scraper.iter_places, without raise_on_error)
+
+        Returns:
+            One result list per search, in input order; None for searches
+            that failed after retries or were skipped once stop was set
+        """
+        async def _run():
+            self._open()
+            try:
+                return await asyncio.gather(*[
+                    self._search_or_none(kwargs) for kwargs in searches
+                ])
+            finally:
+                self._close()
+
+        return asyncio.run(_run())
+
+    def _open(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = TokenBucket(self.requests_per_second, self.burst)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+    def _close(self):
+        self._executor.shutdown(wait=False)
+
+    async def _search(
+        self,
+        location: str,
+        area_key: str,
+        query: str,
+        business_type: str,
+        lat: float,
+        lng: float,
+        radius: int
+    ) -> List[Retailer]:
+        results = await self._search_or_none({
+            "query": query,
+            "lat": lat,
+            "lng": lng,
+            "radius": radius,
+            "business_type": business_type
+        })
+        if results is None:
+            return []
+
+        if self.state:
+            self.state.record_search(area_key, query, [r.to_dict() for r in results])
+        print(f"  '{query}' near {location}: {len(results)} results")
+        return results
+
+    async def _search_or_none(self, kwargs: Dict) -> Optional[List[Retailer]]:
+        """
+        All pages of one search, each fetched as its own limited call (one
+        token per Places request); None if a page failed or stop was set
+        before the last page, so a partial search is never recorded.
+        """
+        kwargs = dict(kwargs)
+        max_pages = kwargs.pop("max_pages", None) or self.scraper.max_pages
+        results: List[Retailer] = []
+        page_token = None
+
+        for page in range(max_pages):
+            try:
+                fetched = await self._call(
+                    self.scraper.search_page, page=page, page_token=page_token, raise_on_error=True, **kwargs
+                )
+            except HttpError:
+                return None
+            if fetched is None:
+                return None
+
+            retailers, page_token = fetched
+            results.extend(retailers)
+            if not page_token:
+                break
+
+        if self.on_results and results:
+            self.on_results(results)
+        return results
+
+    def _stopped(self) -> bool:
+        return self.stop is not None and self.stop.is_set()
+
+    async def _call(self, func, *args, **kwargs):
+        """
+        Run a blocking scraper call under the concurrency and rate limits;
+        None, without calling, once stop is set.
+        """
+        async with self._semaphore:
+            if self._stopped():
+                return None
+            await self._bucket.acquire()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
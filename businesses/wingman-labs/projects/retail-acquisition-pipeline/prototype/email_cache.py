@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Email Response Cache
+
+Content-addressed cache of generated emails. The key is a hash of
+everything that determines the prompt (prompt version, model, retailer
+context, sender), so a rerun or resumed run gets the stored EmailOutput
+back instantly for any lead whose inputs haven't changed, and any change
+to those inputs is simply a miss. Entries from other prompt versions are
+dropped on open; the table is bounded with least-recently-used eviction.
+"""
+
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from db import SQLiteStore
+
+
+def _normalize(value):
+    """Collapse whitespace in strings (recursively) so cosmetic noise doesn't miss."""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def cache_key(prompt_version: str, model: str, context: Dict, sender: Dict) -> str:
+    """sha256 over the canonical JSON of every prompt input."""
+    payload = json.dumps(
+        {
+            "prompt_version": prompt_version,
+            "model": model,
+            "context": _normalize(context),
+            "sender": _normalize(sender)
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class EmailCache(SQLiteStore):
+    """cache_key -> EmailOutput fields (as a dict), bounded to max_entries."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS emails (
+            key TEXT PRIMARY KEY,
+            prompt_version TEXT NOT NULL,
+            email TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS emails_last_used ON emails (last_used);
+    """
+
+    def __init__(
+        self,
+        path: str = "data/email_cache.db",
+        prompt_version: Optional[str] = None,
+        max_entries: int = 50000
+    ):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+        if prompt_version:
+            dropped = self.invalidate(keep_version=prompt_version)
+            if dropped:
+                print(f"  Email cache: dropped {dropped} entries from older prompt versions")
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT email FROM emails WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._conn.execute("UPDATE emails SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+
+        with self._stats_lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, prompt_version: str, email: Dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO emails (key, prompt_version, email, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, prompt_version, json.dumps(email), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self, keep_version: Optional[str] = None) -> int:
+        """Delete every entry (or every entry not from keep_version); returns the count."""
+        with self._lock:
+            if keep_version is None:
+                cursor = self._conn.execute("DELETE FROM emails")
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM emails WHERE prompt_version != ?", (keep_version,)
+                )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+
+    def _evict(self):
+        """Trim to max_entries, least recently used first (caller holds the lock)."""
+        excess = self._conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM emails WHERE key IN "
+                "(SELECT key FROM emails ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
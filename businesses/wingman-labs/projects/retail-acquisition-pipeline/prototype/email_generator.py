@@ -8,9 +8,15 @@ using Claude API.
 """
 
 import os
+import re
 import json
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+import hashlib
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, asdict, field
 
 try:
     import anthropic
@@ -19,6 +25,12 @@ except ImportError:
     HAS_ANTHROPIC = False
     anthropic = None
 
+import pandas as pd
+
+from email_cache import cache_key
+from metrics import METRICS, MetricsRegistry
+from variants import VariantAssigner
+
 
 # Email templates for different business types
 EMAIL_TEMPLATES = {
@@ -64,6 +76,285 @@ EMAIL_TEMPLATES = {
     }
 }
 
+# No-API email templates. Fields: greeting, business_name, city,
+# business_type, hook, benefit, social_proof, sender_name, sender_title,
+# company, subject_variant (see template_fields; template_renderer.py
+# renders them in bulk)
+SUBJECT_TEMPLATES = [
+    "Quick question about {business_name}",
+    "Spotted {business_name} - had an idea",
+    "For {business_name}: new product for your checkout counter",
+    "{city} stores are asking about this"
+]
+
+BODY_TEMPLATE = """{greeting}
+
+I run partnerships at {company}. We make energy strips — think breath strips, but with 100mg caffeine, B-vitamins, and adaptogens that actually absorb properly.
+
+Given {hook}, thought this might be a good fit for {business_name}. It's a {benefit} that customers grab on impulse.
+
+A few {social_proof} have started carrying us. Happy to send samples or hop on a 10-minute call if you're curious.
+
+— {sender_name}
+{sender_title}, {company}"""
+
+NOTES_TEMPLATE = """
+- Matched business type: {business_type}
+- Used type-specific hook about {hook}
+- Referenced city: {city}
+- Subject line variant: {subject_variant} (stable per retailer)"""
+
+FOLLOW_UP_1_TEMPLATE = """{greeting}
+
+Following up on my note about energy strips for {business_name}.
+
+Quick stat: energy drinks are the #1 packaged beverage in convenience retail. Our strips are a premium alternative that sits at checkout — small footprint, high impulse buy rate.
+
+Worth 10 minutes to see if it makes sense?
+
+— {sender_name}"""
+
+FOLLOW_UP_2_TEMPLATE = """{greeting}
+
+Last try — I'll keep it brief.
+
+{company} makes energy strips that a handful of {social_proof} are now carrying. We're based in LA, so can personally drop off samples if helpful.
+
+Either way, no hard feelings. Just thought it'd be a fit.
+
+— {sender_name}"""
+
+
+# Which SUBJECT_TEMPLATES entry each retailer gets
+SUBJECT_EXPERIMENT = VariantAssigner(
+    "subject_line", [f"subject-{i}" for i in range(len(SUBJECT_TEMPLATES))]
+)
+
+
+def variant_unit(context: Dict) -> str:
+    """Experiment unit for a retailer: its retailer_id, else its name."""
+    return context.get('retailer_id') or context['business_name']
+
+
+def greeting_for(contact_name: Optional[str]) -> str:
+    """Personalized greeting"""
+    return f"Hi {contact_name.split()[0]}," if contact_name else "Hi there,"
+
+
+def template_fields(context: Dict, sender_name: str, sender_title: str, company: str) -> Dict:
+    """Values for the no-API templates' fields."""
+    template = context['template']
+    return {
+        "greeting": greeting_for(context.get('contact_name')),
+        "business_name": context['business_name'],
+        "city": context['city'],
+        "business_type": context['business_type'],
+        "hook": template['hook'],
+        "benefit": template['benefit'],
+        "social_proof": template['social_proof'],
+        "sender_name": sender_name,
+        "sender_title": sender_title,
+        "company": company,
+        "subject_variant": SUBJECT_EXPERIMENT.assign(variant_unit(context))
+    }
+
+
+def _playbook() -> str:
+    return "\n".join(
+        f"- {business_type}: hook \"{t['hook']}\"; benefit \"{t['benefit']}\"; "
+        f"social proof \"{t['social_proof']}\""
+        for business_type, t in EMAIL_TEMPLATES.items()
+    )
+
+
+# Subjects must be shorter than this; the prompt and tool schema say so too
+MAX_SUBJECT_CHARS = 80
+
+
+def _reference_subjects() -> str:
+    return "\n".join(f"- {subject}" for subject in SUBJECT_TEMPLATES)
+
+
+# The API only caches a prefix (tools, then system blocks up to the
+# breakpoint) of at least this many tokens on Sonnet; a shorter one is
+# silently billed as plain input on every call
+MIN_CACHEABLE_TOKENS = 1024
+
+# Static prefix of every AI request. Keep it byte-identical across calls
+# (no retailer or sender data, no timestamps) or the prompt cache misses,
+# and with the tools above MIN_CACHEABLE_TOKENS (tests check it), or it
+# is never cached at all.
+SYSTEM_PROMPT = f"""You are writing cold outreach emails for Wingman Labs, 
+a company that makes pharmaceutical-grade dissolving energy and sleep strips.
+
+Product: Wingman Energy Strips
+- Dissolves on tongue in 30 seconds
+- 100mg caffeine + B-vitamins + adaptogens
+- Pharmaceutical-grade bioavailability (better absorption than drinks)
+- Compact format, perfect for checkout display
+- Good margins for retailers
+
+Your job: Write short, direct, personalized emails to store owners.
+
+Rules:
+1. SHORT. 3-5 sentences max for the main pitch.
+2. SPECIFIC. Reference their actual store name and city.
+3. NO FLUFF. No "I hope this email finds you well."
+4. DIRECT ASK. Ask for a 10-minute call or quick chat.
+5. AUTHENTIC. Sound like a real human, not a sales robot.
+
+The goal is to get a brief conversation started, not close a deal in one email.
+
+Angles by business type (the retailer's own is repeated with each request):
+{_playbook()}
+
+How to use the lead details:
+- Business name and city: use both in the opening email, naturally, once each.
+- Business type: lead with that type's hook; never pitch a vape shop like a pharmacy.
+- Rating and review count: a well-reviewed store has loyal regulars, which is a
+  reason to reply; never quote the numbers back or comment on a low rating.
+- Contact name: greet them by first name ("Hi Maria,"); without one, "Hi there,".
+- Sender: sign with the sender's name, title and company exactly as given.
+
+What to avoid:
+- Claims beyond the product facts above (no health or medical claims, no
+  "clinically proven", no invented retailers, numbers or discounts).
+- Exclamation marks, emoji, ALL CAPS, and words like "revolutionary" or "game-changer".
+- Attachments, links or pricing in the first email; the ask is a short call or samples.
+- Mentioning that the email was personalized, researched or written by AI.
+
+Subject lines: plain and specific, under {MAX_SUBJECT_CHARS} characters, no clickbait.
+Patterns that have worked ({{business_name}}, {{city}} filled in):
+{_reference_subjects()}
+
+House style reference. The opening email below is the non-AI fallback; match
+its length, tone and structure, but write each store its own version
+(placeholders in braces are filled per lead):
+
+{BODY_TEMPLATE}
+
+First follow-up (a few days later, one new reason to reply):
+
+{FOLLOW_UP_1_TEMPLATE}
+
+Second and last follow-up (brief, low pressure, offers samples):
+
+{FOLLOW_UP_2_TEMPLATE}"""
+
+# Instructions for one email per request
+SINGLE_FORMAT = """Write the opening email plus two short follow-ups (2-3 sentences
+each, sent a few days apart, each adding one new reason to reply). Call
+the write_email tool with the result; do not answer in plain text."""
+
+# Instructions for several leads per request (see generate_many)
+MULTI_FORMAT = """You will be given several leads, each with a Lead ID. For each lead
+write the opening email plus two short follow-ups (2-3 sentences each,
+sent a few days apart); never mix details between leads. Call the
+write_emails tool once, with exactly one entry per Lead ID."""
+
+EMAIL_FIELDS = {
+    "subject": {"type": "string", "description": f"Subject line, under {MAX_SUBJECT_CHARS} characters"},
+    "body": {"type": "string", "description": "Opening email body, signed by the sender"},
+    "personalization_notes": {"type": "string", "description": "Why this approach was chosen"},
+    "follow_up_1": {"type": "string", "description": "First follow-up email body"},
+    "follow_up_2": {"type": "string", "description": "Second (last) follow-up email body"}
+}
+
+# Structured output: the model is forced to call one of these tools, so
+# the email arrives as validated JSON fields instead of free text
+EMAIL_TOOL = {
+    "name": "write_email",
+    "description": "Record the outreach email and its two follow-ups.",
+    "input_schema": {
+        "type": "object",
+        "properties": EMAIL_FIELDS,
+        "required": list(EMAIL_FIELDS)
+    }
+}
+
+EMAILS_TOOL = {
+    "name": "write_emails",
+    "description": "Record one outreach email (with follow-ups) per lead.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "emails": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"lead_id": {"type": "string"}, **EMAIL_FIELDS},
+                    "required": ["lead_id", *EMAIL_FIELDS]
+                }
+            }
+        },
+        "required": ["emails"]
+    }
+}
+
+# Bump when the user prompts or parsing change; changes to the system
+# blocks and tools are picked up by their digest. Cached emails from any
+# other version are discarded (see email_cache.py).
+PROMPT_VERSION = "2-" + hashlib.sha256(
+    (SYSTEM_PROMPT + SINGLE_FORMAT + MULTI_FORMAT + json.dumps([EMAIL_TOOL, EMAILS_TOOL])).encode()
+).hexdigest()[:12]
+
+# Output budget per email (with follow-ups), and the API's cap for a
+# multi-lead request
+MAX_TOKENS_PER_EMAIL = 1200
+MAX_TOKENS_PER_REQUEST = 8192
+
+# USD per million tokens: input, cache write, cache read, output. The
+# Message Batches API bills half of these.
+MODEL_PRICING = {
+    "claude-sonnet-4-20250514": (3.00, 3.75, 0.30, 15.00)
+}
+BATCH_DISCOUNT = 0.5
+
+
+@dataclass
+class TokenUsage:
+    """Token counts summed over AI requests, including prompt cache traffic."""
+    requests: int = 0
+    input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    output_tokens: int = 0
+    
+    def add(self, usage):
+        """Add a Messages API usage object (or dict)."""
+        get = usage.get if isinstance(usage, dict) else (lambda k: getattr(usage, k, None))
+        self.requests += 1
+        self.input_tokens += get('input_tokens') or 0
+        self.cache_creation_input_tokens += get('cache_creation_input_tokens') or 0
+        self.cache_read_input_tokens += get('cache_read_input_tokens') or 0
+        self.output_tokens += get('output_tokens') or 0
+    
+    def since(self, earlier: 'TokenUsage') -> 'TokenUsage':
+        return TokenUsage(**{k: v - getattr(earlier, k) for k, v in self.__dict__.items()})
+    
+    @property
+    def cache_hit_rate(self) -> float:
+        """Share of prompt-prefix tokens served from the cache."""
+        cached = self.cache_creation_input_tokens + self.cache_read_input_tokens
+        return self.cache_read_input_tokens / cached if cached else 0.0
+    
+    def cost_usd(self, model: str, batch: bool = False) -> float:
+        """What these tokens cost on model (0.0 if its pricing is unknown)."""
+        prices = MODEL_PRICING.get(model)
+        if not prices:
+            return 0.0
+        tokens = (self.input_tokens, self.cache_creation_input_tokens,
+                  self.cache_read_input_tokens, self.output_tokens)
+        cost = sum(n * price for n, price in zip(tokens, prices)) / 1_000_000
+        return cost * BATCH_DISCOUNT if batch else cost
+    
+    def summary(self) -> str:
+        return (f"{self.requests} requests: {self.input_tokens} uncached input, "
+                f"{self.cache_creation_input_tokens} cache write, "
+                f"{self.cache_read_input_tokens} cache read ({self.cache_hit_rate:.0%} hit), "
+                f"{self.output_tokens} output tokens")
+
+
 @dataclass
 class EmailOutput:
     """Generated email content."""
@@ -72,17 +363,155 @@ class EmailOutput:
     personalization_notes: str
     follow_up_1: Optional[str] = None
     follow_up_2: Optional[str] = None
+    # "template:<subject variant>" or "ai:<prompt version>"
+    variant: Optional[str] = None
+
+
+class EmailValidationError(ValueError):
+    """The model's output was still missing required fields after repair."""
+
+
+@dataclass
+class GenerationResult:
+    """generate_many output: emails in input order, None where generation failed."""
+    emails: List[Optional[EmailOutput]]
+    # (retailer, error message) for every retailer without an email
+    failures: List[Tuple[Dict, str]] = field(default_factory=list)
+
+
+def email_problems(fields: Dict) -> List[str]:
+    """What is wrong with a structured email, as fix-it instructions."""
+    problems = []
+    for name in EMAIL_FIELDS:
+        value = fields.get(name)
+        if not isinstance(value, str) or not value.strip():
+            problems.append(f"{name} is missing or empty")
+    subject = fields.get("subject")
+    if isinstance(subject, str) and (len(subject.strip()) >= MAX_SUBJECT_CHARS or "\n" in subject.strip()):
+        problems.append(f"subject must be a single line under {MAX_SUBJECT_CHARS} characters")
+    return problems
+
+
+def email_from_fields(fields: Dict) -> EmailOutput:
+    return EmailOutput(
+        subject=fields["subject"].strip(),
+        body=fields["body"].strip(),
+        personalization_notes=str(fields.get("personalization_notes") or "").strip(),
+        follow_up_1=(fields.get("follow_up_1") or "").strip() or None,
+        follow_up_2=(fields.get("follow_up_2") or "").strip() or None,
+        variant=f"ai:{PROMPT_VERSION}"
+    )
+
+
+def tool_input(message, name: str) -> Optional[Dict]:
+    """Input of the message's call to the named tool, if it made one."""
+    for block in message.content:
+        if getattr(block, "type", None) == "tool_use" and block.name == name:
+            return block.input if isinstance(block.input, dict) else None
+    return None
+
+
+def message_text(message) -> str:
+    return "".join(getattr(block, "text", "") for block in message.content)
+
+
+# HTTP statuses meaning "slow down": rate limited / API overloaded
+OVERLOAD_STATUSES = {429, 529}
+
+
+# Server-side failures worth retrying without slowing down
+TRANSIENT_STATUSES = {500, 502, 503, 504}
+
+
+def is_overloaded(error: Exception) -> bool:
+    return getattr(error, 'status_code', None) in OVERLOAD_STATUSES
+
+
+def is_transient(error: Exception) -> bool:
+    """5xx responses, dropped connections and timeouts."""
+    if getattr(error, 'status_code', None) in TRANSIENT_STATUSES:
+        return True
+    return HAS_ANTHROPIC and isinstance(error, anthropic.APIConnectionError)
+
+
+class AdaptiveLimiter:
+    """
+    Thread-safe AIMD concurrency limit for LLM calls.
+    
+    The limit grows by one after every `increase_after` successes (up to
+    max_limit) and halves on each rate-limit/overload error, so the number
+    of in-flight requests settles just under the API tier's capacity.
+    """
+    
+    def __init__(self, max_limit: int, min_limit: int = 1, increase_after: int = 5):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.increase_after = increase_after
+        self.limit = max_limit
+        self._in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+    
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+    
+    def release(self, overloaded: bool = False):
+        with self._cond:
+            self._in_flight -= 1
+            if overloaded:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.increase_after and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
 
 
 class EmailGenerator:
     """Generates personalized outreach emails using Claude."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    model = "claude-sonnet-4-20250514"
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        cache=None,
+        leads_per_request: int = 1,
+        metrics: Optional[MetricsRegistry] = None
+    ):
         self.api_key = api_key or os.environ.get('ANTHROPIC_API_KEY')
         if self.api_key and HAS_ANTHROPIC:
-            self.client = anthropic.Anthropic(api_key=self.api_key)
+            # Retries happen in _with_backoff, under the adaptive limiter;
+            # SDK retries on top would multiply them
+            self.client = anthropic.Anthropic(api_key=self.api_key, max_retries=0)
         else:
             self.client = None
+        
+        # Max in-flight LLM requests, shared by every caller of
+        # generate_with_backoff (generate_many, pipeline workers)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        
+        # Optional EmailCache: AI emails for unchanged inputs are reused
+        self.cache = cache
+        
+        # generate_many packs this many retailers into each AI request
+        self.leads_per_request = max(1, min(
+            leads_per_request, MAX_TOKENS_PER_REQUEST // MAX_TOKENS_PER_EMAIL
+        ))
+        
+        # Running token totals; generate_many reports the delta per batch
+        self.usage = TokenUsage()
+        self._usage_lock = threading.Lock()
+        self.metrics = metrics or METRICS
     
     def generate_email(
         self,
@@ -103,11 +532,55 @@ class EmailGenerator:
         Returns:
             EmailOutput with subject, body, and notes
         """
+        context = self._build_context(retailer)
+        
+        if not self.client:
+            return self._generate_template(context, sender_name, sender_title, company)
+        
+        sender = {"sender_name": sender_name, "sender_title": sender_title, "company": company}
+        return self.cached_email(retailer, **sender) or self._generate_uncached(retailer, sender)
+    
+    def _generate_uncached(self, retailer: Dict, sender: Dict) -> EmailOutput:
+        email = self._generate_with_ai(self._build_context(retailer), **sender)
+        self.cache_email(retailer, email, **sender)
+        return email
+    
+    def cached_email(self, retailer: Dict, **sender) -> Optional[EmailOutput]:
+        """The cached AI email for this retailer's current inputs, if any."""
+        if not self.client or self.cache is None:
+            return None
+        cached = self.cache.get(self._cache_key(retailer, self._sender(sender)))
+        return EmailOutput(**cached) if cached else None
+    
+    def cache_email(self, retailer: Dict, email: EmailOutput, **sender):
+        """Store an AI email (also used for emails generated by a batch)."""
+        if self.cache is not None:
+            key = self._cache_key(retailer, self._sender(sender))
+            self.cache.set(key, PROMPT_VERSION, asdict(email))
+    
+    def _cache_key(self, retailer: Dict, sender: Dict) -> str:
+        # retailer_id never reaches the prompt, so it stays out of the key:
+        # the same store under a new id still hits
+        context = self._build_context(retailer)
+        context.pop('retailer_id', None)
+        return cache_key(PROMPT_VERSION, self.model, context, sender)
+    
+    @staticmethod
+    def _sender(sender: Dict) -> Dict:
+        """generate_email's sender defaults, overridden by sender."""
+        return {
+            "sender_name": sender.get("sender_name", "Alex"),
+            "sender_title": sender.get("sender_title", "Partnerships"),
+            "company": sender.get("company", "Wingman Labs")
+        }
+    
+    def _build_context(self, retailer: Dict) -> Dict:
+        """Retailer fields and business-type template used by every prompt."""
         business_type = retailer.get('business_type', 'c-store')
         template = EMAIL_TEMPLATES.get(business_type, EMAIL_TEMPLATES['c-store'])
         
-        # Build context for AI
-        context = {
+        return {
+            "retailer_id": retailer.get('retailer_id'),
             "business_name": retailer.get('business_name', 'your store'),
             "business_type": business_type,
             "city": retailer.get('city', 'your area'),
@@ -116,11 +589,6 @@ class EmailGenerator:
             "contact_name": retailer.get('contact_name'),
             "template": template
         }
-        
-        if self.client:
-            return self._generate_with_ai(context, sender_name, sender_title, company)
-        else:
-            return self._generate_template(context, sender_name, sender_title, company)
     
     def _generate_with_ai(
         self,
@@ -129,57 +597,186 @@ class EmailGenerator:
         sender_title: str,
         company: str
     ) -> EmailOutput:
-        """Generate email using Claude API."""
+        """
+        Generate email using Claude API.
         
-        system_prompt = """You are writing cold outreach emails for Wingman Labs, 
-a company that makes pharmaceutical-grade dissolving energy and sleep strips.
+        If the structured output fails validation, the model gets one
+        targeted repair turn listing what to fix (much cheaper than a
+        fresh generation, since it keeps its first answer in context).
+        """
+        request = self._build_ai_request(context, sender_name, sender_title, company)
+        response = self._create(request, "single")
+        
+        fields = tool_input(response, EMAIL_TOOL["name"])
+        problems = email_problems(fields) if fields is not None else ["write_email was not called"]
+        if not problems:
+            return email_from_fields(fields)
+        
+        response = self._create(self._repair_request(request, response, problems), "repair")
+        
+        email = self.email_from_message(response)
+        if email is None:
+            raise EmailValidationError(f"Unusable email after repair: {'; '.join(problems)}")
+        return email
+    
+    @staticmethod
+    def _repair_request(request: Dict, response, problems: List[str]) -> Dict:
+        """request continued with the model's answer and what to fix in it."""
+        fix = "Please call write_email again with these fixed: " + "; ".join(problems)
+        tool_use = next((b for b in response.content if getattr(b, "type", None) == "tool_use"), None)
+        
+        if tool_use is not None:
+            feedback = [{"type": "tool_result", "tool_use_id": tool_use.id, "is_error": True, "content": fix}]
+        else:
+            feedback = fix
+        
+        return {
+            **request,
+            "messages": request["messages"] + [
+                {"role": "assistant", "content": [b.model_dump(exclude_none=True) for b in response.content]},
+                {"role": "user", "content": feedback}
+            ]
+        }
+    
+    def email_from_message(self, message) -> Optional[EmailOutput]:
+        """
+        EmailOutput from a Messages API response, or None if unusable.
+        
+        Prefers the write_email tool call; falls back to parsing any
+        plain-text answer.
+        """
+        fields = tool_input(message, EMAIL_TOOL["name"])
+        if fields is not None:
+            return email_from_fields(fields) if not email_problems(fields) else None
+        
+        email = self._parse_ai_response(message_text(message))
+        return email if email.subject and email.body else None
+    
+    def _create(self, request: Dict, kind: str):
+        """messages.create, timed and with its usage recorded."""
+        try:
+            with self.metrics.timer("llm.request.seconds", kind=kind):
+                response = self.client.messages.create(**request)
+        except Exception as e:
+            self.metrics.inc("llm.errors", kind=kind, overloaded=is_overloaded(e))
+            raise
+        self.record_usage(response.usage)
+        return response
+    
+    def record_usage(self, usage, batch: bool = False):
+        """Add one response's usage to the running totals and metrics."""
+        one = TokenUsage()
+        one.add(usage)
+        with self._usage_lock:
+            self.usage.add(usage)
+        
+        backend = "batch" if batch else "interactive"
+        self.metrics.inc("llm.requests", backend=backend)
+        for field in ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "output_tokens"):
+            self.metrics.inc("llm.tokens", getattr(one, field), type=field.replace("_tokens", ""))
+        self.metrics.inc("llm.cost_usd", one.cost_usd(self.model, batch=batch), backend=backend)
+    
+    def _build_ai_request(
+        self,
+        context: Dict,
+        sender_name: str,
+        sender_title: str,
+        company: str
+    ) -> Dict:
+        """
+        Messages API parameters for one email (shared by batch mode).
+        
+        The system blocks are identical for every retailer and the last
+        one is marked cacheable, so after the first call their tokens are
+        read from the prompt cache; everything retailer-specific is in the
+        user turn.
+        """
+        user_prompt = f"""Write an outreach email for this retailer:
 
-Product: Wingman Energy Strips
-- Dissolves on tongue in 30 seconds
-- 100mg caffeine + B-vitamins + adaptogens
-- Pharmaceutical-grade bioavailability (better absorption than drinks)
-- Compact format, perfect for checkout display
-- Good margins for retailers
+{self._describe_lead(context)}
 
-Your job: Write short, direct, personalized emails to store owners.
+Sender: {sender_name}, {sender_title} at {company}"""
 
-Rules:
-1. SHORT. 3-5 sentences max for the main pitch.
-2. SPECIFIC. Reference their actual store name and city.
-3. NO FLUFF. No "I hope this email finds you well."
-4. DIRECT ASK. Ask for a 10-minute call or quick chat.
-5. AUTHENTIC. Sound like a real human, not a sales robot.
+        return {
+            "model": self.model,
+            "max_tokens": MAX_TOKENS_PER_EMAIL,
+            "system": self._system_blocks(SINGLE_FORMAT),
+            "tools": [EMAIL_TOOL],
+            "tool_choice": {"type": "tool", "name": EMAIL_TOOL["name"]},
+            "messages": [{"role": "user", "content": user_prompt}]
+        }
+    
+    def _build_group_request(
+        self,
+        leads: List[Dict],
+        sender_name: str,
+        sender_title: str,
+        company: str
+    ) -> Dict:
+        """Messages API parameters for one email per lead ({"lead_id", "context"})."""
+        described = "\n\n".join(
+            f"Lead ID: {lead['lead_id']}\n{self._describe_lead(lead['context'])}"
+            for lead in leads
+        )
+        user_prompt = f"""Write an outreach email for each of these {len(leads)} retailers:
 
-The goal is to get a brief conversation started, not close a deal in one email."""
+{described}
 
-        user_prompt = f"""Write an outreach email for this retailer:
+Sender (same for every email): {sender_name}, {sender_title} at {company}"""
 
-Business Name: {context['business_name']}
+        return {
+            "model": self.model,
+            "max_tokens": min(MAX_TOKENS_PER_REQUEST, MAX_TOKENS_PER_EMAIL * len(leads)),
+            "system": self._system_blocks(MULTI_FORMAT),
+            "tools": [EMAILS_TOOL],
+            "tool_choice": {"type": "tool", "name": EMAILS_TOOL["name"]},
+            "messages": [{"role": "user", "content": user_prompt}]
+        }
+    
+    @staticmethod
+    def _system_blocks(output_format: str) -> List[Dict]:
+        return [
+            {"type": "text", "text": SYSTEM_PROMPT},
+            {"type": "text", "text": output_format, "cache_control": {"type": "ephemeral"}}
+        ]
+    
+    @staticmethod
+    def _describe_lead(context: Dict) -> str:
+        return f"""Business Name: {context['business_name']}
 Business Type: {context['business_type']}
 City: {context['city']}
 Rating: {context.get('rating', 'N/A')} ({context.get('review_count', 'N/A')} reviews)
 Contact Name: {context.get('contact_name', 'Not available')}
 
 Key hook for this business type: {context['template']['hook']}
-Key benefit: {context['template']['benefit']}
-
-Sender: {sender_name}, {sender_title} at {company}
-
-Return the email in this exact format:
-SUBJECT: [subject line]
-BODY:
-[email body]
-PERSONALIZATION_NOTES:
-[brief notes on why this approach was chosen]"""
-
-        response = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=800,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}]
-        )
+Key benefit: {context['template']['benefit']}"""
+    
+    def _generate_group(self, retailers: List[Dict]) -> Dict[str, EmailOutput]:
+        """
+        One AI request for several retailers.
+        
+        Returns:
+            EmailOutput per lead id (the retailer's index in the list, as
+            a string) for every lead the response covered completely
+        """
+        leads = [
+            {"lead_id": str(i), "context": self._build_context(r)}
+            for i, r in enumerate(retailers)
+        ]
+        request = self._build_group_request(leads, **self._sender({}))
+        response = self._create(request, "group")
+        
+        return self._parse_group_response(response)
+    
+    @staticmethod
+    def _parse_group_response(message) -> Dict[str, EmailOutput]:
+        entries = (tool_input(message, EMAILS_TOOL["name"]) or {}).get("emails")
         
-        return self._parse_ai_response(response.content[0].text)
+        emails = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, dict) and not email_problems(entry):
+                emails[str(entry.get("lead_id"))] = email_from_fields(entry)
+        return emails
     
     def _generate_template(
         self,
@@ -190,113 +787,239 @@ PERSONALIZATION_NOTES:
     ) -> EmailOutput:
         """Generate email using templates (no API needed)."""
         
-        template = context['template']
-        business_name = context['business_name']
-        city = context['city']
-        contact_name = context.get('contact_name')
+        fields = template_fields(context, sender_name, sender_title, company)
         
-        # Personalized greeting
-        if contact_name:
-            greeting = f"Hi {contact_name.split()[0]},"
-        else:
-            greeting = f"Hi there,"
-        
-        # Build subject line
-        subjects = [
-            f"Quick question about {business_name}",
-            f"Spotted {business_name} - had an idea",
-            f"For {business_name}: new product for your checkout counter",
-            f"{city} stores are asking about this"
-        ]
-        subject = subjects[hash(business_name) % len(subjects)]
+        # Subject line: stable A/B variant per retailer
+        subject = SUBJECT_TEMPLATES[SUBJECT_EXPERIMENT.index(variant_unit(context))]
         
-        # Build body
-        body = f"""{greeting}
-
-I run partnerships at {company}. We make energy strips — think breath strips, but with 100mg caffeine, B-vitamins, and adaptogens that actually absorb properly.
-
-Given {template['hook']}, thought this might be a good fit for {business_name}. It's a {template['benefit']} that customers grab on impulse.
-
-A few {template['social_proof']} have started carrying us. Happy to send samples or hop on a 10-minute call if you're curious.
-
-— {sender_name}
-{sender_title}, {company}"""
-
-        personalization_notes = f"""
-- Matched business type: {context['business_type']}
-- Used type-specific hook about {template['hook']}
-- Referenced city: {city}
-- Subject line variant based on store name hash"""
-
-        # Follow-up templates
-        follow_up_1 = f"""{greeting}
-
-Following up on my note about energy strips for {business_name}.
-
-Quick stat: energy drinks are the #1 packaged beverage in convenience retail. Our strips are a premium alternative that sits at checkout — small footprint, high impulse buy rate.
-
-Worth 10 minutes to see if it makes sense?
-
-— {sender_name}"""
-
-        follow_up_2 = f"""{greeting}
-
-Last try — I'll keep it brief.
-
-{company} makes energy strips that a handful of {template['social_proof']} are now carrying. We're based in LA, so can personally drop off samples if helpful.
-
-Either way, no hard feelings. Just thought it'd be a fit.
-
-— {sender_name}"""
-
         return EmailOutput(
-            subject=subject,
-            body=body,
-            personalization_notes=personalization_notes,
-            follow_up_1=follow_up_1,
-            follow_up_2=follow_up_2
+            subject=subject.format(**fields),
+            body=BODY_TEMPLATE.format(**fields),
+            personalization_notes=NOTES_TEMPLATE.format(**fields),
+            follow_up_1=FOLLOW_UP_1_TEMPLATE.format(**fields),
+            follow_up_2=FOLLOW_UP_2_TEMPLATE.format(**fields),
+            variant=f"template:{fields['subject_variant']}"
         )
     
+    # Section markers as models actually write them: any case, optionally
+    # bolded or as a heading, value on the same line or the next ones
+    SECTION_PATTERN = re.compile(
+        r"^[\s#>*_]*(SUBJECT(?: LINE)?|BODY|PERSONALIZATION[ _]NOTES|NOTES)[\s*_]*:[\s*_]*(.*)$",
+        re.IGNORECASE
+    )
+    
     def _parse_ai_response(self, response_text: str) -> EmailOutput:
-        """Parse AI response into EmailOutput."""
-        subject = ""
-        body = ""
-        notes = ""
-        
-        lines = response_text.split('\n')
+        """Parse a plain-text AI response (SUBJECT:/BODY:/... sections) into EmailOutput."""
+        sections = {'subject': [], 'body': [], 'notes': []}
         current_section = None
         
-        for line in lines:
-            if line.startswith('SUBJECT:'):
-                subject = line.replace('SUBJECT:', '').strip()
-                current_section = 'subject'
-            elif line.startswith('BODY:'):
-                current_section = 'body'
-            elif line.startswith('PERSONALIZATION_NOTES:'):
-                current_section = 'notes'
-            elif current_section == 'body':
-                body += line + '\n'
-            elif current_section == 'notes':
-                notes += line + '\n'
+        for line in response_text.split('\n'):
+            match = self.SECTION_PATTERN.match(line)
+            if match:
+                marker = match.group(1).upper()
+                current_section = (
+                    'subject' if marker.startswith('SUBJECT')
+                    else 'body' if marker == 'BODY'
+                    else 'notes'
+                )
+                rest = match.group(2).strip()
+                if rest:
+                    sections[current_section].append(rest)
+            elif current_section:
+                sections[current_section].append(line)
+        
+        # Subject is the first non-blank line after the marker
+        subject = next((l.strip() for l in sections['subject'] if l.strip()), "")
         
         return EmailOutput(
-            subject=subject,
-            body=body.strip(),
-            personalization_notes=notes.strip()
+            subject=subject.strip('*_ "'),
+            body='\n'.join(sections['body']).strip(),
+            personalization_notes='\n'.join(sections['notes']).strip(),
+            variant=f"ai:{PROMPT_VERSION}"
         )
     
+    def generate_many(
+        self,
+        retailers: List[Dict],
+        on_result: Optional[Callable[[Dict, EmailOutput], None]] = None
+    ) -> GenerationResult:
+        """
+        Generate emails for many retailers concurrently.
+        
+        Up to max_concurrency requests are in flight; the limit adapts
+        down on rate-limit/overload errors and back up as calls succeed.
+        With leads_per_request > 1 (AI mode), each request writes emails
+        for that many uncached retailers at once. Without an API key all
+        emails come from one pass of the vectorized template renderer.
+        
+        Args:
+            retailers: Retailer dicts, as for generate_email
+            on_result: Called (from a worker thread) with each retailer and
+                its email as soon as it is generated
+        
+        Returns:
+            One EmailOutput per retailer, in input order (None where
+            generation failed after retries), plus those failures
+        """
+        if not retailers:
+            return GenerationResult([])
+        
+        results: List[Optional[EmailOutput]] = [None] * len(retailers)
+        failures: List[Tuple[Dict, str]] = []
+        usage_before = TokenUsage(**self.usage.__dict__)
+        done = 0
+        done_lock = threading.Lock()
+        
+        def deliver(index: int, email: EmailOutput):
+            nonlocal done
+            retailer = retailers[index]
+            results[index] = email
+            if on_result:
+                on_result(retailer, email)
+            
+            with done_lock:
+                done += 1
+                print(f"Generated email {done}/{len(retailers)}: {retailer.get('business_name')}")
+        
+        def work(index: int):
+            retailer = retailers[index]
+            try:
+                email = self.generate_with_backoff(retailer)
+            except Exception as e:
+                print(f"  Email generation failed for {retailer.get('business_name')}: {e}")
+                with done_lock:
+                    failures.append((retailer, str(e)))
+                return
+            deliver(index, email)
+        
+        if not self.client:
+            # Template path: render every retailer in one vectorized pass
+            from template_renderer import TemplateRenderer
+            
+            rendered = TemplateRenderer().render(pd.DataFrame(retailers))
+            for index, row in enumerate(rendered.itertuples(index=False)):
+                deliver(index, EmailOutput(**row._asdict()))
+            return GenerationResult(results)
+        
+        if self.leads_per_request > 1:
+            pending = []
+            for index, retailer in enumerate(retailers):
+                cached = self.cached_email(retailer)
+                if cached:
+                    deliver(index, cached)
+                else:
+                    pending.append(index)
+            
+            size = self.leads_per_request
+            groups = [pending[i:i + size] for i in range(0, len(pending), size)]
+            task = lambda group: self._generate_group_or_split(retailers, group, deliver, work)
+        else:
+            groups = range(len(retailers))
+            task = work
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            list(pool.map(task, groups))
+        
+        if self.client:
+            used = self.usage.since(usage_before)
+            print(f"  Token usage: {used.summary()} (~${used.cost_usd(self.model):.4f})")
+        if self.cache is not None:
+            print(f"  Email cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        if failures:
+            print(f"  ⚠ {len(failures)} of {len(retailers)} emails failed")
+        return GenerationResult(results, failures)
+    
+    def _generate_group_or_split(
+        self,
+        retailers: List[Dict],
+        indexes: List[int],
+        deliver: Callable[[int, EmailOutput], None],
+        work: Callable[[int], None]
+    ):
+        """
+        Generate a group of emails in one request. Leads the response
+        left out or garbled are split in half and retried, down to single
+        leads on the one-email path.
+        """
+        if len(indexes) == 1:
+            work(indexes[0])
+            return
+        
+        group = [retailers[i] for i in indexes]
+        try:
+            emails = self._with_backoff(lambda: self._generate_group(group))
+        except Exception as e:
+            print(f"  Group of {len(group)} emails failed: {e}")
+            emails = {}
+        
+        missing = []
+        for lead_id, (index, retailer) in enumerate(zip(indexes, group)):
+            email = emails.get(str(lead_id))
+            if email is None:
+                missing.append(index)
+                continue
+            self.cache_email(retailer, email)
+            deliver(index, email)
+        
+        if missing:
+            print(f"  Retrying {len(missing)} of {len(group)} leads in smaller groups")
+            half = (len(missing) + 1) // 2
+            for part in (missing[:half], missing[half:]):
+                if part:
+                    self._generate_group_or_split(retailers, part, deliver, work)
+    
+    def generate_with_backoff(self, retailer: Dict) -> EmailOutput:
+        """generate_email under the shared limiter, retrying rate-limit/overload errors."""
+        cached = self.cached_email(retailer)
+        if cached:
+            return cached
+        
+        if self.client:
+            return self._with_backoff(lambda: self._generate_uncached(retailer, self._sender({})))
+        return self._with_backoff(lambda: self.generate_email(retailer))
+    
+    def _with_backoff(self, call: Callable):
+        """
+        Run call under the shared limiter, retrying rate-limit/overload
+        errors (which also shrink the limit) and transient failures.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                result = call()
+            except Exception as e:
+                overloaded = is_overloaded(e)
+                self.limiter.release(overloaded=overloaded)
+                if not (overloaded or is_transient(e)) or attempt == self.max_retries:
+                    raise
+                self.metrics.inc("llm.retries")
+                time.sleep(self._retry_delay(e, attempt))
+            else:
+                self.limiter.release()
+                return result
+    
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        """Server's retry-after if present, else full-jitter exponential backoff."""
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            return min(60.0, float(retry_after))
+        except (TypeError, ValueError):
+            return random.uniform(0, min(60, 2 ** attempt))
+    
     def generate_batch(
         self,
         retailers: List[Dict],
         output_file: Optional[str] = None
     ) -> List[Dict]:
-        """Generate emails for a batch of retailers."""
+        """Generate emails for a batch of retailers (concurrently, in order)."""
         results = []
+        emails = self.generate_many(retailers).emails
         
-        for i, retailer in enumerate(retailers):
-            print(f"Generating email {i+1}/{len(retailers)}: {retailer.get('business_name')}")
-            
-            email = self.generate_email(retailer)
+        for retailer, email in zip(retailers, emails):
+            if email is None:
+                continue
             
             result = {
                 "retailer_id": retailer.get('retailer_id'),
@@ -308,7 +1031,8 @@ Either way, no hard feelings. Just thought it'd be a fit.
                     "follow_up_1": email.follow_up_1,
                     "follow_up_2": email.follow_up_2
                 },
-                "personalization_notes": email.personalization_notes
+                "personalization_notes": email.personalization_notes,
+                "email_variant": email.variant
             }
             results.append(result)
         
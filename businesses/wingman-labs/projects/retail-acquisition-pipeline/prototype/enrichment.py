@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Contact Enrichment
+
+Pluggable provider chain for finding a store's owner/manager contact:
+Apollo.io, then Hunter.io, then whatever else gets plugged in. Each
+retailer walks the chain until a provider returns an email with enough
+confidence; retailers are enriched concurrently. Every provider's
+answers (including "nothing found") are cached per domain or place id
+with a per-provider TTL, so reruns don't pay for the same lookup twice.
+"""
+
+import json
+import time
+import random
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from db import SQLiteStore
+from http_client import HttpClient, HttpError
+from variants import VariantAssigner
+
+# Titles worth emailing about stocking a new product
+DECISION_MAKER_TITLES = ["owner", "co-owner", "founder", "president", "general manager", "store manager"]
+
+# Demo enrichment: whether a retailer "has" a findable contact
+DEMO_CONTACT_FOUND = VariantAssigner("demo_contact_found", ["found", "not_found"], [7, 3])
+
+
+def website_domain(website: Optional[str]) -> Optional[str]:
+    """Registrable-looking host of a website URL, without www."""
+    if not website:
+        return None
+    host = urlparse(website if "://" in website else f"http://{website}").hostname or ""
+    host = host.lower().removeprefix("www.")
+    return host or None
+
+
+def lookup_key(retailer: Dict) -> str:
+    """Cache key for provider results: domain, else place id, else retailer_id."""
+    domain = website_domain(retailer.get('website'))
+    if domain:
+        return f"domain:{domain}"
+    if retailer.get('google_place_id'):
+        return f"place:{retailer['google_place_id']}"
+    return f"retailer:{retailer.get('retailer_id')}"
+
+
+class EnrichmentCache(SQLiteStore):
+    """(provider, lookup key) -> contact dict or None, with per-provider TTL."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS provider_results (
+            provider TEXT NOT NULL,
+            lookup_key TEXT NOT NULL,
+            result TEXT,
+            cached_at REAL NOT NULL,
+            PRIMARY KEY (provider, lookup_key)
+        );
+    """
+
+    # Sentinel for "not cached" (None is a cached miss)
+    MISSING = object()
+
+    def get(self, provider: str, key: str, ttl_seconds: float):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, cached_at FROM provider_results WHERE provider = ? AND lookup_key = ?",
+                (provider, key)
+            ).fetchone()
+
+        if not row or time.time() - row[1] >= ttl_seconds:
+            return self.MISSING
+        return json.loads(row[0]) if row[0] is not None else None
+
+    def set(self, provider: str, key: str, result: Optional[Dict]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO provider_results (provider, lookup_key, result, cached_at) "
+                "VALUES (?, ?, ?, ?)",
+                (provider, key, json.dumps(result) if result is not None else None, time.time())
+            )
+            self._conn.commit()
+
+
+class EnrichmentProvider(ABC):
+    """
+    One contact source.
+
+    Subclasses implement lookup(), returning a contact dict (name, email,
+    phone, title, confidence in [0, 1]) or None, and raising on errors
+    that shouldn't be cached.
+    """
+
+    name = "provider"
+    ttl_days: float = 30
+
+    @abstractmethod
+    def lookup(self, retailer: Dict) -> Optional[Dict]:
+        ...
+
+    def cache_key(self, retailer: Dict) -> str:
+        return lookup_key(retailer)
+
+
+class ApolloProvider(EnrichmentProvider):
+    """Decision makers at the store's domain, from Apollo.io people search."""
+
+    name = "apollo"
+    ttl_days = 30
+    url = "https://api.apollo.io/api/v1/mixed_people/search"
+
+    def __init__(self, api_key: str, http_client: Optional[HttpClient] = None):
+        self.api_key = api_key
+        self.http = http_client or HttpClient()
+
+    def lookup(self, retailer: Dict) -> Optional[Dict]:
+        domain = website_domain(retailer.get('website'))
+        if not domain:
+            return None
+
+        response = self.http.post(
+            self.url,
+            headers={"X-Api-Key": self.api_key, "Content-Type": "application/json"},
+            json={"q_organization_domains": domain, "person_titles": DECISION_MAKER_TITLES, "per_page": 5}
+        )
+        for person in response.json().get("people", []):
+            email = person.get("email")
+            if not email or email.startswith("email_not_unlocked"):
+                continue
+            return {
+                'name': " ".join(filter(None, [person.get("first_name"), person.get("last_name")])) or None,
+                'email': email,
+                'phone': retailer.get('phone'),
+                'title': person.get("title"),
+                'confidence': 0.95 if person.get("email_status") == "verified" else 0.7
+            }
+        return None
+
+
+class HunterProvider(EnrichmentProvider):
+    """Best decision-maker address from Hunter.io domain search."""
+
+    name = "hunter"
+    ttl_days = 60
+    url = "https://api.hunter.io/v2/domain-search"
+
+    def __init__(self, api_key: str, http_client: Optional[HttpClient] = None):
+        self.api_key = api_key
+        self.http = http_client or HttpClient()
+
+    def lookup(self, retailer: Dict) -> Optional[Dict]:
+        domain = website_domain(retailer.get('website'))
+        if not domain:
+            return None
+
+        response = self.http.get(self.url, params={"domain": domain, "api_key": self.api_key, "limit": 10})
+        emails = response.json().get("data", {}).get("emails", [])
+        if not emails:
+            return None
+
+        def rank(entry: Dict):
+            position = (entry.get("position") or "").lower()
+            senior = any(title in position for title in DECISION_MAKER_TITLES)
+            return (senior, entry.get("confidence") or 0)
+
+        best = max(emails, key=rank)
+        return {
+            'name': " ".join(filter(None, [best.get("first_name"), best.get("last_name")])) or None,
+            'email': best.get("value"),
+            'phone': retailer.get('phone'),
+            'title': best.get("position"),
+            'confidence': (best.get("confidence") or 0) / 100
+        }
+
+
+class DemoProvider(EnrichmentProvider):
+    """Placeholder owner contact for ~70% of retailers (demo runs only)."""
+
+    name = "demo_enrichment"
+    ttl_days = 0
+
+    def lookup(self, retailer: Dict) -> Optional[Dict]:
+        if DEMO_CONTACT_FOUND.assign(retailer['retailer_id']) == "not_found":
+            return None
+
+        # Generate plausible owner email
+        business_name = retailer.get('business_name', '')
+        domain = business_name.lower().replace(' ', '').replace("'", '')[:15]
+        return {
+            'name': f"Owner of {business_name}",
+            'email': f"info@{domain}.com",
+            'phone': retailer.get('phone'),
+            'title': 'Owner',
+            'confidence': 1.0
+        }
+
+
+class FakeProvider(EnrichmentProvider):
+    """
+    Local stand-in for a paid provider, for tests and load runs.
+
+    Answers from a fixed {lookup key: contact} table, or deterministically
+    "finds" hit_rate of retailers, after latency seconds; raises for
+    fail_rate of lookups.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        contacts: Optional[Dict[str, Dict]] = None,
+        hit_rate: float = 0.5,
+        confidence: float = 0.9,
+        latency: float = 0.05,
+        fail_rate: float = 0.0,
+        ttl_days: float = 30
+    ):
+        self.name = name
+        self.contacts = contacts
+        self.hit_rate = hit_rate
+        self.confidence = confidence
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.ttl_days = ttl_days
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+        self._draws = VariantAssigner(f"fake:{name}", ["hit", "miss"], [hit_rate, 1 - hit_rate])
+
+    def lookup(self, retailer: Dict) -> Optional[Dict]:
+        with self._calls_lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.latency)
+
+        key = self.cache_key(retailer)
+        if random.Random(f"{self.name}:{call}:{key}").random() < self.fail_rate:
+            raise HttpError(f"{self.name}: simulated failure", status_code=503)
+
+        if self.contacts is not None:
+            return self.contacts.get(key)
+        if self._draws.assign(key) == "miss":
+            return None
+        return {
+            'name': f"Owner of {retailer.get('business_name')}",
+            'email': f"owner@{key.split(':', 1)[1].replace(' ', '')}",
+            'phone': retailer.get('phone'),
+            'title': 'Owner',
+            'confidence': self.confidence
+        }
+
+
+class ProviderChain:
+    """
+    Runs providers in order per retailer, stopping at the first email
+    with confidence >= min_confidence; otherwise keeps the best partial
+    answer. Retailers are looked up max_workers at a time.
+    """
+
+    def __init__(
+        self,
+        providers: List[EnrichmentProvider],
+        cache: Optional[EnrichmentCache] = None,
+        min_confidence: float = 0.8,
+        max_workers: int = 8
+    ):
+        self.providers = providers
+        self.cache = cache
+        self.min_confidence = min_confidence
+        self.max_workers = max_workers
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def enrich(self, retailer: Dict) -> Dict:
+        """Contact for one retailer: name, email, phone, title, source."""
+        best = None
+        best_source = None
+
+        for provider in self.providers:
+            contact = self._lookup(provider, retailer)
+            if not contact or not contact.get('email'):
+                continue
+
+            confidence = contact.get('confidence') or 0
+            if best is None or confidence > (best.get('confidence') or 0):
+                best, best_source = contact, provider.name
+            if confidence >= self.min_confidence:
+                break
+
+        if best is None:
+            return {
+                'name': None,
+                'email': None,
+                'phone': retailer.get('phone'),
+                'title': None,
+                'source': 'not_found'
+            }
+        return {**best, 'phone': best.get('phone') or retailer.get('phone'), 'source': best_source}
+
+    def enrich_many(
+        self,
+        retailers: List[Dict],
+        on_result: Optional[Callable[[Dict, Dict], None]] = None
+    ) -> List[Optional[Dict]]:
+        """
+        Enrich retailers concurrently.
+
+        Returns:
+            One contact per retailer, in input order (None if its lookup
+            raised); on_result gets each retailer and contact as it finishes
+        """
+        results: List[Optional[Dict]] = [None] * len(retailers)
+
+        def work(index: int):
+            retailer = retailers[index]
+            try:
+                contact = self.enrich(retailer)
+            except Exception as e:
+                print(f"  Enrichment failed for {retailer.get('business_name')}: {e}")
+                return
+            results[index] = contact
+            if on_result:
+                on_result(retailer, contact)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(work, range(len(retailers))))
+
+        return results
+
+    def summary(self) -> str:
+        parts = []
+        for provider in self.providers:
+            name = provider.name
+            parts.append(f"{name}: {self.stats[f'{name}.calls']} calls, "
+                         f"{self.stats[f'{name}.cache_hits']} cached, "
+                         f"{self.stats[f'{name}.errors']} errors")
+        return "; ".join(parts)
+
+    def _lookup(self, provider: EnrichmentProvider, retailer: Dict) -> Optional[Dict]:
+        """One provider's answer, from its cache when fresh."""
+        key = provider.cache_key(retailer)
+        ttl_seconds = provider.ttl_days * 86400
+
+        if self.cache and ttl_seconds > 0:
+            cached = self.cache.get(provider.name, key, ttl_seconds)
+            if cached is not EnrichmentCache.MISSING:
+                self._count(f"{provider.name}.cache_hits")
+                return cached
+
+        self._count(f"{provider.name}.calls")
+        try:
+            contact = provider.lookup(retailer)
+        except (HttpError, ValueError) as e:
+            # Not cached: a failed call says nothing about the store
+            self._count(f"{provider.name}.errors")
+            print(f"  {provider.name} lookup failed for {retailer.get('business_name')}: {e}")
+            return None
+
+        if self.cache and ttl_seconds > 0:
+            self.cache.set(provider.name, key, contact)
+        return contact
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
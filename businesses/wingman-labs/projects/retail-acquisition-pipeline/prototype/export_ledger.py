@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Export Ledger
+
+Append-only record of what has already been handed to the outreach
+tool: one line per exported lead with a hash of the content that would
+be sent (recipient, subject, body, follow-ups). Incremental exports only
+emit leads that are new or whose content changed, so reruns don't
+re-import (and double-send) the same leads. The ledger is loaded once
+into a dict, so each check is O(1); compaction folds the log down to one
+line per lead.
+
+Leads are keyed by their strongest identity key (place id, phone, name +
+address; see identity.py) rather than retailer_id, which is only stable
+within one data_dir: shards and fresh data dirs give the same store a
+different id, and must still see it as exported:
+
+    python export_ledger.py --data-dir data stats
+    python export_ledger.py --data-dir data compact
+"""
+
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from storage import RecordStore
+from identity import primary_key
+
+# What a lead's outreach consists of; any change means a re-export
+CONTENT_FIELDS = ("contact_email", "subject", "body", "follow_up_1", "follow_up_2")
+
+
+def content_hash(retailer: Dict) -> str:
+    """sha256 (truncated) over the fields that end up in the recipient's inbox."""
+    email = retailer.get('email') or {}
+    content = {
+        "contact_email": (retailer.get('contact_email') or "").strip().lower(),
+        **{k: email.get(k) or "" for k in CONTENT_FIELDS[1:]}
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()[:20]
+
+
+def lead_key(retailer: Dict) -> str:
+    """Ledger key: strongest identity key, else proximity key, else retailer_id."""
+    return primary_key(retailer) or f"retailer:{retailer['retailer_id']}"
+
+
+class ExportLedger:
+    """lead_key -> content hash of its last export, backed by a JSONL log."""
+
+    def __init__(self, path: str = "data/export_ledger.jsonl"):
+        self.store = RecordStore(path, key_field="lead_key")
+        # Lines written before lead keys were keyed by retailer_id; they
+        # still match the same data_dir's retailers (see is_new)
+        self._exported: Dict[str, str] = {
+            key: record["content_hash"] for key, record in self.store.latest().items()
+        }
+        self.skipped = 0
+
+    def __contains__(self, retailer: Dict) -> bool:
+        return lead_key(retailer) in self._exported or retailer['retailer_id'] in self._exported
+
+    def __len__(self) -> int:
+        return len(self._exported)
+
+    def is_new(self, retailer: Dict) -> Tuple[bool, str]:
+        """(not exported with this exact content yet, the content hash)."""
+        digest = content_hash(retailer)
+        previous = self._exported.get(lead_key(retailer)) or self._exported.get(retailer['retailer_id'])
+        return previous != digest, digest
+
+    def new_or_changed(self, retailers: Iterable[Dict]) -> Iterator[Dict]:
+        """Lazily drop leads already exported with the same content (counted in skipped)."""
+        for retailer in retailers:
+            if retailer.get('contact_email') and retailer.get('email'):
+                new, _ = self.is_new(retailer)
+                if not new:
+                    self.skipped += 1
+                    continue
+            yield retailer
+
+    def record(self, exported: List[Tuple[Dict, str]]):
+        """
+        Append (retailer, export file) pairs in one write. Call only once
+        the files are complete, so a crashed export is retried, not lost.
+        """
+        entries = []
+        for retailer, export_file in exported:
+            digest = content_hash(retailer)
+            key = lead_key(retailer)
+            self._exported[key] = digest
+            entries.append({
+                "lead_key": key,
+                "retailer_id": retailer['retailer_id'],
+                "content_hash": digest,
+                "export_file": export_file,
+                "exported_at": datetime.utcnow().isoformat()
+            })
+        if entries:
+            self.store.append_many("exported", entries)
+
+    def compact(self) -> Tuple[int, int]:
+        """Rewrite the log as one line per lead; returns (lines before, after)."""
+        before = sum(1 for _ in self.store.iter_entries())
+        self.store.compact()
+        return before, len(self._exported)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact the export ledger")
+    parser.add_argument("--data-dir", default="data", help="Data directory")
+    parser.add_argument("command", choices=["stats", "compact"])
+    args = parser.parse_args()
+
+    path = f"{args.data_dir}/export_ledger.jsonl"
+    ledger = ExportLedger(path)
+    size_before = os.path.getsize(path) if os.path.exists(path) else 0
+
+    if args.command == "compact":
+        before, after = ledger.compact()
+        size_after = os.path.getsize(path) if os.path.exists(path) else 0
+        print(f"Compacted {path}: {before} -> {after} lines, "
+              f"{size_before / 1024:.1f} -> {size_after / 1024:.1f} KB")
+    else:
+        lines = sum(1 for _ in ledger.store.iter_entries())
+        print(f"{path}: {len(ledger)} leads exported, {lines} lines, {size_before / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
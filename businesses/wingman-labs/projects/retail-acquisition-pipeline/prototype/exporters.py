@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Outreach Exporters
+
+Streaming CSV export for email automation tools. Records are consumed
+from any iterator, flattened once per lead, mapped to the target tool's
+columns through a format registry (Instantly, Smartlead; add others with
+register_format), and written in buffered chunks. Exports can be split
+into part files of at most rows_per_file leads (import size limits) and
+gzipped. Memory use is one chunk of rows, however many leads there are:
+
+    python exporters.py data/runs/<run_id>/retailers.jsonl --format smartlead --rows-per-file 5000 --gzip
+"""
+
+import io
+import os
+import csv
+import glob
+import gzip
+import argparse
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from storage import RecordStore
+
+# An output column: (header, flat lead field name or function of the flat lead)
+Column = Tuple[str, Union[str, Callable[[Dict], object]]]
+
+EXPORT_FORMATS: Dict[str, List[Column]] = {}
+
+
+def register_format(name: str, columns: List[Column]):
+    """Add (or replace) an export target's column mapping."""
+    EXPORT_FORMATS[name] = columns
+
+
+register_format("instantly", [
+    ("email", "email"),
+    ("first_name", "first_name"),
+    ("last_name", "last_name"),
+    ("company_name", "company_name"),
+    ("phone", "phone"),
+    ("website", "website"),
+    ("custom_subject", "subject"),
+    ("custom_body", "body"),
+    ("custom_follow_up_1", "follow_up_1"),
+    ("custom_follow_up_2", "follow_up_2"),
+    # Custom fields
+    ("business_type", "business_type"),
+    ("city", "city"),
+    ("state", "state"),
+    ("retailer_id", "retailer_id"),
+    ("email_variant", "email_variant")
+])
+
+register_format("smartlead", [
+    ("email", "email"),
+    ("first_name", "first_name"),
+    ("last_name", "last_name"),
+    ("company_name", "company_name"),
+    ("phone_number", "phone"),
+    ("website", "website"),
+    ("location", lambda lead: ", ".join(filter(None, [lead["city"], lead["state"]]))),
+    # Custom fields, referenced in sequences as {{subject}} etc.
+    ("subject", "subject"),
+    ("body", "body"),
+    ("follow_up_1", "follow_up_1"),
+    ("follow_up_2", "follow_up_2"),
+    ("business_type", "business_type"),
+    ("retailer_id", "retailer_id"),
+    ("email_variant", "email_variant")
+])
+
+
+def is_ready(retailer: Dict) -> bool:
+    """Has both a contact email and a generated email."""
+    return bool(retailer.get('contact_email') and retailer.get('email'))
+
+
+def flatten_lead(retailer: Dict) -> Dict:
+    """Every field an export format can map, computed once per lead."""
+    first_name, _, last_name = (retailer.get('contact_name') or '').partition(' ')
+    email = retailer['email']
+    return {
+        'email': retailer.get('contact_email'),
+        'first_name': first_name,
+        'last_name': last_name,
+        'company_name': retailer.get('business_name'),
+        'phone': retailer.get('phone', ''),
+        'website': retailer.get('website', ''),
+        'subject': email['subject'],
+        'body': email['body'],
+        'follow_up_1': email.get('follow_up_1', ''),
+        'follow_up_2': email.get('follow_up_2', ''),
+        'business_type': retailer.get('business_type'),
+        'city': retailer.get('city'),
+        'state': retailer.get('state'),
+        'retailer_id': retailer.get('retailer_id'),
+        'email_variant': retailer.get('email_variant', '')
+    }
+
+
+@dataclass
+class ExportResult:
+    """Files written (in order) and the number of lead rows in them."""
+    files: List[str] = field(default_factory=list)
+    rows: int = 0
+
+
+class ExportWriter:
+    """
+    Writes ready leads to one CSV, or to part files of at most
+    rows_per_file rows each.
+
+    - path: e.g. data/instantly_import.csv; parts are named
+      instantly_import.part-001.csv, and ".gz" is appended when gzipped
+    - chunk_rows: rows buffered in memory between writes
+    """
+
+    def __init__(
+        self,
+        path: str,
+        export_format: str = "instantly",
+        rows_per_file: Optional[int] = None,
+        compress: bool = False,
+        chunk_rows: int = 1000
+    ):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {export_format!r}; "
+                             f"registered: {', '.join(sorted(EXPORT_FORMATS))}")
+        self.path = path
+        self.export_format = export_format
+        self.columns = EXPORT_FORMATS[export_format]
+        self.rows_per_file = rows_per_file
+        self.compress = compress
+        self.chunk_rows = chunk_rows
+
+    def write(
+        self,
+        retailers: Iterable[Dict],
+        on_row: Optional[Callable[[Dict, str], None]] = None
+    ) -> ExportResult:
+        """
+        Export every ready lead from retailers (consumed lazily).
+
+        on_row gets each exported retailer and the file it went to. Part
+        files left over from an earlier, larger export are removed once
+        the new files are in place; an export with no ready leads still
+        writes a header-only file.
+        """
+        result = ExportResult()
+        header = [name for name, _ in self.columns]
+        getters = [
+            source if callable(source) else (lambda lead, key=source: lead[key])
+            for _, source in self.columns
+        ]
+
+        out = None
+        rows_in_file = 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        pending = 0
+
+        for retailer in retailers:
+            if not is_ready(retailer):
+                continue
+
+            if out is None or (self.rows_per_file and rows_in_file >= self.rows_per_file):
+                if out is not None:
+                    self._flush(buffer, out)
+                    pending = 0
+                    self._close(out, result)
+                out = self._open(len(result.files) + 1)
+                writer.writerow(header)
+                rows_in_file = 0
+
+            lead = flatten_lead(retailer)
+            writer.writerow([get(lead) for get in getters])
+            rows_in_file += 1
+            result.rows += 1
+            pending += 1
+            if on_row:
+                on_row(retailer, out["path"])
+
+            if pending >= self.chunk_rows:
+                self._flush(buffer, out)
+                pending = 0
+
+        if out is None:
+            out = self._open(1)
+            writer.writerow(header)
+        self._flush(buffer, out)
+        self._close(out, result)
+        self._remove_stale_parts(result.files)
+        return result
+
+    def part_path(self, part: int) -> str:
+        stem, ext = os.path.splitext(self.path)
+        path = f"{stem}.part-{part:03d}{ext}" if self.rows_per_file else self.path
+        return f"{path}.gz" if self.compress else path
+
+    def _open(self, part: int) -> Dict:
+        """Part file handle, written under a temp name until closed."""
+        path = self.part_path(part)
+        tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        handle = (
+            gzip.open(tmp_path, "wt", newline="", encoding="utf-8") if self.compress
+            else open(tmp_path, "w", newline="", encoding="utf-8")
+        )
+        return {"path": path, "tmp_path": tmp_path, "handle": handle}
+
+    @staticmethod
+    def _flush(buffer: io.StringIO, out: Dict):
+        out["handle"].write(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+
+    @staticmethod
+    def _close(out: Dict, result: ExportResult):
+        out["handle"].close()
+        os.replace(out["tmp_path"], out["path"])
+        result.files.append(out["path"])
+
+    def _remove_stale_parts(self, keep: List[str]):
+        """Part files (and temp files) of earlier exports not in keep."""
+        stem, ext = os.path.splitext(self.path)
+        for path in glob.glob(f"{glob.escape(stem)}.part-*{ext}*"):
+            if path not in keep:
+                os.remove(path)
+
+
+def export_leads(
+    retailers: Iterable[Dict],
+    path: str,
+    export_format: str = "instantly",
+    rows_per_file: Optional[int] = None,
+    compress: bool = False,
+    on_row: Optional[Callable[[Dict, str], None]] = None
+) -> ExportResult:
+    """Convenience wrapper: ExportWriter(...).write(retailers)."""
+    return ExportWriter(path, export_format, rows_per_file, compress).write(retailers, on_row=on_row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a run's leads for an outreach tool")
+    parser.add_argument("store", help="Run log, e.g. data/runs/<run_id>/retailers.jsonl")
+    parser.add_argument("--format", dest="export_format", choices=sorted(EXPORT_FORMATS), default="instantly")
+    parser.add_argument("--output", help="Output CSV path (default: next to the run log)")
+    parser.add_argument("--rows-per-file", type=int, help="Split into part files of this many leads")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output files")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(os.path.dirname(args.store), f"{args.export_format}_import.csv")
+    result = export_leads(
+        (record for _, record in RecordStore(args.store).iter_latest()),
+        output,
+        args.export_format,
+        args.rows_per_file,
+        args.gzip
+    )
+    print(f"Exported {result.rows} leads to {len(result.files)} files:")
+    for path in result.files:
+        print(f"   {path}")
+
+
+if __name__ == "__main__":
+    main()
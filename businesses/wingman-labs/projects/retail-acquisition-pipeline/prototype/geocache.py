@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Geocode Cache
+
+Persistent geocode cache for RetailerScraper. Zip codes and cities don't
+move, so each location is geocoded once and served from an in-process LRU
+backed by SQLite on every later run.
+"""
+
+import re
+import sys
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from db import SQLiteStore
+
+
+def normalize_location(location: str) -> str:
+    """Normalize a location string so "90012, CA" and " 90012 ,ca" share a key."""
+    location = re.sub(r"\s*,\s*", ", ", location.strip().lower())
+    return re.sub(r"\s+", " ", location)
+
+
+class GeocodeCache(SQLiteStore):
+    """Location string -> (lat, lng), with TTL and an in-process LRU in front."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS geocodes (
+            location TEXT PRIMARY KEY,
+            lat REAL NOT NULL,
+            lng REAL NOT NULL,
+            cached_at REAL NOT NULL
+        );
+    """
+
+    def __init__(
+        self,
+        path: str = "data/geocode_cache.db",
+        ttl_days: float = 90,
+        lru_size: int = 1024
+    ):
+        super().__init__(path)
+        self.ttl_seconds = ttl_days * 86400
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lru_lock = threading.Lock()
+
+    def get(self, location: str) -> Optional[Tuple[float, float]]:
+        """Return cached coordinates, or None if missing or expired."""
+        key = normalize_location(location)
+        now = time.time()
+
+        with self._lru_lock:
+            entry = self._lru.get(key)
+            if entry:
+                coords, cached_at = entry
+                if now - cached_at < self.ttl_seconds:
+                    self._lru.move_to_end(key)
+                    return coords
+                del self._lru[key]
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lat, lng, cached_at FROM geocodes WHERE location = ?", (key,)
+            ).fetchone()
+
+        if not row or now - row[2] >= self.ttl_seconds:
+            return None
+
+        coords = (row[0], row[1])
+        self._remember(key, coords, row[2])
+        return coords
+
+    def set(self, location: str, coords: Tuple[float, float]):
+        """Store coordinates for a location."""
+        key = normalize_location(location)
+        cached_at = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocodes (location, lat, lng, cached_at) VALUES (?, ?, ?, ?)",
+                (key, coords[0], coords[1], cached_at)
+            )
+            self._conn.commit()
+
+        self._remember(key, tuple(coords), cached_at)
+
+    def prewarm(self, scraper, locations: List[str]) -> int:
+        """
+        Geocode every location not already cached.
+
+        Returns:
+            Number of locations that were geocoded (cache misses)
+        """
+        fetched = 0
+        for location in locations:
+            if self.get(location):
+                continue
+            if scraper._geocode(location):
+                fetched += 1
+            else:
+                print(f"Could not geocode location: {location}")
+        return fetched
+
+    def _remember(self, key: str, coords: Tuple[float, float], cached_at: float):
+        with self._lru_lock:
+            self._lru[key] = (coords, cached_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+
+def main():
+    """Pre-warm the geocode cache for a zip list."""
+    from scraper import RetailerScraper, GOOGLE_API_KEY, LA_METRO_ZIPS
+
+    parser = argparse.ArgumentParser(description="Pre-warm the geocode cache")
+    parser.add_argument("zips", nargs="*", help="Zip codes (default: LA_METRO_ZIPS)")
+    parser.add_argument("--suffix", default=", California", help="Appended to each zip")
+    parser.add_argument("--db", default="data/geocode_cache.db", help="Cache database path")
+    args = parser.parse_args()
+
+    if not GOOGLE_API_KEY:
+        print("Error: Set GOOGLE_PLACES_API_KEY environment variable")
+        sys.exit(1)
+
+    cache = GeocodeCache(args.db)
+    scraper = RetailerScraper(GOOGLE_API_KEY, geocode_cache=cache)
+    locations = [f"{z}{args.suffix}" for z in (args.zips or LA_METRO_ZIPS)]
+
+    fetched = cache.prewarm(scraper, locations)
+    print(f"Geocoded {fetched} new locations out of {len(locations)} requested")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Pooled HTTP Client
+
+Shared requests.Session wrapper for Google Places / Geocoding calls:
+keep-alive connection pooling with a per-host limit, timeouts, and
+exponential backoff with jitter on 429/5xx that honors Retry-After.
+Every attempt's latency, status and retry is recorded in metrics.py.
+"""
+
+import time
+import random
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import METRICS, MetricsRegistry
+
+
+class HttpError(Exception):
+    """A request that failed permanently or ran out of retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class HttpClient:
+    """
+    Pooled, retrying HTTP client.
+
+    One instance is meant to be shared by every caller (including worker
+    threads) so connections to googleapis.com are reused across requests.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        timeout: Tuple[float, float] = (5.0, 30.0),
+        pool_connections: int = 4,
+        max_connections_per_host: int = 16,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.metrics = metrics or METRICS
+
+        # pool_block keeps us at max_connections_per_host instead of
+        # opening throwaway connections when every slot is busy
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=max_connections_per_host,
+            pool_block=True,
+            max_retries=0
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying transient failures.
+
+        Raises:
+            HttpError: on a non-retryable error status, or once retries
+                are exhausted for 429/5xx and connection errors
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlparse(url).hostname
+
+        attempt = 0
+        while True:
+            response = None
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = HttpError(f"{method} {url} failed: {e}")
+            finally:
+                self.metrics.observe("http.request.seconds", time.perf_counter() - start, host=host, method=method)
+                self.metrics.inc("http.requests", host=host,
+                                 status=response.status_code if response is not None else "network_error")
+
+            if response is not None:
+                if response.status_code < 400:
+                    return response
+
+                error = HttpError(
+                    f"{method} {url} returned {response.status_code}: {response.text[:200]}",
+                    status_code=response.status_code
+                )
+                if response.status_code not in self.RETRY_STATUSES:
+                    raise error
+
+            if attempt >= self.max_retries:
+                raise error
+
+            delay = self._retry_delay(attempt, response)
+            print(f"  Retrying {method} {url} in {delay:.1f}s ({error.status_code or 'network error'})")
+            self.metrics.inc("http.retries", host=host)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """Retry-After if the server sent one, else full-jitter exponential backoff."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(max(wait, 0.0), self.backoff_max)
+                except (TypeError, ValueError):
+                    pass
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Retailer Identity Index
+
+Persistent dedupe index that gives each physical store one stable
+retailer_id across zips, queries and runs. A store is matched on any of:
+Google place id, normalized phone, normalized name + address, or
+normalized name within ~50m. Every lookup is a primary-key hit.
+"""
+
+import re
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db import SQLiteStore
+
+# ~55m of latitude; neighbouring buckets are checked too
+GEO_BUCKET_DEGREES = 0.0005
+
+ADDRESS_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "boulevard": "blvd", "road": "rd",
+    "drive": "dr", "lane": "ln", "place": "pl", "court": "ct",
+    "highway": "hwy", "suite": "ste", "north": "n", "south": "s",
+    "east": "e", "west": "w",
+}
+
+NAME_STOPWORDS = {"the", "and", "inc", "llc", "co", "corp"}
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Last 10 digits of a phone number, or None if there aren't 10."""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    return digits[-10:] if len(digits) >= 10 else None
+
+
+def normalize_address(address: Optional[str]) -> str:
+    words = re.sub(r"[^a-z0-9 ]", " ", (address or "").lower()).split()
+    return " ".join(ADDRESS_ABBREVIATIONS.get(w, w) for w in words)
+
+
+def normalize_name(name: Optional[str]) -> str:
+    words = re.sub(r"[^a-z0-9 ]", " ", (name or "").lower().replace("&", " and ")).split()
+    return " ".join(w for w in words if w not in NAME_STOPWORDS)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def identity_keys(retailer: Dict) -> List[str]:
+    """Exact-match keys for a retailer, strongest first."""
+    keys = []
+
+    if retailer.get('google_place_id'):
+        keys.append(f"place:{retailer['google_place_id']}")
+
+    phone = normalize_phone(retailer.get('phone'))
+    if phone:
+        keys.append(f"phone:{phone}")
+
+    name = normalize_name(retailer.get('business_name'))
+    address = normalize_address(retailer.get('address'))
+    if name and address:
+        keys.append(f"addr:{_digest(name, address, retailer.get('zip_code') or '')}")
+
+    return keys
+
+
+def geo_keys(retailer: Dict, neighbours: bool = False) -> List[str]:
+    """
+    Proximity key (normalized name + ~50m bucket) for a retailer.
+
+    With neighbours=True, returns keys for the surrounding 3x3 block of
+    buckets so stores near a bucket edge still match.
+    """
+    name = normalize_name(retailer.get('business_name'))
+    lat, lng = retailer.get('latitude'), retailer.get('longitude')
+    if not (name and lat and lng):
+        return []
+
+    lat_b, lng_b = _bucket(lat), _bucket(lng)
+    offsets = (-1, 0, 1) if neighbours else (0,)
+    return [
+        _geo_key(name, lat_b + dy, lng_b + dx)
+        for dy in offsets for dx in offsets
+    ]
+
+
+def primary_key(retailer: Dict) -> Optional[str]:
+    """A retailer's strongest identity key (exact, else proximity), if any."""
+    keys = identity_keys(retailer) or geo_keys(retailer)
+    return keys[0] if keys else None
+
+
+def _bucket(degrees: float) -> int:
+    return int(degrees // GEO_BUCKET_DEGREES)
+
+
+def _geo_key(name: str, lat_bucket: int, lng_bucket: int) -> str:
+    return f"geo:{lat_bucket}:{lng_bucket}:{_digest(name)}"
+
+
+class RetailerIdentityIndex(SQLiteStore):
+    """Maps identity keys to stable retailer_ids."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS identity_keys (
+            key TEXT PRIMARY KEY,
+            retailer_id TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS retailers (
+            retailer_id TEXT PRIMARY KEY,
+            first_seen TEXT NOT NULL,
+            last_seen TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = "data/identity.db"):
+        super().__init__(path)
+
+    def resolve(self, retailer: Dict) -> Tuple[str, bool]:
+        """Resolve one retailer; see resolve_many."""
+        return self.resolve_many([retailer])[0]
+
+    def resolve_many(self, retailers: List[Dict]) -> List[Tuple[str, bool]]:
+        """
+        Find or assign the stable id for each retailer.
+
+        An unmatched retailer keeps its own retailer_id, which becomes its
+        stable id. All of a retailer's keys are registered against the
+        resolved id, so later sightings can match on any of them.
+
+        Returns:
+            (retailer_id, is_new) per retailer, in input order
+        """
+        now = datetime.utcnow().isoformat()
+        resolved = []
+
+        with self._lock:
+            for retailer in retailers:
+                keys = identity_keys(retailer)
+                retailer_id = (
+                    self._match(keys)
+                    or self._match(geo_keys(retailer, neighbours=True))
+                )
+
+                is_new = retailer_id is None
+                if is_new:
+                    retailer_id = retailer['retailer_id']
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO retailers (retailer_id, first_seen, last_seen) VALUES (?, ?, ?)",
+                        (retailer_id, now, now)
+                    )
+                else:
+                    self._conn.execute(
+                        "UPDATE retailers SET last_seen = ? WHERE retailer_id = ?", (now, retailer_id)
+                    )
+
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO identity_keys (key, retailer_id) VALUES (?, ?)",
+                    [(key, retailer_id) for key in keys + geo_keys(retailer)]
+                )
+                resolved.append((retailer_id, is_new))
+
+            self._conn.commit()
+
+        return resolved
+
+    def lookup_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Stable retailer_id per key, for keys already registered (read-only)."""
+        keys = list(keys)
+        found: Dict[str, str] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(
+                    f"SELECT key, retailer_id FROM identity_keys WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+        return found
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM retailers").fetchone()[0]
+
+    def _match(self, keys: List[str]) -> Optional[str]:
+        """retailer_id of the strongest key that is already known."""
+        if not keys:
+            return None
+
+        placeholders = ",".join("?" * len(keys))
+        rows = dict(self._conn.execute(
+            f"SELECT key, retailer_id FROM identity_keys WHERE key IN ({placeholders})", keys
+        ).fetchall())
+
+        for key in keys:
+            if key in rows:
+                return rows[key]
+        return None
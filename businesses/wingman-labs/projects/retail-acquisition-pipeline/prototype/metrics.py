@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Run Metrics
+
+Process-wide counters and latency histograms for finding a run's hot
+path: every HTTP call (by host), Places/Geocoding call, LLM request and
+pipeline stage is timed, and API calls, retries and token spend are
+counted against the stage they happened in. A run's metrics are written
+as JSON next to its checkpoint, and optionally in Prometheus text format
+(e.g. for node_exporter's textfile collector).
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Quantiles reported for every histogram
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Observations kept per histogram series for quantiles (count and sum
+# stay exact); beyond this, every other sample is dropped
+MAX_SAMPLES = 20000
+
+# A series: metric name plus sorted (label, value) pairs
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _series(name: str, labels: Dict) -> SeriesKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _escape(value) -> str:
+    """Prometheus label value escaping."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Histogram:
+    """Latency samples for one series."""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples: List[float] = []
+        self._stride = 1
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        if self.count % self._stride == 0:
+            self.samples.append(value)
+            if len(self.samples) >= MAX_SAMPLES:
+                self.samples = self.samples[::2]
+                self._stride *= 2
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.samples)
+        out = {"count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6)}
+        for q in QUANTILES:
+            out[f"p{int(q * 100)}"] = round(percentile(ordered, q), 6)
+        return out
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms.
+
+    Counters and histograms recorded while a stage() block is open get a
+    stage label, so API calls and tokens can be attributed per stage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters: Dict[SeriesKey, float] = defaultdict(float)
+            self.histograms: Dict[SeriesKey, Histogram] = defaultdict(Histogram)
+            self.stages: Dict[str, Dict] = {}
+            self.current_stage: Optional[str] = None
+            self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        labels.setdefault("stage", self.current_stage)
+        with self._lock:
+            self.counters[_series(name, labels)] += value
+
+    def observe(self, name: str, seconds: float, **labels):
+        labels.setdefault("stage", self.current_stage)
+        with self._lock:
+            self.histograms[_series(name, labels)].observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the block's duration under name (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a pipeline stage and label what happens inside it.
+
+        Yields a dict; set "records" in it to report throughput.
+        """
+        previous, self.current_stage = self.current_stage, name
+        result = {"records": 0}
+        start = time.perf_counter()
+        try:
+            yield result
+        finally:
+            seconds = time.perf_counter() - start
+            self.current_stage = previous
+            with self._lock:
+                self.stages[name] = {
+                    "seconds": round(seconds, 3),
+                    "records": result["records"],
+                    "records_per_second": round(result["records"] / seconds, 2) if seconds else 0.0
+                }
+
+    def to_dict(self) -> Dict:
+        """Everything recorded so far, as plain JSON-able data."""
+        def entry(key: SeriesKey, value) -> Dict:
+            name, labels = key
+            return {"name": name, "labels": dict(labels), **value}
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((k, h.summary()) for k, h in self.histograms.items())
+            stages = dict(self.stages)
+
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "counters": [entry(k, {"value": round(v, 6)}) for k, v in counters],
+            "histograms": [entry(k, h) for k, h in histograms]
+        }
+
+    def to_prometheus(self, prefix: str = "wingman_") -> str:
+        """Prometheus text exposition: counters, then histograms as summaries."""
+        data = self.to_dict()
+        lines = []
+
+        def metric_name(name: str) -> str:
+            return prefix + name.replace(".", "_").replace("-", "_")
+
+        def label_text(labels: Dict, **extra) -> str:
+            labels = {**labels, **extra}
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+        typed = set()
+        for counter in data["counters"]:
+            name = metric_name(counter["name"]) + "_total"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{label_text(counter['labels'])} {counter['value']}")
+
+        for histogram in data["histograms"]:
+            name = metric_name(histogram["name"])
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            for q in QUANTILES:
+                quantile = label_text(histogram["labels"], quantile=q)
+                lines.append(f"{name}{quantile} {histogram[f'p{int(q * 100)}']}")
+            lines.append(f"{name}_sum{label_text(histogram['labels'])} {histogram['sum']}")
+            lines.append(f"{name}_count{label_text(histogram['labels'])} {histogram['count']}")
+
+        for field in ("seconds", "records"):
+            name = metric_name(f"stage.{field}")
+            lines.append(f"# TYPE {name} gauge")
+            for stage, values in data["stages"].items():
+                lines.append(f"{name}{label_text({'stage': stage})} {values[field]}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: str, prometheus_path: Optional[str] = None):
+        """Write JSON (and Prometheus text) atomically."""
+        self._write_file(json_path, json.dumps(self.to_dict(), indent=2))
+        if prometheus_path:
+            self._write_file(prometheus_path, self.to_prometheus())
+
+    def hot_path(self, top: int = 5) -> List[Dict]:
+        """Histogram series with the most total time, slowest first."""
+        return sorted(self.to_dict()["histograms"], key=lambda h: h["sum"], reverse=True)[:top]
+
+    @staticmethod
+    def _write_file(path: str, text: str):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+# Shared by every component in the process (HTTP clients, scraper, LLM
+# generator, pipeline), like one Prometheus default registry
+METRICS = MetricsRegistry()
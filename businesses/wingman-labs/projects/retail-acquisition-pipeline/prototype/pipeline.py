@@ -12,13 +12,43 @@ Coordinates the full pipeline:
 
 import os
 import json
-import csv
+import time
+import argparse
+import importlib.util
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+from typing import Callable, List, Dict, Optional, Set, Tuple
+from dataclasses import dataclass, field
 
 from scraper import RetailerScraper, Retailer
-from email_generator import EmailGenerator
+from discovery import AsyncDiscoveryEngine
+from geocache import GeocodeCache
+from http_client import HttpClient
+from metrics import METRICS
+from coverage import CoveragePlanner
+from identity import RetailerIdentityIndex
+from scrape_state import ScrapeStateStore
+from checkpoint import RunCheckpoint, read_manifest
+from streaming import StreamingPipelineRunner
+from email_generator import EmailGenerator, EmailOutput, PROMPT_VERSION
+from email_cache import EmailCache
+from batch_backend import MessageBatchBackend
+from enrichment import (
+    ProviderChain,
+    EnrichmentCache,
+    ApolloProvider,
+    HunterProvider,
+    DemoProvider
+)
+from site_crawler import SiteCrawler, PageCache, WebsiteProvider
+from warehouse import LeadWarehouse
+from exporters import EXPORT_FORMATS, export_leads
+from export_ledger import ExportLedger
+
+# Options that only change how fast a run goes; a resumed run may use
+# different ones (every other option must match, see resume())
+THROUGHPUT_OPTIONS = {"max_concurrency", "requests_per_second", "llm_concurrency"}
 
 
 @dataclass
@@ -28,7 +58,13 @@ class PipelineStats:
     contacts_enriched: int = 0
     emails_generated: int = 0
     ready_for_outreach: int = 0
+    newly_exported: int = 0
+    # Retailers a stage gave up on; the run ends "partial" and a resume
+    # retries just them
+    failed_records: int = 0
     run_time_seconds: float = 0
+    # stage -> seconds, records, records_per_second (see metrics.py)
+    stages: Dict[str, Dict] = field(default_factory=dict)
 
 
 class RetailAcquisitionPipeline:
@@ -47,16 +83,142 @@ class RetailAcquisitionPipeline:
         google_api_key: Optional[str] = None,
         anthropic_api_key: Optional[str] = None,
         apollo_api_key: Optional[str] = None,
-        data_dir: str = "data"
+        hunter_api_key: Optional[str] = None,
+        data_dir: str = "data",
+        max_concurrency: int = 8,
+        requests_per_second: float = 5.0,
+        max_pages: int = 3,
+        discovery_mode: str = "radius",
+        incremental: bool = False,
+        freshness_hours: float = 168,
+        export_parquet: bool = False,
+        run_id: Optional[str] = None,
+        llm_concurrency: int = 8,
+        llm_backend: str = "interactive",
+        leads_per_request: int = 1,
+        crawl_websites: bool = False,
+        metrics_prometheus: Optional[str] = None,
+        warehouse: bool = False,
+        export_format: str = "instantly",
+        export_rows_per_file: Optional[int] = None,
+        export_gzip: bool = False,
+        incremental_export: bool = True,
+        output_dir: Optional[str] = None
     ):
         self.google_api_key = google_api_key or os.environ.get('GOOGLE_PLACES_API_KEY')
         self.anthropic_api_key = anthropic_api_key or os.environ.get('ANTHROPIC_API_KEY')
         self.apollo_api_key = apollo_api_key or os.environ.get('APOLLO_API_KEY')
+        self.hunter_api_key = hunter_api_key or os.environ.get('HUNTER_API_KEY')
         
+        # Caches and indexes shared across runs live in data_dir; this
+        # run's checkpoint, reports, exports and export ledger go to
+        # output_dir (the same unless e.g. a shard's own directory)
         self.data_dir = data_dir
+        self.output_dir = output_dir or data_dir
         os.makedirs(data_dir, exist_ok=True)
         
+        # Everything that shapes a run's output or spend, saved in the run
+        # manifest so a resume continues the same run (see from_run)
+        self.options = {
+            "max_concurrency": max_concurrency,
+            "requests_per_second": requests_per_second,
+            "max_pages": max_pages,
+            "discovery_mode": discovery_mode,
+            "incremental": incremental,
+            "freshness_hours": freshness_hours,
+            "export_parquet": export_parquet,
+            "llm_concurrency": llm_concurrency,
+            "llm_backend": llm_backend,
+            "leads_per_request": leads_per_request,
+            "crawl_websites": crawl_websites,
+            "export_format": export_format,
+            "export_rows_per_file": export_rows_per_file,
+            "export_gzip": export_gzip,
+            "incremental_export": incremental_export
+        }
+        
+        # Every stage appends per record to this run's keyed JSONL log
+        # (see storage.py); passing an existing run_id resumes that run
+        self.checkpoint = RunCheckpoint(self.output_dir, run_id)
+        self.llm_concurrency = llm_concurrency
+        
+        # "interactive": concurrent Messages calls; "batch": one Message
+        # Batches job per run (cheaper, slower; see batch_backend.py)
+        self.llm_backend = llm_backend
+        
+        # Retailers per interactive AI request (batch runs; streaming
+        # generates one email at a time)
+        self.leads_per_request = leads_per_request
+        
+        # Generated emails keyed by prompt inputs, shared across runs
+        self.email_cache = EmailCache(f"{data_dir}/email_cache.db", PROMPT_VERSION)
+        self.run_id = self.checkpoint.run_id
+        self.store = self.checkpoint.store
+        
+        # Optional indexed copy of every lead's latest state across runs,
+        # for queries like "unemailed liquor stores in 90028" (see warehouse.py)
+        self.warehouse = LeadWarehouse(f"{data_dir}/warehouse.db") if warehouse else None
+        
+        # Outreach tool format (see exporters.py), part-file size limit
+        # and compression for the export stage
+        self.export_format = export_format
+        self.export_rows_per_file = export_rows_per_file
+        self.export_gzip = export_gzip
+        
+        # Every export is recorded; incremental exports leave out leads
+        # already exported with the same content, so reruns don't
+        # re-import them (see export_ledger.py)
+        self.export_ledger = ExportLedger(f"{self.output_dir}/export_ledger.jsonl")
+        self.incremental_export = incremental_export
+        self.export_parquet = export_parquet
+        
+        # Discovery fan-out limits (shared across all locations)
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_pages = max_pages
+        
+        # "radius": circle around each location; "grid": adaptive tiles
+        # over the locations' bounding box (see coverage.py)
+        self.discovery_mode = discovery_mode
+        
+        # Stable retailer_ids and cross-run dedupe
+        self.identity_index = RetailerIdentityIndex(f"{data_dir}/identity.db")
+        
+        # Incremental mode: only refetch (area, query) pairs older than
+        # freshness_hours, and only pass new/changed retailers downstream
+        self.scrape_state = (
+            ScrapeStateStore(f"{data_dir}/scrape_state.db", freshness_hours)
+            if incremental else None
+        )
+        
+        # Retailer websites are crawled for published contacts first
+        # (see site_crawler.py), then paid providers are tried in order
+        self.crawler = (
+            SiteCrawler(PageCache(f"{data_dir}/page_cache.db"), max_concurrency=max_concurrency * 2)
+            if crawl_websites else None
+        )
+        self.enrichment = self._build_enrichment_chain()
+        
         self.stats = PipelineStats()
+        
+        # Stage/API timings and token spend; written to the run directory
+        # as metrics.json (plus Prometheus text if a path is given)
+        self.metrics = METRICS
+        self.metrics_prometheus = metrics_prometheus
+    
+    @classmethod
+    def from_run(cls, run_id: str, data_dir: str = "data", **overrides) -> 'RetailAcquisitionPipeline':
+        """
+        Pipeline for an existing run, built with the options the run was
+        started with; overrides are for options that aren't saved (API
+        keys, metrics, warehouse, output_dir) or only affect speed.
+        """
+        runs_root = overrides.get("output_dir") or data_dir
+        manifest = read_manifest(runs_root, run_id)
+        if not manifest:
+            raise ValueError(f"No run found with id {run_id} in {runs_root}/runs")
+        options = {**manifest.get("options", {}), **overrides}
+        return cls(data_dir=data_dir, run_id=run_id, **options)
     
     def run_full_pipeline(
         self,
@@ -75,47 +237,235 @@ class RetailAcquisitionPipeline:
         Returns:
             Summary dict with results and stats
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter()
+        self.metrics.reset()
         print("\n" + "="*60)
         print("WINGMAN LABS RETAIL ACQUISITION PIPELINE")
         print("="*60)
         
-        # Stage 1: Discover
-        print("\n📍 STAGE 1: DISCOVER RETAILERS")
-        print("-"*40)
-        retailers = self._stage_discover(locations, radius_miles)
-        
-        if max_retailers:
-            retailers = retailers[:max_retailers]
-        
-        self.stats.retailers_scraped = len(retailers)
-        print(f"✓ Found {len(retailers)} retailers")
-        
-        # Stage 2: Enrich
-        print("\n📧 STAGE 2: ENRICH CONTACTS")
-        print("-"*40)
-        enriched = self._stage_enrich(retailers)
-        self.stats.contacts_enriched = sum(1 for r in enriched if r.get('contact_email'))
-        print(f"✓ Enriched {self.stats.contacts_enriched} contacts")
-        
-        # Stage 3: Personalize
-        print("\n✍️ STAGE 3: GENERATE EMAILS")
-        print("-"*40)
-        with_emails = self._stage_personalize(enriched)
-        self.stats.emails_generated = sum(1 for r in with_emails if r.get('email'))
-        print(f"✓ Generated {self.stats.emails_generated} personalized emails")
-        
-        # Stage 4: Export
-        print("\n📤 STAGE 4: EXPORT FOR OUTREACH")
-        print("-"*40)
-        export_file = self._stage_export(with_emails)
-        self.stats.ready_for_outreach = len([r for r in with_emails if r.get('contact_email') and r.get('email')])
-        print(f"✓ Exported {self.stats.ready_for_outreach} leads ready for outreach")
+        self.checkpoint.start("batch", {
+            "locations": locations,
+            "radius_miles": radius_miles,
+            "max_retailers": max_retailers
+        }, self.options)
+        print(f"Run ID: {self.run_id}")
+        
+        with self._checkpointed_run():
+            # Stage 1: Discover
+            print("\n📍 STAGE 1: DISCOVER RETAILERS")
+            print("-"*40)
+            with self.metrics.stage("discover") as stage:
+                if self.checkpoint.stage_completed("discover"):
+                    retailers = self.checkpoint.discovered()
+                    print(f"  [Resumed - {len(retailers)} retailers from run {self.run_id}]")
+                else:
+                    retailers = self._stage_discover(locations, radius_miles, max_retailers)
+                    self.checkpoint.complete_stage("discover")
+                stage["records"] = len(retailers)
+            
+            self.stats.retailers_scraped = len(retailers)
+            print(f"✓ Found {len(retailers)} retailers")
+            
+            # Stage 2: Enrich
+            print("\n📧 STAGE 2: ENRICH CONTACTS")
+            print("-"*40)
+            with self.metrics.stage("enrich") as stage:
+                enriched = self._stage_enrich(retailers)
+                self.checkpoint.complete_stage("enrich")
+                stage["records"] = len(retailers)
+            self.stats.contacts_enriched = sum(1 for r in enriched if r.get('contact_email'))
+            print(f"✓ Enriched {self.stats.contacts_enriched} contacts")
+            
+            # Stage 3: Personalize
+            print("\n✍️ STAGE 3: GENERATE EMAILS")
+            print("-"*40)
+            with self.metrics.stage("personalize") as stage:
+                with_emails, failed = self._stage_personalize(enriched)
+                if not failed:
+                    self.checkpoint.complete_stage("personalize")
+                stage["records"] = len(enriched)
+            self.stats.emails_generated = sum(1 for r in with_emails if r.get('email'))
+            print(f"✓ Generated {self.stats.emails_generated} personalized emails")
+            
+            # Stage 4: Export
+            print("\n📤 STAGE 4: EXPORT FOR OUTREACH")
+            print("-"*40)
+            with self.metrics.stage("export") as stage:
+                export_files = self._stage_export(with_emails)
+                stage["records"] = len(with_emails)
+            self.stats.ready_for_outreach = len([r for r in with_emails if r.get('contact_email') and r.get('email')])
+            print(f"✓ Exported {self.stats.ready_for_outreach} leads ready for outreach")
+            self._commit_scrape_state(with_emails)
+            
+            if self.export_parquet:
+                self.store.to_parquet(f"{self.checkpoint.run_dir}/retailers.parquet")
         
         # Calculate run time
-        self.stats.run_time_seconds = (datetime.now() - start_time).total_seconds()
+        self.stats.run_time_seconds = time.perf_counter() - start_time
+        self.stats.stages = dict(self.metrics.stages)
+        
+        self._print_summary(export_files)
+        
+        return {
+            "run_id": self.run_id,
+            "stats": self.stats.__dict__,
+            "export_files": export_files,
+            "retailers": with_emails
+        }
+    
+    def resume(self) -> Dict:
+        """
+        Resume this pipeline's run_id with its original arguments.
+        
+        Retailers that already finished a stage in this run are not
+        redone; their stored output is reused. The pipeline must have the
+        options the run was started with (from_run builds one), since e.g.
+        a batch run resumed interactively would pay for its emails again.
+        """
+        if not self.checkpoint.exists:
+            raise ValueError(f"No run found with id {self.run_id} in {self.output_dir}/runs")
+        
+        manifest = self.checkpoint.manifest
+        changed = sorted(
+            name for name, value in manifest.get("options", {}).items()
+            if name not in THROUGHPUT_OPTIONS and self.options.get(name) != value
+        )
+        if changed:
+            raise ValueError(
+                f"Run {self.run_id} was started with different options: "
+                + ", ".join(f"{name}={manifest['options'][name]!r}" for name in changed)
+                + " (resume it with RetailAcquisitionPipeline.from_run)"
+            )
+        
+        print(f"Resuming run {self.run_id} ({manifest['status']}, "
+              f"stages completed: {', '.join(manifest['stages_completed']) or 'none'})")
+        
+        if manifest["mode"] == "streaming":
+            return self.run_streaming_pipeline(**manifest["args"])
+        return self.run_full_pipeline(**manifest["args"])
+    
+    @contextmanager
+    def _checkpointed_run(self):
+        """
+        Mark the run's final status, with a resume hint on failure. A run
+        that finished with failed records ends "partial".
+        """
+        try:
+            yield
+        except BaseException as e:
+            status = "interrupted" if isinstance(e, KeyboardInterrupt) else "failed"
+            self.checkpoint.finish(status)
+            self._print_resume_hint(status)
+            raise
+        finally:
+            # Partial runs too: the metrics show where a failed run spent its time
+            self.metrics.write(f"{self.checkpoint.run_dir}/metrics.json", self.metrics_prometheus)
+        
+        if self.stats.failed_records:
+            self.checkpoint.finish("partial")
+            self._print_resume_hint(f"partial: {self.stats.failed_records} retailers failed")
+        else:
+            self.checkpoint.finish("complete")
+    
+    def _print_resume_hint(self, status: str):
+        print(f"\n⚠ Run {self.run_id} {status}. Resume with:")
+        print(f"   python pipeline.py --data-dir {self.data_dir} --resume {self.run_id}")
+    
+    def _resume_record(self, stage: str, retailer: Dict) -> bool:
+        """
+        If this run already finished stage for the retailer, restore the
+        stored fields onto it and return True.
+        """
+        if not self.checkpoint.is_done(stage, retailer['retailer_id']):
+            return False
+        retailer.update(self.checkpoint.record(retailer['retailer_id']))
+        return True
+    
+    def run_streaming_pipeline(
+        self,
+        locations: List[str],
+        radius_miles: float = 5,
+        max_retailers: Optional[int] = None,
+        enrich_workers: int = 4,
+        personalize_workers: int = 4,
+        queue_size: int = 100
+    ) -> Dict:
+        """
+        Run the pipeline with overlapping stages (see streaming.py).
+        
+        Each retailer is enriched and personalized as soon as discovery
+        parses it; only the export waits for everything to finish.
+        
+        Args:
+            locations: List of zip codes or city names
+            radius_miles: Search radius per location
+            max_retailers: Optional cap on total retailers
+            enrich_workers: Threads running contact enrichment
+            personalize_workers: Threads running email generation
+            queue_size: Bound on each inter-stage queue (backpressure)
         
-        # Summary
+        Returns:
+            Summary dict with results and stats
+        """
+        start_time = time.perf_counter()
+        self.metrics.reset()
+        print("\n" + "="*60)
+        print("WINGMAN LABS RETAIL ACQUISITION PIPELINE (STREAMING)")
+        print("="*60)
+        
+        self.checkpoint.start("streaming", {
+            "locations": locations,
+            "radius_miles": radius_miles,
+            "max_retailers": max_retailers,
+            "enrich_workers": enrich_workers,
+            "personalize_workers": personalize_workers,
+            "queue_size": queue_size
+        }, self.options)
+        print(f"Run ID: {self.run_id}")
+        
+        with self._checkpointed_run():
+            print("\n📍 STAGES 1-3: DISCOVER → ENRICH → GENERATE (overlapped)")
+            print("-"*40)
+            runner = StreamingPipelineRunner(
+                self,
+                enrich_workers=enrich_workers,
+                personalize_workers=personalize_workers,
+                queue_size=queue_size
+            )
+            # Stages overlap, so their API calls share one "streaming" label
+            with self.metrics.stage("streaming") as stage:
+                with_emails = runner.run(locations, radius_miles, max_retailers)
+                stage["records"] = len(with_emails)
+            self.stats.failed_records += len(runner.failures)
+            
+            self.stats.retailers_scraped = len(with_emails)
+            self.stats.contacts_enriched = sum(1 for r in with_emails if r.get('contact_email'))
+            self.stats.emails_generated = sum(1 for r in with_emails if r.get('email'))
+            
+            print("\n📤 STAGE 4: EXPORT FOR OUTREACH")
+            print("-"*40)
+            with self.metrics.stage("export") as stage:
+                export_files = self._stage_export(with_emails)
+                stage["records"] = len(with_emails)
+            self.stats.ready_for_outreach = len([r for r in with_emails if r.get('contact_email') and r.get('email')])
+            print(f"✓ Exported {self.stats.ready_for_outreach} leads ready for outreach")
+            self._commit_scrape_state(with_emails)
+            
+            if self.export_parquet:
+                self.store.to_parquet(f"{self.checkpoint.run_dir}/retailers.parquet")
+        
+        self.stats.run_time_seconds = time.perf_counter() - start_time
+        self.stats.stages = dict(self.metrics.stages)
+        self._print_summary(export_files)
+        
+        return {
+            "run_id": self.run_id,
+            "stats": self.stats.__dict__,
+            "export_files": export_files,
+            "retailers": with_emails
+        }
+    
+    def _print_summary(self, export_files: List[str]):
         print("\n" + "="*60)
         print("PIPELINE COMPLETE")
         print("="*60)
@@ -125,188 +475,373 @@ class RetailAcquisitionPipeline:
    Contacts enriched:    {self.stats.contacts_enriched}
    Emails generated:     {self.stats.emails_generated}
    Ready for outreach:   {self.stats.ready_for_outreach}
+   New in this export:   {self.stats.newly_exported}
+   Failed (resumable):   {self.stats.failed_records}
    Run time:             {self.stats.run_time_seconds:.1f}s
 
+⏱  Stages:
+{self._stage_report()}
+
 📁 Output files:
-   {self.data_dir}/retailers_raw.json
-   {self.data_dir}/retailers_enriched.json
-   {self.data_dir}/retailers_with_emails.json
-   {export_file} (for Instantly.ai)
+   {self.store.path} (run {self.run_id}, all stages)
+   {self.checkpoint.run_dir}/metrics.json (timings, API calls, tokens)
+{self._export_report(export_files)}
 """)
-        
-        return {
-            "stats": self.stats.__dict__,
-            "export_file": export_file,
-            "retailers": with_emails
-        }
     
-    def _stage_discover(self, locations: List[str], radius_miles: float) -> List[Dict]:
+    def _export_report(self, export_files: List[str]) -> str:
+        return "\n".join(f"   {path} (for {self.export_format.title()})" for path in export_files)
+    
+    def _stage_report(self) -> str:
+        """Per-stage time and throughput, then the slowest call types."""
+        lines = [
+            f"   {name:<12} {s['seconds']:>8.1f}s  {s['records']:>6} records  {s['records_per_second']:>8.1f}/s"
+            for name, s in self.stats.stages.items()
+        ]
+        for h in self.metrics.hot_path(top=3):
+            labels = ", ".join(f"{k}={v}" for k, v in h['labels'].items())
+            lines.append(f"   {h['name']} [{labels}]: {h['count']} calls, {h['sum']:.1f}s total, "
+                         f"p50 {h['p50']:.3f}s, p95 {h['p95']:.3f}s, p99 {h['p99']:.3f}s")
+        return "\n".join(lines)
+    
+    def _stage_discover(
+        self,
+        locations: List[str],
+        radius_miles: float,
+        max_retailers: Optional[int] = None
+    ) -> List[Dict]:
         """Stage 1: Discover retailers from multiple sources."""
-        all_retailers = []
+        return self._admit(self._search_retailers(locations, radius_miles), set(), limit=max_retailers)
+    
+    def _search_retailers(
+        self,
+        locations: List[str],
+        radius_miles: float,
+        on_results: Optional[Callable[[List[Dict]], None]] = None,
+        stop: Optional[threading.Event] = None
+    ) -> List[Dict]:
+        """
+        Run discovery (or load demo data) and return raw retailer dicts.
         
-        if self.google_api_key:
-            scraper = RetailerScraper(self.google_api_key)
-            
-            for location in locations:
-                print(f"  Searching {location}...")
-                retailers = scraper.search_area(location, radius_miles)
-                all_retailers.extend([r.to_dict() for r in retailers])
-        else:
+        on_results, if given, also receives each search's retailers as
+        soon as that search completes. Once stop is set, no further
+        searches are issued.
+        """
+        if not self.google_api_key:
             print("  [Demo mode - no Google API key]")
             all_retailers = self._load_sample_data()
+            if on_results:
+                on_results(all_retailers)
+            return all_retailers
+        
+        scraper = RetailerScraper(
+            self.google_api_key,
+            geocode_cache=GeocodeCache(f"{self.data_dir}/geocode_cache.db"),
+            http_client=HttpClient(max_connections_per_host=self.max_concurrency),
+            max_pages=self.max_pages
+        )
+        engine = AsyncDiscoveryEngine(
+            scraper,
+            max_concurrency=self.max_concurrency,
+            requests_per_second=self.requests_per_second,
+            state=self.scrape_state,
+            on_results=(lambda batch: on_results([r.to_dict() for r in batch])) if on_results else None,
+            stop=stop
+        )
         
-        # Save raw data
-        with open(f"{self.data_dir}/retailers_raw.json", 'w') as f:
-            json.dump(all_retailers, f, indent=2)
+        if self.discovery_mode == "grid":
+            planner = CoveragePlanner(scraper, engine)
+            cells = planner.plan_locations(locations, radius_miles)
+            print(f"  Searching {len(cells)} grid cells covering {len(locations)} locations...")
+            retailers = planner.search(cells)
+            
+            with open(f"{self.output_dir}/coverage_report.json", 'w') as f:
+                json.dump(planner.report.to_dict(), f, indent=2)
+        else:
+            print(f"  Searching {len(locations)} locations concurrently...")
+            retailers = engine.run(locations, radius_miles)
         
-        return all_retailers
+        if scraper.failures:
+            with open(f"{self.output_dir}/discover_failures.json", 'w') as f:
+                json.dump(scraper.failures, f, indent=2)
+            print(f"  ⚠ {len(scraper.failures)} API calls failed; see {self.output_dir}/discover_failures.json")
+        
+        # Marked fresh only after export (see _commit_scrape_state); kept
+        # in the manifest so a resumed run can still do that
+        if self.scrape_state:
+            self.checkpoint.update(scraped_searches=self.scrape_state.pending_searches)
+        
+        return [r.to_dict() for r in retailers]
     
-    def _stage_enrich(self, retailers: List[Dict]) -> List[Dict]:
-        """Stage 2: Enrich with contact information."""
-        enriched = []
+    def _admit(
+        self,
+        retailers: List[Dict],
+        seen_this_run: Set[str],
+        verbose: bool = True,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Assign stable ids, drop stores already seen this run, apply the
+        incremental filter, keep at most limit retailers, and record the
+        survivors in the store.
         
-        for retailer in retailers:
-            # Try to find contact info
-            contact = self._find_contact(retailer)
-            
-            retailer.update({
-                'contact_name': contact.get('name'),
-                'contact_email': contact.get('email'),
-                'contact_phone': contact.get('phone'),
-                'contact_title': contact.get('title'),
-                'enrichment_source': contact.get('source'),
-                'enrichment_status': 'complete' if contact.get('email') else 'partial'
-            })
-            
-            enriched.append(retailer)
+        Retailers this run already admitted before it was interrupted
+        pass the incremental filter and aren't recorded twice.
+        """
+        resolved = self.identity_index.resolve_many(retailers)
+        
+        unique = []
+        new_count = 0
+        for retailer, (retailer_id, is_new) in zip(retailers, resolved):
+            if retailer_id in seen_this_run:
+                continue
+            seen_this_run.add(retailer_id)
+            retailer['retailer_id'] = retailer_id
+            new_count += is_new
+            unique.append(retailer)
+        
+        if verbose:
+            print(f"  {len(unique)} unique retailers ({new_count} never seen before, "
+                  f"{len(retailers) - len(unique)} duplicates dropped)")
         
-        # Save enriched data
-        with open(f"{self.data_dir}/retailers_enriched.json", 'w') as f:
-            json.dump(enriched, f, indent=2)
+        if self.scrape_state:
+            ours = {r['retailer_id'] for r in unique if self.checkpoint.is_done("discover", r['retailer_id'])}
+            changed = {r['retailer_id'] for r in self.scrape_state.changed(
+                [r for r in unique if r['retailer_id'] not in ours]
+            )}
+            unique = [r for r in unique if r['retailer_id'] in ours or r['retailer_id'] in changed]
+            if verbose:
+                print(f"  {len(unique)} new or changed since last run")
         
-        return enriched
+        if limit is not None and len(unique) > limit:
+            unique = unique[:limit]
+            if verbose:
+                print(f"  Capped at {limit} retailers")
+        
+        self._record("discover", [r for r in unique if not self.checkpoint.is_done("discover", r['retailer_id'])])
+        return unique
     
-    def _find_contact(self, retailer: Dict) -> Dict:
+    def _commit_scrape_state(self, retailers: List[Dict]):
+        """
+        Incremental mode, after export: remember the retailers that made
+        it through every stage, so later runs skip them until they
+        change, and mark fresh the searches whose retailers all did
+        (not ones with retailers cut by max_retailers or failed).
         """
-        Find contact information for a retailer.
+        if not self.scrape_state:
+            return
         
-        In production, this would:
-        1. Search Apollo.io
-        2. Fall back to Hunter.io
-        3. Try LinkedIn scraping
-        4. Use AI research agent
+        processed = [
+            r for r in retailers
+            if r.get('enrichment_status') and (r.get('email') or not r.get('contact_email'))
+        ]
+        self.scrape_state.mark_emitted(processed)
         
-        For demo, we generate placeholder data.
+        searches = self.checkpoint.manifest.get("scraped_searches", [])
+        stable_ids = self.identity_index.lookup_many({key for s in searches for key in s.get("retailers", {})})
+        fresh = self.scrape_state.mark_searches(searches, stable_ids)
+        if fresh < len(searches):
+            print(f"  {len(searches) - fresh} searches left stale: some of their retailers "
+                  f"were capped or failed, so the next run searches again")
+    
+    def _record(self, stage: str, records: List[Dict]):
+        """Append stage output to the run log (and the warehouse, if enabled)."""
+        self.store.append_many(stage, records)
+        if self.warehouse:
+            self.warehouse.record(stage, records)
+    
+    def _build_enrichment_chain(self) -> ProviderChain:
         """
+        Website crawl (if enabled), Apollo.io, then Hunter.io, for
+        whichever keys are set; demo data without any real source.
+        """
+        providers = []
+        if self.crawler:
+            providers.append(WebsiteProvider(self.crawler))
         if self.apollo_api_key:
-            # TODO: Implement Apollo.io lookup
-            pass
+            providers.append(ApolloProvider(self.apollo_api_key))
+        if self.hunter_api_key:
+            providers.append(HunterProvider(self.hunter_api_key))
+        if not providers:
+            providers.append(DemoProvider())
         
-        # Demo: Generate placeholder contact for some retailers
-        business_name = retailer.get('business_name', '')
+        return ProviderChain(
+            providers,
+            cache=EnrichmentCache(f"{self.data_dir}/enrichment_cache.db"),
+            max_workers=self.max_concurrency
+        )
+    
+    def _stage_enrich(self, retailers: List[Dict]) -> List[Dict]:
+        """Stage 2: Enrich with contact information (concurrently)."""
+        pending = [r for r in retailers if not self._resume_record("enrich", r)]
         
-        # Simulate ~70% contact find rate
-        if hash(business_name) % 10 < 7:
-            # Generate plausible owner email
-            domain = business_name.lower().replace(' ', '').replace("'", '')[:15]
-            
-            return {
-                'name': f"Owner of {business_name}",
-                'email': f"info@{domain}.com",
-                'phone': retailer.get('phone'),
-                'title': 'Owner',
-                'source': 'demo_enrichment'
-            }
+        # Crawl all websites up front, concurrently, so the provider chain
+        # reads finished results instead of crawling one site per worker
+        if self.crawler:
+            self.crawler.crawl_many(pending)
+        
+        def on_result(retailer: Dict, contact: Dict):
+            update = self._contact_update(retailer, contact)
+            retailer.update(update)
+            self._record("enrich", [update])
+        
+        self.enrichment.enrich_many(pending, on_result=on_result)
+        print(f"  {self.enrichment.summary()}")
+        
+        return retailers
+    
+    def _enrich_one(self, retailer: Dict) -> Dict:
+        """
+        Contact fields for one retailer, keyed by retailer_id.
         
+        Walks the same provider chain as the batch stage (website,
+        Apollo.io, Hunter.io; demo data without any real source).
+        """
+        return self._contact_update(retailer, self.enrichment.enrich(retailer))
+    
+    def _contact_update(self, retailer: Dict, contact: Dict) -> Dict:
         return {
-            'name': None,
-            'email': None,
-            'phone': retailer.get('phone'),
-            'title': None,
-            'source': 'not_found'
+            'retailer_id': retailer['retailer_id'],
+            'contact_name': contact.get('name'),
+            'contact_email': contact.get('email'),
+            'contact_phone': contact.get('phone'),
+            'contact_title': contact.get('title'),
+            'enrichment_source': contact.get('source'),
+            'enrichment_confidence': contact.get('confidence'),
+            'enrichment_status': 'complete' if contact.get('email') else 'partial'
         }
     
-    def _stage_personalize(self, retailers: List[Dict]) -> List[Dict]:
-        """Stage 3: Generate personalized emails."""
-        generator = EmailGenerator(self.anthropic_api_key)
-        
-        for retailer in retailers:
-            if retailer.get('contact_email'):
-                email = generator.generate_email(retailer)
-                retailer['email'] = {
-                    'subject': email.subject,
-                    'body': email.body,
-                    'follow_up_1': email.follow_up_1,
-                    'follow_up_2': email.follow_up_2
-                }
-                retailer['personalization_notes'] = email.personalization_notes
-        
-        # Save with emails
-        with open(f"{self.data_dir}/retailers_with_emails.json", 'w') as f:
-            json.dump(retailers, f, indent=2)
+    def _stage_personalize(self, retailers: List[Dict]) -> Tuple[List[Dict], int]:
+        """
+        Stage 3: Generate personalized emails (concurrently).
         
-        return retailers
+        Returns the retailers and how many of them failed; failed ones
+        have no email and are retried when the run is resumed.
+        """
+        generator = EmailGenerator(
+            self.anthropic_api_key,
+            max_concurrency=self.llm_concurrency,
+            cache=self.email_cache,
+            leads_per_request=self.leads_per_request
+        )
+        
+        pending = [
+            r for r in retailers
+            if not self._resume_record("personalize", r) and r.get('contact_email')
+        ]
+        
+        def on_result(retailer: Dict, email: EmailOutput):
+            update = self._email_update(retailer, email)
+            retailer.update(update)
+            self._record("personalize", [update])
+        
+        if self.llm_backend == "batch" and generator.client and pending:
+            failures = self._personalize_batch(generator, pending, on_result)
+        else:
+            failures = generator.generate_many(pending, on_result=on_result).failures
+        
+        self.stats.failed_records += len(failures)
+        return retailers, len(failures)
     
-    def _stage_export(self, retailers: List[Dict]) -> str:
+    def _personalize_batch(
+        self,
+        generator: EmailGenerator,
+        pending: List[Dict],
+        on_result: Callable[[Dict, EmailOutput], None]
+    ) -> List[Tuple[Dict, str]]:
+        """
+        Personalize through the Message Batches API.
+        
+        Batch ids are saved in the run manifest as soon as they are
+        submitted, so a resumed run polls the same batches instead of
+        paying for new ones. Returns the retailers that still have no
+        email (see GenerationResult.failures).
+        """
+        backend = MessageBatchBackend(generator)
+        by_id = {r['retailer_id']: r for r in pending}
+        manifest = self.checkpoint.manifest
+        
+        def on_submitted(batch_ids: List[str]):
+            self.checkpoint.update(message_batches=batch_ids)
+        
+        if manifest.get("message_batches"):
+            print(f"  [Resumed - polling {len(manifest['message_batches'])} submitted batches]")
+        else:
+            print(f"  Personalizing {len(pending)} retailers via Message Batches...")
+        
+        emails = backend.generate(
+            pending,
+            batch_ids=manifest.get("message_batches"),
+            on_submitted=on_submitted,
+            on_result=lambda retailer_id, email: (
+                on_result(by_id[retailer_id], email) if retailer_id in by_id else None
+            )
+        )
+        
+        # Anything the batch didn't return (errored/expired) goes interactive
+        missing = [r for r in pending if r['retailer_id'] not in emails]
+        if missing:
+            print(f"  Retrying {len(missing)} unbatched prompts interactively")
+            return generator.generate_many(missing, on_result=on_result).failures
+        return []
+    
+    def _personalize_one(self, generator: EmailGenerator, retailer: Dict) -> Dict:
+        """Generated email fields for one retailer, keyed by retailer_id."""
+        return self._email_update(retailer, generator.generate_with_backoff(retailer))
+    
+    def _email_update(self, retailer: Dict, email: EmailOutput) -> Dict:
+        return {
+            'retailer_id': retailer['retailer_id'],
+            'email': {
+                'subject': email.subject,
+                'body': email.body,
+                'follow_up_1': email.follow_up_1,
+                'follow_up_2': email.follow_up_2
+            },
+            'personalization_notes': email.personalization_notes,
+            'email_variant': email.variant
+        }
+    
+    def _stage_export(self, retailers: List[Dict]) -> List[str]:
         """
         Stage 4: Export for email automation.
         
-        Creates CSV in Instantly.ai format.
+        Streams ready leads into CSV(s) in the configured tool's format
+        (Instantly.ai by default); returns the files written.
+        Incremental exports only write leads that are new or whose
+        email changed since their last export, into the run's own
+        directory, so an earlier run's file (possibly not imported yet)
+        is never overwritten; full exports go to the output directory.
         """
-        export_file = f"{self.data_dir}/instantly_import.csv"
-        
-        # Instantly.ai expects these columns
-        fieldnames = [
-            'email',
-            'first_name',
-            'last_name', 
-            'company_name',
-            'phone',
-            'website',
-            'custom_subject',
-            'custom_body',
-            'custom_follow_up_1',
-            'custom_follow_up_2',
-            # Custom fields
-            'business_type',
-            'city',
-            'state',
-            'retailer_id'
-        ]
+        leads = retailers
+        export_dir = self.output_dir
+        self.export_ledger.skipped = 0
+        if self.incremental_export:
+            leads = self.export_ledger.new_or_changed(retailers)
+            export_dir = self.checkpoint.run_dir
         
-        with open(export_file, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for retailer in retailers:
-                if not retailer.get('contact_email') or not retailer.get('email'):
-                    continue
-                
-                # Parse name
-                contact_name = retailer.get('contact_name', '')
-                name_parts = contact_name.split(' ', 1) if contact_name else ['', '']
-                first_name = name_parts[0]
-                last_name = name_parts[1] if len(name_parts) > 1 else ''
-                
-                row = {
-                    'email': retailer.get('contact_email'),
-                    'first_name': first_name,
-                    'last_name': last_name,
-                    'company_name': retailer.get('business_name'),
-                    'phone': retailer.get('phone', ''),
-                    'website': retailer.get('website', ''),
-                    'custom_subject': retailer['email']['subject'],
-                    'custom_body': retailer['email']['body'],
-                    'custom_follow_up_1': retailer['email'].get('follow_up_1', ''),
-                    'custom_follow_up_2': retailer['email'].get('follow_up_2', ''),
-                    'business_type': retailer.get('business_type'),
-                    'city': retailer.get('city'),
-                    'state': retailer.get('state'),
-                    'retailer_id': retailer.get('retailer_id')
-                }
-                writer.writerow(row)
-        
-        return export_file
+        exported: List = []
+        result = export_leads(
+            leads,
+            f"{export_dir}/{self.export_format}_import.csv",
+            self.export_format,
+            rows_per_file=self.export_rows_per_file,
+            compress=self.export_gzip,
+            on_row=lambda retailer, path: exported.append((retailer, path))
+        )
+        self.stats.newly_exported = result.rows
+        
+        # Only once the files are complete: a crashed export is redone
+        self.export_ledger.record(exported)
+        if self.incremental_export:
+            print(f"  {result.rows} new or changed leads exported, "
+                  f"{self.export_ledger.skipped} already exported skipped")
+        if self.warehouse:
+            by_file: Dict[str, List[str]] = {}
+            for retailer, path in exported:
+                by_file.setdefault(path, []).append(retailer['retailer_id'])
+            for path, retailer_ids in by_file.items():
+                self.warehouse.mark_exported(retailer_ids, path)
+        return result.files
     
     def _load_sample_data(self) -> List[Dict]:
         """Load sample data for demo mode."""
@@ -405,17 +940,109 @@ class RetailAcquisitionPipeline:
 
 
 def main():
-    """Run the pipeline in demo mode."""
+    """Run the pipeline (demo mode without API keys), or resume a run."""
+    parser = argparse.ArgumentParser(description="Wingman Labs retail acquisition pipeline")
+    parser.add_argument("--locations", nargs="+", default=["90012", "90028", "91423"],
+                        help="Zip codes or city names to search")
+    parser.add_argument("--radius", type=float, default=3, help="Search radius in miles")
+    parser.add_argument("--max-retailers", type=int, help="Cap on total retailers")
+    parser.add_argument("--streaming", action="store_true", help="Overlap stages instead of batching")
+    parser.add_argument("--data-dir", default="data", help="Data directory")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="Resume an interrupted run with the options it was started with")
+    parser.add_argument("--discovery-mode", choices=["radius", "grid"], default="radius",
+                        help="Search a circle per location, or adaptive grid cells over their area")
+    parser.add_argument("--max-pages", type=int, default=3, help="Places result pages (20 each) per search")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip searches run within --freshness-hours and retailers that haven't changed")
+    parser.add_argument("--freshness-hours", type=float, default=168,
+                        help="How long a search stays fresh in incremental mode")
+    parser.add_argument("--concurrency", type=int,
+                        help="Places calls in flight at once (default 8; may change on --resume)")
+    parser.add_argument("--rps", type=float,
+                        help="Places requests per second (default 5; may change on --resume)")
+    parser.add_argument("--llm-backend", choices=["interactive", "batch"], default="interactive",
+                        help="Email generation via concurrent calls or one Message Batch")
+    parser.add_argument("--llm-concurrency", type=int,
+                        help="AI requests in flight at once (default 8; may change on --resume)")
+    parser.add_argument("--leads-per-request", type=int, default=1,
+                        help="Retailers per AI request (interactive backend)")
+    parser.add_argument("--crawl-websites", action="store_true",
+                        help="Look for contacts on retailers' own websites")
+    parser.add_argument("--metrics-prom", default=None, metavar="PATH",
+                        help="Also write run metrics in Prometheus text format to PATH")
+    parser.add_argument("--warehouse", action="store_true",
+                        help="Also keep every lead's state in data_dir/warehouse.db")
+    parser.add_argument("--export-format", choices=sorted(EXPORT_FORMATS), default="instantly",
+                        help="Outreach tool to export for")
+    parser.add_argument("--rows-per-file", type=int, help="Split the export into files of this many leads")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the export files")
+    parser.add_argument("--full-export", action="store_true",
+                        help="Export every ready lead, including ones already exported, to the data directory "
+                             "(default: only new or changed leads, into the run directory)")
+    parser.add_argument("--parquet", action="store_true",
+                        help="Also write the run's records to retailers.parquet in the run directory")
+    args = parser.parse_args()
+    
+    if args.parquet and not any(importlib.util.find_spec(engine) for engine in ("pyarrow", "fastparquet")):
+        parser.error("--parquet needs pyarrow or fastparquet installed")
+    
     print("\n🚀 WINGMAN LABS RETAIL ACQUISITION PIPELINE")
-    print("   Demo Mode (no API keys required)")
     
-    pipeline = RetailAcquisitionPipeline()
+    # Only the ones given, so a resume keeps the run's own otherwise
+    throughput = {
+        name: value for name, value in (
+            ("max_concurrency", args.concurrency),
+            ("requests_per_second", args.rps),
+            ("llm_concurrency", args.llm_concurrency)
+        ) if value is not None
+    }
+    
+    if args.resume:
+        # The run's own options, not this command line's defaults
+        pipeline = RetailAcquisitionPipeline.from_run(
+            args.resume,
+            data_dir=args.data_dir,
+            metrics_prometheus=args.metrics_prom,
+            warehouse=args.warehouse,
+            **throughput
+        )
+    else:
+        pipeline = RetailAcquisitionPipeline(
+            data_dir=args.data_dir,
+            discovery_mode=args.discovery_mode,
+            max_pages=args.max_pages,
+            incremental=args.incremental,
+            freshness_hours=args.freshness_hours,
+            export_parquet=args.parquet,
+            llm_backend=args.llm_backend,
+            leads_per_request=args.leads_per_request,
+            crawl_websites=args.crawl_websites,
+            metrics_prometheus=args.metrics_prom,
+            warehouse=args.warehouse,
+            export_format=args.export_format,
+            export_rows_per_file=args.rows_per_file,
+            export_gzip=args.gzip,
+            incremental_export=not args.full_export,
+            **throughput
+        )
+    if not pipeline.google_api_key:
+        print("   Demo Mode (no API keys required)")
     
-    # Run pipeline with sample LA zip codes
-    results = pipeline.run_full_pipeline(
-        locations=["90012", "90028", "91423"],
-        radius_miles=3
-    )
+    if args.resume:
+        results = pipeline.resume()
+    elif args.streaming:
+        results = pipeline.run_streaming_pipeline(
+            locations=args.locations,
+            radius_miles=args.radius,
+            max_retailers=args.max_retailers
+        )
+    else:
+        results = pipeline.run_full_pipeline(
+            locations=args.locations,
+            radius_miles=args.radius,
+            max_retailers=args.max_retailers
+        )
     
     # Show sample output
     print("\n" + "="*60)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Incremental Scrape State
+
+Remembers when each (area, query) pair was last scraped and what it
+returned, plus a content fingerprint per retailer, so incremental runs
+only refetch stale areas and only pass new or changed retailers on.
+Both are written only once a run has exported what it found, and a
+search only counts as fresh once every retailer it returned has been
+emitted with that content, so a crashed or capped run never hides
+retailers from the next one.
+"""
+
+import json
+import time
+import hashlib
+from dataclasses import fields
+from typing import Dict, List, Optional
+
+from db import SQLiteStore
+from identity import primary_key
+from scraper import Retailer
+
+# Fields that change on every scrape without the store itself changing
+VOLATILE_FIELDS = {"retailer_id", "scraped_at", "source"}
+
+# What discovery fills in; later stages' fields (contacts, emails) on the
+# same dict don't count as a change
+SCRAPED_FIELDS = {f.name for f in fields(Retailer)} - VOLATILE_FIELDS
+
+
+def retailer_fingerprint(retailer: Dict) -> str:
+    """Hash of a retailer's scraped content, ignoring volatile fields."""
+    content = {k: v for k, v in retailer.items() if k in SCRAPED_FIELDS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def results_fingerprint(retailers: List[Dict]) -> str:
+    """Order-independent hash of one search's results."""
+    digests = sorted(retailer_fingerprint(r) for r in retailers)
+    return hashlib.sha1("".join(digests).encode()).hexdigest()
+
+
+class ScrapeStateStore(SQLiteStore):
+    """Last-scraped timestamps per (area, query) and fingerprints per retailer."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS area_queries (
+            area_key TEXT NOT NULL,
+            query TEXT NOT NULL,
+            last_scraped REAL NOT NULL,
+            fingerprint TEXT NOT NULL,
+            result_count INTEGER NOT NULL,
+            PRIMARY KEY (area_key, query)
+        );
+        CREATE TABLE IF NOT EXISTS retailer_fingerprints (
+            retailer_id TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = "data/scrape_state.db", freshness_hours: float = 168):
+        super().__init__(path)
+        self.freshness_seconds = freshness_hours * 3600
+
+        # Searches run by this process, not yet marked fresh (see record_search)
+        self.pending_searches: List[Dict] = []
+
+    def is_fresh(self, area_key: str, query: str) -> bool:
+        """True if the pair was scraped within the freshness window."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_scraped FROM area_queries WHERE area_key = ? AND query = ?",
+                (area_key, query)
+            ).fetchone()
+        return bool(row) and time.time() - row[0] < self.freshness_seconds
+
+    def record_search(self, area_key: str, query: str, retailers: List[Dict]):
+        """
+        Remember a completed search in pending_searches, with each of its
+        retailers' identity key and fingerprint. It only counts as fresh
+        once mark_searches() finds all of them emitted.
+        """
+        search = {
+            "area_key": area_key,
+            "query": query,
+            "scraped_at": time.time(),
+            "fingerprint": results_fingerprint(retailers),
+            "result_count": len(retailers),
+            "retailers": {
+                primary_key(r) or f"retailer:{r['retailer_id']}": retailer_fingerprint(r)
+                for r in retailers
+            }
+        }
+        with self._lock:
+            self.pending_searches.append(search)
+
+    def mark_searches(self, searches: List[Dict], stable_ids: Dict[str, str]) -> int:
+        """
+        Mark searches from record_search fresh, as of when they ran, if
+        every retailer they returned has since been emitted with the
+        content the search saw. Retailers that were capped, failed or
+        dropped keep their search stale, so the next run finds them.
+
+        Args:
+            stable_ids: identity key -> stable retailer_id (see
+                RetailerIdentityIndex.lookup_many)
+
+        Returns:
+            Number of searches marked fresh
+        """
+        with self._lock:
+            settled = [
+                s for s in searches
+                if "retailers" in s and all(
+                    self._emitted_fingerprint(stable_ids.get(key)) == fingerprint
+                    for key, fingerprint in s["retailers"].items()
+                )
+            ]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO area_queries "
+                "(area_key, query, last_scraped, fingerprint, result_count) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (s["area_key"], s["query"], s["scraped_at"], s["fingerprint"], s["result_count"])
+                    for s in settled
+                ]
+            )
+            self._conn.commit()
+        return len(settled)
+
+    def _emitted_fingerprint(self, retailer_id: Optional[str]) -> Optional[str]:
+        if retailer_id is None:
+            return None
+        row = self._conn.execute(
+            "SELECT fingerprint FROM retailer_fingerprints WHERE retailer_id = ?", (retailer_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def changed(self, retailers: List[Dict]) -> List[Dict]:
+        """
+        Filter to retailers that are new or whose content changed since
+        they were last emitted (see mark_emitted). Read-only.
+
+        Expects stable retailer_ids (see identity.py).
+        """
+        changed = []
+        with self._lock:
+            for retailer in retailers:
+                row = self._conn.execute(
+                    "SELECT fingerprint FROM retailer_fingerprints WHERE retailer_id = ?",
+                    (retailer['retailer_id'],)
+                ).fetchone()
+                if not row or row[0] != retailer_fingerprint(retailer):
+                    changed.append(retailer)
+        return changed
+
+    def mark_emitted(self, retailers: List[Dict]) -> int:
+        """
+        Record retailers' current fingerprints, once they have made it
+        through the pipeline; changed() skips them until they change.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO retailer_fingerprints (retailer_id, fingerprint, updated_at) "
+                "VALUES (?, ?, ?)",
+                [(r['retailer_id'], retailer_fingerprint(r), now) for r in retailers]
+            )
+            self._conn.commit()
+        return len(retailers)
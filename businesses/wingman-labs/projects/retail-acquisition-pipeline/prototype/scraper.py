@@ -11,11 +11,15 @@ import os
 import json
 import time
 import uuid
-import requests
-from typing import List, Dict, Optional
+import threading
+from collections import Counter
+from typing import List, Dict, Iterator, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
+from geocache import GeocodeCache
+from http_client import HttpClient, HttpError
+
 # Load API key from environment
 GOOGLE_API_KEY = os.environ.get('GOOGLE_PLACES_API_KEY')
 
@@ -63,11 +67,30 @@ class RetailerScraper:
         ("supplement store", "supplement"),
     ]
     
-    def __init__(self, api_key: str):
+    # Places Text Search returns at most 20 results per page
+    PAGE_SIZE = 20
+    
+    def __init__(
+        self,
+        api_key: str,
+        geocode_cache: Optional[GeocodeCache] = None,
+        http_client: Optional[HttpClient] = None,
+        max_pages: int = 1
+    ):
         self.api_key = api_key
+        self.max_pages = max_pages  # Places pages (20 results each) per query
+        self.geocode_cache = geocode_cache
+        self.http = http_client or HttpClient()
         self.base_url = "https://places.googleapis.com/v1/places:searchText"
         self.details_url = "https://places.googleapis.com/v1/places"
         
+        # Calls that failed after retries, so callers can report data loss
+        self.failures: List[Dict] = []
+        
+        # API calls made, by kind ("geocode", "search")
+        self.call_counts = Counter()
+        self._counts_lock = threading.Lock()
+        
     def search_area(
         self,
         location: str,
@@ -96,36 +119,41 @@ class RetailerScraper:
         lat, lng = coords
         radius_meters = int(radius_miles * 1609.34)
         
-        # Search each business type
-        types_to_search = business_types or [t[0] for t in self.BUSINESS_TYPES]
-        
-        for google_type, our_type in self.BUSINESS_TYPES:
-            if google_type in types_to_search:
-                print(f"Searching for {google_type} near {location}...")
-                results = self._search_places(
-                    query=google_type,
-                    lat=lat,
-                    lng=lng,
-                    radius=radius_meters,
-                    business_type=our_type
-                )
-                retailers.extend(results)
-                time.sleep(0.5)  # Rate limiting
-        
-        # Custom text searches for specialized stores
-        for search_term, our_type in self.CUSTOM_SEARCHES:
-            print(f"Searching for '{search_term}' near {location}...")
+        for query, our_type in self.query_plan(business_types):
+            print(f"Searching for '{query}' near {location}...")
             results = self._search_places(
-                query=search_term,
+                query=query,
                 lat=lat,
                 lng=lng,
                 radius=radius_meters,
                 business_type=our_type
             )
             retailers.extend(results)
-            time.sleep(0.5)
+            time.sleep(0.5)  # Rate limiting
         
-        # Deduplicate by google_place_id
+        unique_retailers = self.dedupe(retailers)
+        print(f"Found {len(unique_retailers)} unique retailers")
+        return unique_retailers
+    
+    def query_plan(self, business_types: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """
+        List the (query, business_type) pairs searched for each location.
+        
+        Google place types are filtered by business_types; the custom
+        text searches for specialized stores are always included.
+        """
+        types_to_search = business_types or [t[0] for t in self.BUSINESS_TYPES]
+        plan = [
+            (google_type, our_type)
+            for google_type, our_type in self.BUSINESS_TYPES
+            if google_type in types_to_search
+        ]
+        plan.extend(self.CUSTOM_SEARCHES)
+        return plan
+    
+    @staticmethod
+    def dedupe(retailers: List[Retailer]) -> List[Retailer]:
+        """Deduplicate by google_place_id, keeping the first occurrence."""
         seen = set()
         unique_retailers = []
         for r in retailers:
@@ -134,27 +162,42 @@ class RetailerScraper:
                 unique_retailers.append(r)
             elif not r.google_place_id:
                 unique_retailers.append(r)
-        
-        print(f"Found {len(unique_retailers)} unique retailers")
         return unique_retailers
     
     def _geocode(self, location: str) -> Optional[tuple]:
-        """Convert location string to coordinates."""
+        """Convert location string to coordinates (served from cache when possible)."""
+        if self.geocode_cache:
+            cached = self.geocode_cache.get(location)
+            if cached:
+                return cached
+        
         url = f"https://maps.googleapis.com/maps/api/geocode/json"
         params = {
             "address": location,
             "key": self.api_key
         }
         
+        self._count_call("geocode")
         try:
-            response = requests.get(url, params=params)
-            data = response.json()
-            
-            if data.get("results"):
-                loc = data["results"][0]["geometry"]["location"]
-                return (loc["lat"], loc["lng"])
-        except Exception as e:
+            with self.http.metrics.timer("places.call.seconds", kind="geocode"):
+                response = self.http.get(url, params=params)
+                data = response.json()
+        except (HttpError, ValueError) as e:
             print(f"Geocoding error: {e}")
+            self._record_failure("geocode", location, e)
+            return None
+        
+        if data.get("results"):
+            loc = data["results"][0]["geometry"]["location"]
+            coords = (loc["lat"], loc["lng"])
+            if self.geocode_cache:
+                self.geocode_cache.set(location, coords)
+            return coords
+        
+        # Geocoding reports quota/auth problems in the body with HTTP 200
+        if data.get("status") not in (None, "OK", "ZERO_RESULTS"):
+            print(f"Geocoding error: {data.get('status')} {data.get('error_message', '')}")
+            self._record_failure("geocode", location, data.get("status"))
         
         return None
     
@@ -164,15 +207,75 @@ class RetailerScraper:
         lat: float,
         lng: float,
         radius: int,
-        business_type: str
+        business_type: str,
+        max_pages: Optional[int] = None,
+        rectangle: Optional[Tuple[float, float, float, float]] = None,
+        raise_on_error: bool = False
     ) -> List[Retailer]:
         """Search Google Places API for businesses."""
-        retailers = []
+        return list(self.iter_places(
+            query, lat, lng, radius, business_type, max_pages, rectangle, raise_on_error
+        ))
+    
+    def iter_places(
+        self,
+        query: str,
+        lat: float,
+        lng: float,
+        radius: int,
+        business_type: str,
+        max_pages: Optional[int] = None,
+        rectangle: Optional[Tuple[float, float, float, float]] = None,
+        raise_on_error: bool = False
+    ) -> Iterator[Retailer]:
+        """
+        Search Google Places API, yielding retailers as each page arrives.
+        
+        Follows nextPageToken until the results run out or max_pages
+        (default: self.max_pages) pages have been fetched.
+        
+        If rectangle (south, west, north, east) is given, results are
+        restricted to it instead of biased toward the lat/lng circle.
+        
+        Failed pages are always recorded in self.failures; with
+        raise_on_error the HttpError is also re-raised so callers can tell
+        an empty area from a failed one.
+        """
+        max_pages = max_pages or self.max_pages
+        page_token = None
+        
+        for page in range(max_pages):
+            retailers, page_token = self.search_page(
+                query, lat, lng, radius, business_type, page, page_token, rectangle, raise_on_error
+            )
+            yield from retailers
+            if not page_token:
+                return
+    
+    def search_page(
+        self,
+        query: str,
+        lat: float,
+        lng: float,
+        radius: int,
+        business_type: str,
+        page: int = 0,
+        page_token: Optional[str] = None,
+        rectangle: Optional[Tuple[float, float, float, float]] = None,
+        raise_on_error: bool = False
+    ) -> Tuple[List[Retailer], Optional[str]]:
+        """
+        Fetch one page of a Places text search: exactly one API call, so
+        callers that rate-limit per call can schedule pages one by one.
         
+        Returns:
+            (retailers on the page, nextPageToken or None); a failed page
+            returns ([], None) unless raise_on_error
+        """
         headers = {
             "Content-Type": "application/json",
             "X-Goog-Api-Key": self.api_key,
-            "X-Goog-FieldMask": "places.id,places.displayName,places.formattedAddress,places.location,places.nationalPhoneNumber,places.websiteUri,places.rating,places.userRatingCount"
+            "X-Goog-FieldMask": "places.id,places.displayName,places.formattedAddress,places.location,places.nationalPhoneNumber,places.websiteUri,places.rating,places.userRatingCount,nextPageToken"
         }
         
         payload = {
@@ -183,22 +286,55 @@ class RetailerScraper:
                     "radius": radius
                 }
             },
-            "maxResultCount": 20
+            "pageSize": self.PAGE_SIZE
         }
         
+        if rectangle:
+            south, west, north, east = rectangle
+            del payload["locationBias"]
+            payload["locationRestriction"] = {
+                "rectangle": {
+                    "low": {"latitude": south, "longitude": west},
+                    "high": {"latitude": north, "longitude": east}
+                }
+            }
+        
+        if page_token:
+            payload["pageToken"] = page_token
+        
+        self._count_call("search")
         try:
-            response = requests.post(self.base_url, headers=headers, json=payload)
-            data = response.json()
-            
-            for place in data.get("places", []):
-                retailer = self._parse_place(place, business_type)
-                if retailer:
-                    retailers.append(retailer)
-                    
-        except Exception as e:
+            with self.http.metrics.timer("places.call.seconds", kind="search"):
+                response = self.http.post(self.base_url, headers=headers, json=payload)
+                data = response.json()
+        except (HttpError, ValueError) as e:
             print(f"Search error: {e}")
+            self._record_failure("search", f"{query} @ {lat:.4f},{lng:.4f} page {page + 1}", e)
+            if raise_on_error and isinstance(e, HttpError):
+                raise
+            return [], None
         
-        return retailers
+        retailers = [
+            retailer for retailer in
+            (self._parse_place(place, business_type) for place in data.get("places", []))
+            if retailer
+        ]
+        return retailers, data.get("nextPageToken")
+    
+    def _count_call(self, kind: str):
+        with self._counts_lock:
+            self.call_counts[kind] += 1
+        self.http.metrics.inc("places.calls", kind=kind)
+    
+    def _record_failure(self, kind: str, target: str, error):
+        self.http.metrics.inc("places.failures", kind=kind)
+        self.failures.append({
+            "kind": kind,
+            "target": target,
+            "error": str(error),
+            "status_code": getattr(error, "status_code", None),
+            "failed_at": datetime.utcnow().isoformat()
+        })
     
     def _parse_place(self, place: Dict, business_type: str) -> Optional[Retailer]:
         """Parse Google Places result into Retailer object."""
@@ -357,22 +493,21 @@ def main():
         return
     
     # Real scraping with API key
-    scraper = RetailerScraper(GOOGLE_API_KEY)
+    scraper = RetailerScraper(GOOGLE_API_KEY, geocode_cache=GeocodeCache("data/geocode_cache.db"))
     
-    # Start with a few LA zip codes
-    all_retailers = []
-    for zip_code in LA_METRO_ZIPS[:3]:  # Start with 3 zip codes
-        print(f"\n{'='*50}")
-        print(f"Scraping zip code: {zip_code}")
-        print('='*50)
-        
-        retailers = scraper.search_area(
-            location=f"{zip_code}, California",
-            radius_miles=2
-        )
-        all_retailers.extend(retailers)
-        
-        time.sleep(2)  # Be nice to the API
+    # Start with a few LA zip codes, searched concurrently
+    from discovery import AsyncDiscoveryEngine
+    
+    zip_codes = LA_METRO_ZIPS[:3]  # Start with 3 zip codes
+    print(f"\n{'='*50}")
+    print(f"Scraping zip codes: {', '.join(zip_codes)}")
+    print('='*50)
+    
+    engine = AsyncDiscoveryEngine(scraper, max_concurrency=8, requests_per_second=5.0)
+    all_retailers = engine.run(
+        [f"{zip_code}, California" for zip_code in zip_codes],
+        radius_miles=2
+    )
     
     # Save results
     os.makedirs("data", exist_ok=True)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Sharded Multi-Location Runner
+
+Statewide sweeps split their locations into shards by a stable hash, run
+each shard as an independent pipeline (own checkpoint and export, in a
+directory under the sharded run; the caches, identity index and
+incremental state in data_dir are shared, as across unsharded runs) in a
+process pool, then merge the shards' records with a
+deterministic reducer: cross-shard duplicates are matched with the same
+identity keys discovery uses, and the most complete record of each store
+wins. Shard assignment depends only on the location and shard count, so
+shards can also be handed out to other machines and merged afterwards:
+
+    python sharded_runner.py --locations 90012 90028 91423 --shards 8
+    python sharded_runner.py --shards 8 --shard 3 ...     # one shard only
+    python sharded_runner.py --shards 8 --merge-only ...  # after copying shards back
+"""
+
+import os
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from variants import stable_bucket
+from identity import RetailerIdentityIndex
+from storage import RecordStore
+from checkpoint import new_run_id
+from pipeline import RetailAcquisitionPipeline
+from exporters import EXPORT_FORMATS, export_leads
+from export_ledger import ExportLedger
+
+
+def shard_of(location: str, num_shards: int) -> int:
+    """Shard index for a location; the same on every machine and run."""
+    key = " ".join(location.lower().split())
+    return min(int(stable_bucket("shard", key) * num_shards), num_shards - 1)
+
+
+def partition(locations: List[str], num_shards: int) -> List[List[str]]:
+    """Locations per shard index (duplicates dropped, input order kept)."""
+    shards: List[List[str]] = [[] for _ in range(num_shards)]
+    for location in dict.fromkeys(locations):
+        shards[shard_of(location, num_shards)].append(location)
+    return shards
+
+
+def completeness(record: Dict) -> tuple:
+    """How far a record got through the pipeline; higher wins a merge."""
+    return (
+        bool(record.get('contact_email') and record.get('email')),
+        bool(record.get('contact_email')),
+        record.get('enrichment_confidence') or 0,
+        len(record)
+    )
+
+
+def merge_records(records: List[Dict]) -> List[Dict]:
+    """
+    Deterministic reducer over every shard's records.
+
+    Records are ranked most complete first (ties broken by retailer_id),
+    then resolved against a fresh identity index in that order, so the
+    best sighting of each store claims its id and later duplicates of it
+    are dropped. The result is sorted by retailer_id, so it doesn't
+    depend on shard count or finishing order.
+    """
+    ranked = sorted(records, key=lambda r: (tuple(-x for x in completeness(r)), str(r['retailer_id'])))
+
+    index = RetailerIdentityIndex(":memory:")
+    merged: Dict[str, Dict] = {}
+    for record, (retailer_id, _) in zip(ranked, index.resolve_many(ranked)):
+        merged.setdefault(retailer_id, record)
+    index.close()
+
+    return [merged[retailer_id] for retailer_id in sorted(merged)]
+
+
+@dataclass
+class ShardSpec:
+    """
+    One shard's slice of a sharded run: it reads and updates the shared
+    stores in data_dir and writes its run to output_dir.
+    """
+    index: int
+    count: int
+    locations: List[str]
+    data_dir: str
+    output_dir: str
+    run_id: str
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index:03d}-of-{self.count:03d}"
+
+
+def run_shard(
+    spec: ShardSpec,
+    pipeline_options: Dict,
+    radius_miles: float,
+    max_retailers: Optional[int]
+) -> Dict:
+    """
+    Run (or resume) one shard's pipeline; executed in a worker process.
+
+    Output goes to the shard's output_dir, and its console output to
+    shard.log there. A shard that already completed is not rerun.
+    """
+    os.makedirs(spec.output_dir, exist_ok=True)
+    with open(f"{spec.output_dir}/shard.log", "a") as log, redirect_stdout(log):
+        pipeline = RetailAcquisitionPipeline(
+            data_dir=spec.data_dir,
+            output_dir=spec.output_dir,
+            run_id=spec.run_id,
+            **pipeline_options
+        )
+        status = pipeline.checkpoint.manifest.get("status")
+
+        if status == "complete":
+            print(f"Shard {spec.name} already complete (run {spec.run_id})")
+            stats = None
+        elif pipeline.checkpoint.exists:
+            stats = pipeline.resume()["stats"]
+        else:
+            stats = pipeline.run_full_pipeline(spec.locations, radius_miles, max_retailers)["stats"]
+
+    return {
+        "shard": spec.name,
+        "run_id": spec.run_id,
+        "locations": spec.locations,
+        "store": pipeline.store.path,
+        "resumed": status is not None and status != "complete",
+        "skipped": status == "complete",
+        "stats": stats
+    }
+
+
+class ShardedRunner:
+    """
+    Runs a multi-location sweep as num_shards independent pipelines on
+    up to `processes` cores, then merges them.
+
+    pipeline_options are passed to every shard's RetailAcquisitionPipeline.
+    Its requests_per_second is the total Places budget: each of the
+    concurrently running shards gets an equal share.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+        num_shards: Optional[int] = None,
+        processes: Optional[int] = None,
+        run_id: Optional[str] = None,
+        **pipeline_options
+    ):
+        self.data_dir = data_dir
+        self.processes = processes or os.cpu_count() or 1
+        self.num_shards = num_shards or self.processes
+        self.run_id = run_id or new_run_id()
+        self.run_dir = f"{data_dir}/sharded/{self.run_id}"
+
+        total_rps = pipeline_options.pop("requests_per_second", 5.0)
+        pipeline_options["requests_per_second"] = total_rps / min(self.processes, self.num_shards)
+        self.pipeline_options = pipeline_options
+
+    def plan(self, locations: List[str]) -> List[ShardSpec]:
+        """One spec per non-empty shard."""
+        return [
+            ShardSpec(
+                index=i,
+                count=self.num_shards,
+                locations=shard_locations,
+                data_dir=self.data_dir,
+                output_dir=f"{self.run_dir}/shard-{i:03d}-of-{self.num_shards:03d}",
+                run_id=f"{self.run_id}-s{i:03d}"
+            )
+            for i, shard_locations in enumerate(partition(locations, self.num_shards))
+            if shard_locations
+        ]
+
+    def run(
+        self,
+        locations: List[str],
+        radius_miles: float = 5,
+        max_retailers_per_shard: Optional[int] = None,
+        only_shard: Optional[int] = None,
+        merge: bool = True
+    ) -> Dict:
+        """
+        Run every shard (or just only_shard) and merge the results.
+
+        Failed shards are reported and left resumable: running again with
+        the same run_id resumes them and skips the completed ones.
+        """
+        specs = self.plan(locations)
+        if only_shard is not None:
+            specs = [s for s in specs if s.index == only_shard]
+
+        print(f"Sharded run {self.run_id}: {len(locations)} locations in {len(specs)} shards, "
+              f"{self.processes} processes")
+
+        results, failed = [], []
+        # spawn: workers start clean instead of inheriting the parent's
+        # threads and open SQLite handles
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.processes, len(specs) or 1), mp_context=context) as pool:
+            futures = {
+                pool.submit(run_shard, spec, self.pipeline_options, radius_miles, max_retailers_per_shard): spec
+                for spec in specs
+            }
+            for future in as_completed(futures):
+                spec = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"  ✗ {spec.name} failed: {e} (see {spec.output_dir}/shard.log)")
+                    failed.append({"shard": spec.name, "error": str(e)})
+                    continue
+                results.append(result)
+                note = "already complete" if result["skipped"] else (
+                    f"{result['stats']['ready_for_outreach']} ready, "
+                    f"{result['stats']['run_time_seconds']:.1f}s"
+                )
+                print(f"  ✓ {spec.name}: {', '.join(spec.locations)} ({note})")
+
+        summary = {
+            "run_id": self.run_id,
+            "shards": sorted(results, key=lambda r: r["shard"]),
+            "failed": sorted(failed, key=lambda f: f["shard"])
+        }
+        if failed:
+            print(f"⚠ {len(failed)} shards failed; rerun with --run-id {self.run_id} to resume them")
+        if merge and only_shard is None:
+            summary["merged"] = self.merge()
+
+        os.makedirs(self.run_dir, exist_ok=True)
+        with open(f"{self.run_dir}/sharded.json", "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+        return summary
+
+    def merge(self) -> Dict:
+        """
+        Merge every shard store under this run's directory into
+        merged.jsonl and a CSV in the shards' export format.
+
+        Like a single pipeline run, the CSV only holds leads that are new
+        or changed since their last export, checked against (and then
+        recorded in) the export ledger in data_dir, unless the shards
+        were configured with incremental_export=False.
+
+        Shards that never got far enough to write a run log (failed
+        early, or not copied back yet) are skipped.
+        """
+        shard_runs = [
+            f"{self.run_dir}/{shard}/runs"
+            for shard in sorted(os.listdir(self.run_dir)) if shard.startswith("shard-")
+        ]
+        stores = sorted(
+            f"{runs}/{run_id}/retailers.jsonl"
+            for runs in shard_runs if os.path.isdir(runs)
+            for run_id in os.listdir(runs)
+            if run_id.startswith(self.run_id)
+        )
+
+        records = [record for path in stores for record in RecordStore(path).latest().values()]
+        merged = merge_records(records)
+
+        merged_path = f"{self.run_dir}/merged.jsonl"
+        if os.path.exists(merged_path):
+            os.remove(merged_path)
+        RecordStore(merged_path).append_many("merged", merged)
+        ledger = ExportLedger(f"{self.data_dir}/export_ledger.jsonl")
+        leads = merged
+        if self.pipeline_options.get("incremental_export", True):
+            leads = ledger.new_or_changed(merged)
+
+        export_format = self.pipeline_options.get("export_format", "instantly")
+        exported: List = []
+        export = export_leads(
+            leads,
+            f"{self.run_dir}/{export_format}_import.csv",
+            export_format,
+            rows_per_file=self.pipeline_options.get("export_rows_per_file"),
+            compress=self.pipeline_options.get("export_gzip", False),
+            on_row=lambda retailer, path: exported.append((retailer, path))
+        )
+        ledger.record(exported)
+        ready = export.rows
+
+        print(f"Merged {len(stores)} shards: {len(records)} records, {len(merged)} unique retailers "
+              f"({len(records) - len(merged)} cross-shard duplicates), {ready} leads exported, "
+              f"{ledger.skipped} already exported skipped")
+        print(f"   {merged_path}")
+        for path in export.files:
+            print(f"   {path} (for {export_format.title()})")
+        return {
+            "shards": len(stores),
+            "records": len(records),
+            "unique": len(merged),
+            "ready_for_outreach": ready,
+            "already_exported": ledger.skipped,
+            "store": merged_path,
+            "export_files": export.files
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline sharded across processes")
+    parser.add_argument("--locations", nargs="+", default=["90012", "90028", "91423"],
+                        help="Zip codes or city names to search")
+    parser.add_argument("--radius", type=float, default=3, help="Search radius in miles")
+    parser.add_argument("--max-retailers", type=int, help="Cap on retailers per shard")
+    parser.add_argument("--shards", type=int, help="Number of shards (default: processes)")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--data-dir", default="data", help="Data directory")
+    parser.add_argument("--run-id", help="Sharded run id (existing ids resume)")
+    parser.add_argument("--shard", type=int, help="Run only this shard index, without merging")
+    parser.add_argument("--merge-only", action="store_true", help="Only merge existing shard outputs")
+    parser.add_argument("--discovery-mode", choices=["radius", "grid"], default="radius")
+    parser.add_argument("--max-pages", type=int, default=3, help="Places result pages (20 each) per search")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip searches run within --freshness-hours and retailers that haven't changed")
+    parser.add_argument("--freshness-hours", type=float, default=168,
+                        help="How long a search stays fresh in incremental mode")
+    parser.add_argument("--rps", type=float, default=5.0, help="Total Places requests per second")
+    parser.add_argument("--llm-backend", choices=["interactive", "batch"], default="interactive")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="AI requests in flight per shard")
+    parser.add_argument("--crawl-websites", action="store_true")
+    parser.add_argument("--export-format", choices=sorted(EXPORT_FORMATS), default="instantly",
+                        help="Outreach tool the merged CSV is laid out for")
+    parser.add_argument("--rows-per-file", type=int, help="Split the merged export into parts of this many leads")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the merged export")
+    parser.add_argument("--full-export", action="store_true",
+                        help="Export every merged lead, including ones already exported")
+    args = parser.parse_args()
+
+    if (args.shard is not None or args.merge_only) and not args.run_id:
+        parser.error("--shard and --merge-only need --run-id (the same on every machine)")
+
+    runner = ShardedRunner(
+        data_dir=args.data_dir,
+        num_shards=args.shards,
+        processes=args.processes,
+        run_id=args.run_id,
+        discovery_mode=args.discovery_mode,
+        max_pages=args.max_pages,
+        incremental=args.incremental,
+        freshness_hours=args.freshness_hours,
+        requests_per_second=args.rps,
+        llm_backend=args.llm_backend,
+        llm_concurrency=args.llm_concurrency,
+        crawl_websites=args.crawl_websites,
+        export_format=args.export_format,
+        export_rows_per_file=args.rows_per_file,
+        export_gzip=args.gzip,
+        incremental_export=not args.full_export
+    )
+    if args.merge_only:
+        runner.merge()
+    else:
+        runner.run(args.locations, args.radius, args.max_retailers, only_shard=args.shard)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Website Contact Crawler
+
+Fetches each retailer's homepage plus its contact/about pages and pulls
+emails, phone numbers and owner names out of the HTML. Sites are crawled
+concurrently (blocking fetches on worker threads, scheduled by asyncio
+like discovery.py) with one request at a time and a minimum delay per
+domain, so no small-business site sees more than a trickle of traffic.
+Pages are cached by URL and revalidated with ETag/Last-Modified, so
+recrawls mostly cost a 304.
+"""
+
+import re
+import time
+import asyncio
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from html import unescape
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit
+
+from db import SQLiteStore
+from enrichment import EnrichmentProvider, website_domain
+from http_client import HttpClient, HttpError
+
+USER_AGENT = "Mozilla/5.0 (compatible; WingmanLabsContactBot/1.0)"
+
+# Pages beyond the homepage worth fetching, by link href or text
+CONTACT_LINK = re.compile(r"contact|about|team|staff|our-story|owner", re.IGNORECASE)
+
+LINK_PATTERN = re.compile(r"<a\b[^>]*?href\s*=\s*[\"']([^\"'#]+)[\"'][^>]*>(.*?)</a>", re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+SCRIPT_STYLE_PATTERN = re.compile(r"<(script|style)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+
+EMAIL_PATTERN = re.compile(
+    r"[A-Za-z0-9._%+-]+(?:@|\s*[\[(]\s*at\s*[\])]\s*)[A-Za-z0-9.-]+(?:\.|\s*[\[(]\s*dot\s*[\])]\s*)[A-Za-z]{2,}"
+)
+PHONE_PATTERN = re.compile(r"(?<!\d)(?:\+?1[\s.-]?)?\(?([2-9]\d{2})\)?[\s.-]?(\d{3})[\s.-]?(\d{4})(?!\d)")
+OWNER_PATTERNS = [
+    re.compile(r"\b(?i:owner|founder|proprietor|manager)s?\s*[:\-–]\s*([A-Z][a-z]+(?: [A-Z][a-z]+){1,2})"),
+    re.compile(r"\b([A-Z][a-z]+(?: [A-Z][a-z]+){1,2}),?\s+(?i:the\s+)?(?i:owner|founder|proprietor)\b"),
+    re.compile(r"\b(?i:owned|founded|run) by\s+([A-Z][a-z]+(?: [A-Z][a-z]+){1,2})")
+]
+
+# Addresses that show up in page source but aren't anyone's inbox
+IGNORED_EMAIL_DOMAINS = ("example.com", "sentry.io", "wixpress.com", "domain.com", "email.com")
+IGNORED_EMAIL_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp")
+
+# Most of a page's HTML that is worth scanning
+MAX_PAGE_BYTES = 500_000
+
+
+@dataclass
+class SiteContacts:
+    """Everything found on one retailer's site."""
+    url: str
+    emails: List[str] = field(default_factory=list)
+    phones: List[str] = field(default_factory=list)
+    owner_names: List[str] = field(default_factory=list)
+    pages_fetched: int = 0
+
+    def best_email(self) -> Optional[str]:
+        """Prefer addresses on the site's own domain, then named/owner inboxes."""
+        if not self.emails:
+            return None
+        domain = website_domain(self.url)
+
+        def rank(email: str):
+            local, _, email_domain = email.partition("@")
+            return (
+                on_site_domain(email_domain, domain),
+                local in ("owner", "manager") or local not in ("info", "contact", "hello", "sales", "support"),
+            )
+
+        return max(self.emails, key=rank)
+
+
+def _unique(values: List[str]) -> List[str]:
+    return list(dict.fromkeys(values))
+
+
+def on_site_domain(email_domain: str, site_domain: Optional[str]) -> bool:
+    """Whether an email domain is the site's domain or a subdomain of it."""
+    if not site_domain or not email_domain:
+        return False
+    email_domain = email_domain.lower()
+    return email_domain == site_domain or email_domain.endswith(f".{site_domain}")
+
+
+def normalize_url(website: str) -> str:
+    """Canonical form of a website URL, so one site is crawled once."""
+    parts = urlsplit(website if "://" in website else f"http://{website}")
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path.rstrip("/") or "/",
+        parts.query,
+        ""
+    ))
+
+
+def extract_contacts(html: str) -> Dict[str, List[str]]:
+    """Emails, phones and owner names in one page's HTML."""
+    mailtos = re.findall(r"mailto:([^\"'?>\s]+)", html, re.IGNORECASE)
+    text = unescape(TAG_PATTERN.sub(" ", SCRIPT_STYLE_PATTERN.sub(" ", html)))
+    text = re.sub(r"\s+", " ", text)
+
+    emails = []
+    for raw in mailtos + EMAIL_PATTERN.findall(text):
+        email = re.sub(r"\s*[\[(]\s*at\s*[\])]\s*", "@", raw, flags=re.IGNORECASE)
+        email = re.sub(r"\s*[\[(]\s*dot\s*[\])]\s*", ".", email, flags=re.IGNORECASE).lower().strip(".")
+        if (
+            "@" in email
+            and not email.endswith(IGNORED_EMAIL_SUFFIXES)
+            and not email.split("@", 1)[1].endswith(IGNORED_EMAIL_DOMAINS)
+        ):
+            emails.append(email)
+
+    phones = [f"({a}) {b}-{c}" for a, b, c in PHONE_PATTERN.findall(text)]
+    owners = [name for pattern in OWNER_PATTERNS for name in pattern.findall(text)]
+
+    return {"emails": _unique(emails), "phones": _unique(phones), "owner_names": _unique(owners)}
+
+
+def find_contact_links(html: str, base_url: str, limit: int = 3) -> List[str]:
+    """Same-site contact/about page URLs linked from a page."""
+    domain = website_domain(base_url)
+    links = []
+    for href, label in LINK_PATTERN.findall(html):
+        if not (CONTACT_LINK.search(href) or CONTACT_LINK.search(TAG_PATTERN.sub("", label))):
+            continue
+        url = urljoin(base_url, unescape(href.strip()))
+        if urlparse(url).scheme in ("http", "https") and website_domain(url) == domain:
+            links.append(url.split("#")[0])
+    return [u for u in _unique(links) if u.rstrip("/") != base_url.rstrip("/")][:limit]
+
+
+class PageCache(SQLiteStore):
+    """URL -> body plus the validators needed for conditional requests."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+    """
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "body": row[2], "fetched_at": row[3]}
+
+    def set(self, url: str, body: str, etag: Optional[str], last_modified: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, time.time())
+            )
+            self._conn.commit()
+
+    def touch(self, url: str):
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+
+class SiteCrawler:
+    """
+    Crawls retailer websites for contact details.
+
+    - max_concurrency: fetches in flight across all sites
+    - per_domain_delay: minimum seconds between requests to one domain
+      (requests to a domain are also serialized)
+    - max_pages_per_site: homepage plus up to this many - 1 linked pages
+    - max_age_hours: cached pages younger than this aren't revalidated
+
+    Crawls run on one background event loop owned by the crawler, so
+    crawl()/crawl_many() can be called from several threads at once (as
+    streaming enrich workers do) and still share the concurrency limit
+    and per-domain politeness. close() stops the loop.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[PageCache] = None,
+        max_concurrency: int = 16,
+        per_domain_delay: float = 1.0,
+        max_pages_per_site: int = 4,
+        max_age_hours: float = 24,
+        http_client: Optional[HttpClient] = None
+    ):
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.per_domain_delay = per_domain_delay
+        self.max_pages_per_site = max_pages_per_site
+        self.max_age_seconds = max_age_hours * 3600
+        self.http = http_client or HttpClient(
+            max_retries=1,
+            timeout=(5.0, 10.0),
+            pool_connections=max_concurrency * 2,
+            max_connections_per_host=2
+        )
+
+        # retailer_id -> what crawl_many found, for WebsiteProvider
+        self.results: Dict[str, SiteContacts] = {}
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+        # Background loop and the state bound to it (see _loop_running)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def crawl_many(self, retailers: List[Dict]) -> Dict[str, SiteContacts]:
+        """
+        Crawl every retailer with a website; returns contacts by retailer_id.
+
+        Retailers sharing a website (chains, duplicate listings) share one
+        crawl of it. Blocks the calling thread until its sites are done.
+        """
+        async def _run():
+            return await asyncio.gather(*[self._crawl_site(url) for url in urls])
+
+        with_site = [r for r in retailers if r.get('website')]
+        if not with_site:
+            return {}
+
+        urls = _unique([normalize_url(r['website']) for r in with_site])
+        crawled = asyncio.run_coroutine_threadsafe(_run(), self._loop_running()).result()
+        by_url = dict(zip(urls, crawled))
+        found = {r['retailer_id']: by_url[normalize_url(r['website'])] for r in with_site}
+        self.results.update(found)
+
+        print(f"  Crawled {len(urls)} websites: {self.stats['fetched']} pages fetched, "
+              f"{self.stats['not_modified']} not modified, {self.stats['cached']} from cache, "
+              f"{self.stats['failed']} failed")
+        return found
+
+    def crawl(self, retailer: Dict) -> Optional[SiteContacts]:
+        """One retailer's site (from crawl_many's results when available)."""
+        if retailer.get('retailer_id') in self.results:
+            return self.results[retailer['retailer_id']]
+        if not retailer.get('website'):
+            return None
+        return self.crawl_many([retailer]).get(retailer['retailer_id'])
+
+    async def _crawl_site(self, url: str) -> SiteContacts:
+        contacts = SiteContacts(url=url)
+
+        homepage = await self._fetch(url)
+        if homepage is None:
+            return contacts
+
+        pages = [homepage]
+        links = find_contact_links(homepage, url, limit=self.max_pages_per_site - 1)
+        pages += [page for page in await asyncio.gather(*[self._fetch(link) for link in links]) if page]
+
+        for page in pages:
+            found = extract_contacts(page)
+            contacts.emails += found["emails"]
+            contacts.phones += found["phones"]
+            contacts.owner_names += found["owner_names"]
+        contacts.emails = _unique(contacts.emails)
+        contacts.phones = _unique(contacts.phones)
+        contacts.owner_names = _unique(contacts.owner_names)
+        contacts.pages_fetched = len(pages)
+        return contacts
+
+    async def _fetch(self, url: str) -> Optional[str]:
+        """Page body, politely: one request per domain at a time, spaced out."""
+        # A fresh cached page costs the site nothing, so skip the wait
+        body = self._fresh_cached(url)
+        if body is not None:
+            return body
+
+        domain = website_domain(url)
+        async with self._domain_locks[domain]:
+            wait = self._domain_last[domain] + self.per_domain_delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                body = await loop.run_in_executor(self._executor, self._get, url)
+            self._domain_last[domain] = time.monotonic()
+        return body
+
+    def _fresh_cached(self, url: str) -> Optional[str]:
+        """Cached body of url if it's young enough to skip revalidation."""
+        cached = self.cache.get(url) if self.cache else None
+        if cached and time.time() - cached["fetched_at"] < self.max_age_seconds:
+            self._count("cached")
+            return cached["body"]
+        return None
+
+    def _get(self, url: str) -> Optional[str]:
+        """Blocking fetch with ETag/Last-Modified revalidation (worker thread)."""
+        cached = self.cache.get(url) if self.cache else None
+        if cached and time.time() - cached["fetched_at"] < self.max_age_seconds:
+            # Cached by another fetch while this one waited its turn
+            self._count("cached")
+            return cached["body"]
+
+        headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            response = self.http.get(url, headers=headers)
+        except HttpError:
+            self._count("failed")
+            return None
+
+        if response.status_code == 304 and cached:
+            self._count("not_modified")
+            self.cache.touch(url)
+            return cached["body"]
+
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            return None
+
+        body = response.text[:MAX_PAGE_BYTES]
+        self._count("fetched")
+        if self.cache:
+            self.cache.set(url, body, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return body
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def close(self):
+        """Stop the background loop; a later crawl starts a new one."""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        self._loop_thread.join()
+        loop.close()
+        self._executor.shutdown(wait=False)
+
+    def _loop_running(self) -> asyncio.AbstractEventLoop:
+        """
+        The crawler's event loop, started on first use. The semaphore,
+        domain locks and executor are created once with it, so every
+        caller's fetches go through the same ones.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+                self._loop_thread = threading.Thread(
+                    target=loop.run_forever, name="site-crawler", daemon=True
+                )
+                self._loop_thread.start()
+                asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _open(self):
+        # Created on the loop thread, so they belong to that loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._domain_locks = defaultdict(asyncio.Lock)
+        self._domain_last = defaultdict(float)
+
+
+class WebsiteProvider(EnrichmentProvider):
+    """
+    Contact published on the retailer's own website.
+
+    Not cached by the provider chain (ttl_days = 0): the crawler's page
+    cache already makes repeat lookups cheap.
+    """
+
+    name = "website"
+    ttl_days = 0
+
+    def __init__(self, crawler: SiteCrawler):
+        self.crawler = crawler
+
+    def lookup(self, retailer: Dict) -> Optional[Dict]:
+        contacts = self.crawler.crawl(retailer)
+        if not contacts or not (contacts.emails or contacts.owner_names):
+            return None
+
+        email = contacts.best_email()
+        on_domain = bool(email) and on_site_domain(email.split("@", 1)[1], website_domain(contacts.url))
+        owner = contacts.owner_names[0] if contacts.owner_names else None
+
+        # An own-domain address with a named owner rarely needs a paid
+        # lookup; a bare info@ or off-domain address still tries the chain
+        confidence = 0.6 if on_domain else 0.4
+        if owner:
+            confidence += 0.25
+
+        return {
+            'name': owner,
+            'email': email,
+            'phone': (contacts.phones[0] if contacts.phones else None) or retailer.get('phone'),
+            'title': 'Owner' if owner else None,
+            'confidence': round(confidence, 2)
+        }
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Record Storage
+
+Append-only JSONL record store shared by every pipeline stage. Each stage
+appends only the fields it adds, one line per retailer as soon as that
+retailer is done, so a crash mid-stage loses nothing and records aren't
+re-serialized once per stage. Reading folds the lines for each
+retailer_id into one merged record; an index of line offsets per key
+lets single records and record-at-a-time scans be read back without
+loading the whole log.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+def entry_stages(entry: Dict) -> List[str]:
+    """Stages a log entry stands for (a compacted line keeps all of them)."""
+    return entry.get("stages") or [entry["stage"]]
+
+
+class RecordStore:
+    """
+    Keyed, append-only JSONL store.
+
+    Line format: {"key": <retailer_id>, "stage": <stage>, "at": <iso>, "data": {...}}
+    Compacted lines have stage "compacted" plus "stages": every stage
+    folded into them.
+    """
+
+    def __init__(self, path: str = "data/retailers.jsonl", key_field: str = "retailer_id"):
+        self.path = path
+        self.key_field = key_field
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        # key -> byte offsets of its lines, for the log up to _indexed_to
+        self._offsets: Dict[str, List[int]] = {}
+        self._indexed_to = 0
+
+    def append(self, stage: str, record: Dict):
+        """Append one record (or partial update) for a stage."""
+        self.append_many(stage, [record])
+
+    def append_many(self, stage: str, records: List[Dict]):
+        """Append records in one write; each must carry key_field."""
+        now = datetime.utcnow().isoformat()
+        lines = "".join(
+            json.dumps(
+                {"key": r[self.key_field], "stage": stage, "at": now, "data": r},
+                separators=(",", ":"),
+                default=str
+            ) + "\n"
+            for r in records
+        )
+
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(lines)
+                f.flush()
+
+    def iter_entries(self, stage: Optional[str] = None) -> Iterator[Dict]:
+        """Raw log entries in write order, optionally for one stage."""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-write
+                    continue
+                if stage is None or stage in entry_stages(entry):
+                    yield entry
+
+    def completed(self, stage: str) -> Set[str]:
+        """Keys with at least one entry for stage."""
+        return {entry["key"] for entry in self.iter_entries(stage)}
+
+    def latest(self) -> Dict[str, Dict]:
+        """Merged record per key (later entries override earlier fields)."""
+        records: Dict[str, Dict] = {}
+        for entry in self.iter_entries():
+            records.setdefault(entry["key"], {}).update(entry["data"])
+        return records
+
+    def iter_latest(self) -> Iterator[Tuple[str, Dict]]:
+        """
+        (key, merged record) pairs in first-write order, one at a time.
+
+        Like latest().items(), but only the offset index is held in
+        memory, not every record.
+        """
+        for key, _, record in self._iter_merged():
+            yield key, record
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Merged record for one key, read from its indexed lines."""
+        with self._lock:
+            self._refresh_index()
+            offsets = list(self._offsets.get(key, ()))
+        if not offsets:
+            return None
+        with open(self.path, 'rb') as f:
+            return self._merge(f, offsets)[1]
+
+    def compact(self):
+        """Rewrite the log as one merged line per key, keeping its stages."""
+        tmp_path = f"{self.path}.tmp"
+
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                now = datetime.utcnow().isoformat()
+                for key, stages, data in self._iter_merged():
+                    f.write(json.dumps(
+                        {"key": key, "stage": "compacted", "stages": stages, "at": now, "data": data},
+                        separators=(",", ":"),
+                        default=str
+                    ) + "\n")
+            os.replace(tmp_path, self.path)
+            self._offsets, self._indexed_to = {}, 0
+
+    def _iter_merged(self) -> Iterator[Tuple[str, List[str], Dict]]:
+        """(key, stages, merged record) per key, in first-write order."""
+        with self._lock:
+            self._refresh_index()
+            index = list(self._offsets.items())
+        if not index:
+            return
+
+        with open(self.path, 'rb') as f:
+            for key, offsets in index:
+                stages, record = self._merge(f, offsets)
+                yield key, stages, record
+
+    @staticmethod
+    def _merge(f, offsets: List[int]) -> Tuple[List[str], Dict]:
+        """Fold the lines at offsets into (stages, record)."""
+        stages: Dict[str, None] = {}
+        record: Dict = {}
+        for offset in offsets:
+            f.seek(offset)
+            entry = json.loads(f.readline())
+            stages.update(dict.fromkeys(entry_stages(entry)))
+            record.update(entry["data"])
+        return list(stages), record
+
+    def _refresh_index(self):
+        """Index lines appended since the last call (by any writer)."""
+        if not os.path.exists(self.path):
+            return
+        if os.path.getsize(self.path) < self._indexed_to:
+            # Rewritten (compacted) by another store on the same file
+            self._offsets, self._indexed_to = {}, 0
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._indexed_to)
+            offset = self._indexed_to
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Still being written; picked up next time
+                    break
+                try:
+                    key = json.loads(line)["key"]
+                except ValueError:
+                    # Torn line from a crash mid-write
+                    key = None
+                if key is not None:
+                    self._offsets.setdefault(key, []).append(offset)
+                offset += len(line)
+            self._indexed_to = offset
+
+    def to_parquet(self, path: str):
+        """Write merged records as Parquet (needs pandas plus pyarrow or fastparquet)."""
+        import pandas as pd
+
+        df = pd.json_normalize(list(self.latest().values()))
+        df.to_parquet(path, index=False)
+        print(f"Saved {len(df)} records to {path}")
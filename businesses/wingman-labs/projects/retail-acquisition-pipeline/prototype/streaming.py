@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Streaming Runner
+
+Runs the pipeline stages as overlapping worker pools connected by bounded
+queues instead of batch barriers: a retailer moves on to enrichment and
+email generation as soon as discovery parses it. Full queues block the
+stage upstream (backpressure), so memory stays bounded.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from email_generator import EmailGenerator
+
+_DONE = object()
+
+
+class _StagePool:
+    """N worker threads applying func to items from inbox, results to outbox."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict], Optional[Dict]],
+        inbox: queue.Queue,
+        outbox: queue.Queue,
+        workers: int,
+        downstream_workers: int
+    ):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.downstream_workers = downstream_workers
+        self.processed = 0
+        # (retailer, error message) for every item func raised on
+        self.failures: List[Tuple[Dict, str]] = []
+        self._remaining = workers
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    @property
+    def errors(self) -> int:
+        return len(self.failures)
+
+    def _work(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+
+            try:
+                result = self.func(item)
+            except Exception as e:
+                print(f"  [{self.name}] error on {item.get('business_name')}: {e}")
+                with self._lock:
+                    self.failures.append((item, str(e)))
+                continue
+
+            with self._lock:
+                self.processed += 1
+            if result is not None:
+                self.outbox.put(result)
+
+        # Last worker out tells every downstream worker to stop
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            for _ in range(self.downstream_workers):
+                self.outbox.put(_DONE)
+
+
+class StreamingPipelineRunner:
+    """
+    discover -> enrich -> personalize -> collect, all running at once.
+
+    Uses the pipeline's own per-record steps (_admit, _enrich_one,
+    _personalize_one) so streaming and batch runs write identical records.
+    """
+
+    def __init__(
+        self,
+        pipeline,
+        enrich_workers: int = 4,
+        personalize_workers: int = 4,
+        queue_size: int = 100
+    ):
+        self.pipeline = pipeline
+        self.enrich_workers = enrich_workers
+        self.personalize_workers = personalize_workers
+        self.queue_size = queue_size
+        self.time_to_first_lead: Optional[float] = None
+        # Retailers a stage raised on, (retailer, error); set by run()
+        self.failures: List[Tuple[Dict, str]] = []
+
+    def run(
+        self,
+        locations: List[str],
+        radius_miles: float,
+        max_retailers: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Stream every discovered retailer through enrich and personalize.
+
+        Once max_retailers have been admitted, discovery stops issuing
+        searches. A resumed run whose discovery already finished is fed
+        from the checkpoint instead. Retailers a stage fails on are left
+        out of the results and listed in self.failures.
+        
+        Returns:
+            All admitted retailers with their enrichment/email fields, in
+            completion order
+        """
+        pipeline = self.pipeline
+        generator = EmailGenerator(
+            pipeline.anthropic_api_key,
+            max_concurrency=min(self.personalize_workers, pipeline.llm_concurrency),
+            cache=pipeline.email_cache
+        )
+        start = time.monotonic()
+
+        to_enrich = queue.Queue(maxsize=self.queue_size)
+        to_personalize = queue.Queue(maxsize=self.queue_size)
+        finished = queue.Queue()
+
+        enrich = _StagePool(
+            "enrich", self._enrich, to_enrich, to_personalize,
+            self.enrich_workers, self.personalize_workers
+        )
+        personalize = _StagePool(
+            "personalize", lambda r: self._personalize(generator, r, start),
+            to_personalize, finished, self.personalize_workers, 1
+        )
+        enrich.start()
+        personalize.start()
+
+        seen_this_run = set()
+        admitted = 0
+        capped = threading.Event()
+
+        def on_results(batch: List[Dict]):
+            nonlocal admitted
+            if capped.is_set():
+                return
+            limit = max_retailers - admitted if max_retailers else None
+            for retailer in pipeline._admit(batch, seen_this_run, verbose=False, limit=limit):
+                admitted += 1
+                to_enrich.put(retailer)
+            if max_retailers and admitted >= max_retailers:
+                capped.set()
+
+        try:
+            if pipeline.checkpoint.stage_completed("discover"):
+                resumed = pipeline.checkpoint.discovered()
+                print(f"  [Resumed - {len(resumed)} retailers from run {pipeline.run_id}]")
+                for retailer in resumed:
+                    admitted += 1
+                    to_enrich.put(retailer)
+            else:
+                pipeline._search_retailers(locations, radius_miles, on_results=on_results, stop=capped)
+                pipeline.checkpoint.complete_stage("discover")
+        finally:
+            for _ in range(self.enrich_workers):
+                to_enrich.put(_DONE)
+
+        results = []
+        while True:
+            item = finished.get()
+            if item is _DONE:
+                break
+            results.append(item)
+
+        enrich.join()
+        personalize.join()
+        self.failures = enrich.failures + personalize.failures
+
+        if capped.is_set():
+            print(f"  Stopped discovery at {max_retailers} retailers")
+        print(f"  Admitted {admitted} retailers; "
+              f"enriched {enrich.processed} ({enrich.errors} errors), "
+              f"personalized {personalize.processed} ({personalize.errors} errors)")
+        if self.failures:
+            print(f"  ⚠ {len(self.failures)} retailers failed and are left out of this run's export")
+        if self.time_to_first_lead is not None:
+            print(f"  Time to first lead: {self.time_to_first_lead:.1f}s")
+        return results
+
+    def _enrich(self, retailer: Dict) -> Dict:
+        if self.pipeline._resume_record("enrich", retailer):
+            return retailer
+        update = self.pipeline._enrich_one(retailer)
+        retailer.update(update)
+        self.pipeline._record("enrich", [update])
+        return retailer
+
+    def _personalize(self, generator, retailer: Dict, start: float) -> Dict:
+        if self.pipeline._resume_record("personalize", retailer):
+            return retailer
+        if retailer.get('contact_email'):
+            update = self.pipeline._personalize_one(generator, retailer)
+            retailer.update(update)
+            self.pipeline._record("personalize", [update])
+            if self.time_to_first_lead is None:
+                self.time_to_first_lead = time.monotonic() - start
+        return retailer
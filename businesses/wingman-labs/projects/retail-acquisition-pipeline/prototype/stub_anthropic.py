@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Local Anthropic API Stub
+
+Minimal stand-in for the Messages and Message Batches endpoints so the
+AI and batch email paths can be exercised without an API key or spend:
+
+    python stub_anthropic.py --port 8765 &
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=stub python pipeline.py
+
+Replies are canned emails built from the "Business Name:" lines of each
+prompt, returned as a call to the forced tool when tool_choice names one.
+Batches report in_progress until --batch-delay seconds pass. Prompt cache
+hits are simulated, but only for prefixes of at least --min-cache-tokens
+(~4 characters per token).
+"""
+
+import re
+import json
+import time
+import uuid
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+BATCHES: Dict[str, Dict] = {}
+BATCHES_LOCK = threading.Lock()
+
+# Cacheable prefixes seen so far (simulates prompt cache hits)
+CACHED_PREFIXES = set()
+
+# Like the API, prefixes shorter than this (in ~4-char tokens) are never
+# cached; their tokens are billed as plain input (see serve)
+MIN_CACHE_TOKENS = 1024
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def canned_email(name: str) -> Dict:
+    return {
+        "subject": f"Quick question for {name}",
+        "body": f"Hi there,\n\nThought {name} might be a fit for our energy strips. "
+                f"Open to a 10-minute call this week?\n\n— Alex",
+        "personalization_notes": "Stub response",
+        "follow_up_1": f"Hi there,\n\nFollowing up on energy strips for {name}. Worth a quick call?\n\n— Alex",
+        "follow_up_2": f"Hi there,\n\nLast note from me. Happy to drop off samples at {name}.\n\n— Alex"
+    }
+
+
+def canned_message(params: Dict) -> Dict:
+    """A Messages API response for one request's params."""
+    prompt = "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for message in params.get("messages", [])
+        for block in (message["content"] if isinstance(message["content"], list) else [message["content"]])
+    )
+    system = params.get("system", "")
+    # The cached prefix is the tools plus every system block up to the
+    # last breakpoint, and only if it is long enough
+    blocks = system if isinstance(system, list) else []
+    marked = [i for i, block in enumerate(blocks) if block.get("cache_control")]
+    prefix = (
+        json.dumps(params.get("tools", [])) + "".join(block["text"] for block in blocks[:marked[-1] + 1])
+        if marked else ""
+    )
+    cacheable = prefix if len(prefix) // 4 >= MIN_CACHE_TOKENS else ""
+    with BATCHES_LOCK:
+        cache_hit = bool(cacheable) and cacheable in CACHED_PREFIXES
+        if cacheable:
+            CACHED_PREFIXES.add(cacheable)
+
+    leads = re.findall(r"Lead ID: (.+)\nBusiness Name: (.+)", prompt)
+    match = re.search(r"Business Name: (.+)", prompt)
+    name = match.group(1).strip() if match else "your store"
+    tool = (params.get("tool_choice") or {}).get("name")
+
+    if tool:
+        if leads:
+            tool_input = {"emails": [
+                {"lead_id": lead_id.strip(), **canned_email(lead_name.strip())}
+                for lead_id, lead_name in leads
+            ]}
+        else:
+            tool_input = canned_email(name)
+        content = [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}",
+                    "name": tool, "input": tool_input}]
+        text = json.dumps(tool_input)
+    else:
+        email = canned_email(name)
+        text = (
+            f"SUBJECT: {email['subject']}\n"
+            f"BODY:\n{email['body']}\n"
+            f"PERSONALIZATION_NOTES:\n{email['personalization_notes']}"
+        )
+        content = [{"type": "text", "text": text}]
+
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model", "stub"),
+        "content": content,
+        "stop_reason": "tool_use" if tool else "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": (len(prompt) + len(prefix) - len(cacheable)) // 4,
+            "cache_creation_input_tokens": 0 if cache_hit else len(cacheable) // 4,
+            "cache_read_input_tokens": len(cacheable) // 4 if cache_hit else 0,
+            "output_tokens": len(text) // 4
+        }
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    batch_delay = 2.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        if self.path.startswith("/v1/messages/batches"):
+            batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+            # Built outside the lock: canned_message takes it too
+            results = [
+                {
+                    "custom_id": r["custom_id"],
+                    "result": {"type": "succeeded", "message": canned_message(r["params"])}
+                }
+                for r in body.get("requests", [])
+            ]
+            with BATCHES_LOCK:
+                BATCHES[batch_id] = {"created": _now(), "results": results}
+            self._json(self._batch_object(batch_id))
+        elif self.path.startswith("/v1/messages"):
+            self._json(canned_message(body))
+        else:
+            self._json({"type": "error", "error": {"type": "not_found_error"}}, 404)
+
+    def do_GET(self):
+        match = re.match(r"^/v1/messages/batches/([^/?]+)(/results)?", self.path)
+        if not match or match.group(1) not in BATCHES:
+            self._json({"type": "error", "error": {"type": "not_found_error"}}, 404)
+            return
+
+        batch_id, results = match.group(1), match.group(2)
+        if not results:
+            self._json(self._batch_object(batch_id))
+            return
+
+        lines = "".join(json.dumps(r) + "\n" for r in BATCHES[batch_id]["results"]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(lines)))
+        self.end_headers()
+        self.wfile.write(lines)
+
+    def _batch_object(self, batch_id: str) -> Dict:
+        batch = BATCHES[batch_id]
+        ended = (_now() - batch["created"]).total_seconds() >= self.batch_delay
+        total = len(batch["results"])
+        host = self.headers.get("Host")
+
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else total,
+                "succeeded": total if ended else 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0
+            },
+            "created_at": batch["created"].isoformat(),
+            "expires_at": (batch["created"] + timedelta(hours=24)).isoformat(),
+            "ended_at": _now().isoformat() if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"http://{host}/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    def _json(self, data: Dict, status: int = 200):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(port: int = 8765, batch_delay: float = 2.0, min_cache_tokens: int = 1024) -> ThreadingHTTPServer:
+    """Start the stub on a background thread and return the server."""
+    global MIN_CACHE_TOKENS
+    MIN_CACHE_TOKENS = min_cache_tokens
+    StubHandler.batch_delay = batch_delay
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Anthropic API stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay", type=float, default=2.0)
+    parser.add_argument("--min-cache-tokens", type=int, default=1024,
+                        help="Shortest prefix that is cached (the model's minimum)")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.batch_delay, args.min_cache_tokens)
+    print(f"Stub Anthropic API on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
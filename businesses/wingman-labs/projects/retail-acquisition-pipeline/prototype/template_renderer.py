@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Vectorized Template Renderer
+
+Bulk version of EmailGenerator's no-API template path for demo/fallback
+runs over whole metro exports. Each template is precompiled once per
+business type (type- and sender-specific text baked in), then rendered
+column-wise over a pandas DataFrame by concatenating literal chunks with
+the per-row columns, instead of formatting five strings per retailer.
+
+Output matches EmailGenerator._generate_template row for row:
+
+    python template_renderer.py --rows 20000    # benchmark against it
+"""
+
+import time
+import argparse
+from string import Formatter
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from email_generator import (
+    EMAIL_TEMPLATES,
+    SUBJECT_TEMPLATES,
+    BODY_TEMPLATE,
+    NOTES_TEMPLATE,
+    FOLLOW_UP_1_TEMPLATE,
+    FOLLOW_UP_2_TEMPLATE,
+    SUBJECT_EXPERIMENT,
+    EmailGenerator
+)
+
+# Fields that vary per row; everything else is fixed per business type
+ROW_FIELDS = ("greeting", "business_name", "city", "subject_variant")
+
+OUTPUT_TEMPLATES = {
+    "body": BODY_TEMPLATE,
+    "personalization_notes": NOTES_TEMPLATE,
+    "follow_up_1": FOLLOW_UP_1_TEMPLATE,
+    "follow_up_2": FOLLOW_UP_2_TEMPLATE
+}
+
+# A compiled template: (literal, row field or None) chunks
+Compiled = List[Tuple[str, str]]
+
+
+class _KeepRowFields(dict):
+    def __missing__(self, key):
+        if key not in ROW_FIELDS:
+            raise KeyError(key)
+        return "{" + key + "}"
+
+
+def compile_template(template: str, static: Dict) -> Compiled:
+    """Fill the static fields now and split the rest into (literal, field) chunks."""
+    partial = template.format_map(_KeepRowFields(static))
+    return [(literal, field) for literal, field, _, _ in Formatter().parse(partial)]
+
+
+def _render(compiled: Compiled, columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Concatenate the chunks over object arrays (one C-level loop per chunk)."""
+    out = None
+    for literal, field in compiled:
+        for part in (literal or None, columns[field] if field is not None else None):
+            if part is None:
+                continue
+            out = part if out is None else np.add(out, part)
+    return out
+
+
+class TemplateRenderer:
+    """Renders template emails for a DataFrame of retailers."""
+
+    def __init__(
+        self,
+        sender_name: str = "Alex",
+        sender_title: str = "Partnerships",
+        company: str = "Wingman Labs"
+    ):
+        sender = {"sender_name": sender_name, "sender_title": sender_title, "company": company}
+
+        # business_type -> {output column -> compiled template}
+        self.compiled: Dict[str, Dict[str, Compiled]] = {}
+        self.subjects: Dict[str, List[Compiled]] = {}
+        for business_type, template in EMAIL_TEMPLATES.items():
+            static = {"business_type": business_type, **template, **sender}
+            self.compiled[business_type] = {
+                column: compile_template(text, static) for column, text in OUTPUT_TEMPLATES.items()
+            }
+            self.subjects[business_type] = [compile_template(t, static) for t in SUBJECT_TEMPLATES]
+
+    def render(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Render subject, body, personalization_notes, both follow-ups and
+        the variant id.
+
+        Args:
+            df: One row per retailer; uses retailer_id, business_name,
+                business_type, city and contact_name (missing columns get
+                the per-row path's defaults)
+
+        Returns:
+            DataFrame with df's index and one column per email field
+        """
+        columns = self._row_columns(df)
+        business_type = columns["business_type"]
+        out = {column: np.empty(len(df), dtype=object) for column in ["subject", *OUTPUT_TEMPLATES]}
+
+        # Subject choice: same stable per-retailer variant as the per-row path
+        subject_index = np.fromiter(
+            (SUBJECT_EXPERIMENT.index(unit) for unit in columns["variant_unit"]),
+            dtype=np.int64,
+            count=len(df)
+        )
+        columns["subject_variant"] = np.array(SUBJECT_EXPERIMENT.variants, dtype=object)[subject_index]
+
+        for type_name in pd.unique(business_type):
+            positions = np.flatnonzero(business_type == type_name)
+            group = {name: column[positions] for name, column in columns.items()}
+
+            # Unknown business types get the c-store copy but keep their
+            # own name in the notes, like the per-row path
+            if type_name in self.compiled:
+                compiled, subjects = self.compiled[type_name], self.subjects[type_name]
+            else:
+                compiled = dict(self.compiled["c-store"])
+                compiled["personalization_notes"] = compile_template(
+                    NOTES_TEMPLATE, {"business_type": type_name, **EMAIL_TEMPLATES["c-store"]}
+                )
+                subjects = self.subjects["c-store"]
+
+            for column, template in compiled.items():
+                out[column][positions] = _render(template, group)
+
+            for i, template in enumerate(subjects):
+                chosen = subject_index[positions] == i
+                if chosen.any():
+                    out["subject"][positions[chosen]] = _render(
+                        template, {k: v[chosen] for k, v in group.items()}
+                    )
+
+        out["variant"] = np.add("template:", columns["subject_variant"])
+        return pd.DataFrame(out, index=df.index)
+
+    @staticmethod
+    def _row_columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Per-row fields, with EmailGenerator._build_context's defaults."""
+        def column(name: str, default: str) -> pd.Series:
+            if name not in df:
+                return pd.Series(default, index=df.index, dtype=object)
+            return df[name].astype(object).where(df[name].notna(), default)
+
+        contact = column("contact_name", "").astype(str)
+        first_name = contact.str.split().str[0]
+        named = first_name.notna().to_numpy()
+
+        greeting = np.full(len(df), "Hi there,", dtype=object)
+        greeting[named] = np.add(np.add("Hi ", first_name[named].to_numpy(object)), ",")
+
+        business_name = column("business_name", "your store").astype(str)
+        retailer_id = column("retailer_id", "").astype(str)
+
+        return {
+            "business_name": business_name.to_numpy(object),
+            "variant_unit": retailer_id.where(retailer_id != "", business_name).to_numpy(object),
+            "business_type": column("business_type", "c-store").astype(str).to_numpy(object),
+            "city": column("city", "your area").astype(str).to_numpy(object),
+            "greeting": greeting
+        }
+
+
+def benchmark(rows: int = 20000) -> Dict:
+    """Time the per-row path against the renderer on synthetic retailers."""
+    types = list(EMAIL_TEMPLATES) + ["grocery"]
+    retailers = [
+        {
+            "retailer_id": f"r{i}",
+            "business_name": f"Store {i}",
+            "business_type": types[i % len(types)],
+            "city": ["Los Angeles", "Pasadena", "Long Beach"][i % 3],
+            "contact_name": f"Owner {i} Smith" if i % 3 else None
+        }
+        for i in range(rows)
+    ]
+    df = pd.DataFrame(retailers)
+
+    generator = EmailGenerator()
+    generator.client = None  # template path even if an API key is set
+    start = time.perf_counter()
+    per_row = [generator.generate_email(r) for r in retailers]
+    per_row_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rendered = TemplateRenderer().render(df)
+    vectorized_seconds = time.perf_counter() - start
+
+    mismatches = sum(
+        1 for email, (_, row) in zip(per_row, rendered.iterrows())
+        if tuple(email.__dict__[column] for column in rendered.columns) != tuple(row)
+    )
+
+    return {
+        "rows": rows,
+        "per_row_seconds": round(per_row_seconds, 3),
+        "vectorized_seconds": round(vectorized_seconds, 3),
+        "speedup": round(per_row_seconds / vectorized_seconds, 1),
+        "mismatches": mismatches
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized template renderer")
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    result = benchmark(args.rows)
+    print(f"{result['rows']} retailers: per-row {result['per_row_seconds']}s, "
+          f"vectorized {result['vectorized_seconds']}s ({result['speedup']}x), "
+          f"{result['mismatches']} mismatches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Discovery Engine Tests
+
+Rate limiting and paging of concurrent Places searches, against a fake
+HTTP client that serves three pages per query:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discovery import AsyncDiscoveryEngine, TokenBucket
+from http_client import HttpClient
+from scraper import RetailerScraper
+
+PAGES_PER_QUERY = 3
+
+
+class FakeResponse:
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    def json(self) -> dict:
+        return self.data
+
+
+class FakePlacesHttp:
+    """Text Search endpoint with two places per page."""
+
+    def __init__(self):
+        self.metrics = HttpClient().metrics
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def post(self, url, headers=None, json=None):
+        with self._lock:
+            self.calls.append(time.monotonic())
+        query, page = json["textQuery"], int(json.get("pageToken", "0"))
+        data = {"places": [
+            {
+                "id": f"{query}-{page}-{i}",
+                "displayName": {"text": f"{query.title()} {page}{i}"},
+                "formattedAddress": f"{page}{i} Main St, Los Angeles, CA 90012, USA",
+                "location": {"latitude": 34.05, "longitude": -118.24}
+            }
+            for i in range(2)
+        ]}
+        if page < PAGES_PER_QUERY - 1:
+            data["nextPageToken"] = str(page + 1)
+        return FakeResponse(data)
+
+
+def searches(*queries: str, **kwargs) -> list:
+    return [
+        {"query": query, "lat": 34.05, "lng": -118.24, "radius": 4800, "business_type": "c-store", **kwargs}
+        for query in queries
+    ]
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_acquire_waits_for_tokens_beyond_the_burst(self):
+        async def take(count):
+            bucket = TokenBucket(rate=20, capacity=5)
+            start = time.monotonic()
+            for _ in range(count):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        self.assertLess(asyncio.run(take(5)), 0.05)
+        # 5 from the burst, then 10 more at 20 per second
+        self.assertGreaterEqual(asyncio.run(take(15)), 0.45)
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+class AsyncDiscoveryEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.http = FakePlacesHttp()
+        self.scraper = RetailerScraper("fake", http_client=self.http, max_pages=PAGES_PER_QUERY)
+
+    def test_every_results_page_takes_a_token(self):
+        engine = AsyncDiscoveryEngine(self.scraper, max_concurrency=8, requests_per_second=4, burst=1)
+        start = time.monotonic()
+        results = engine.run_searches(searches("liquor", "deli", "market"))
+
+        self.assertEqual([len(r) for r in results], [2 * PAGES_PER_QUERY] * 3)
+        self.assertEqual(len(self.http.calls), 3 * PAGES_PER_QUERY)
+        # 9 calls, one at once, 4 per second
+        self.assertGreaterEqual(time.monotonic() - start, 1.9)
+
+    def test_max_pages_caps_each_search(self):
+        engine = AsyncDiscoveryEngine(self.scraper, requests_per_second=100)
+        results = engine.run_searches(searches("liquor", max_pages=2))
+        self.assertEqual(len(results[0]), 4)
+        self.assertEqual(len(self.http.calls), 2)
+
+    def test_stop_skips_remaining_searches_and_pages(self):
+        stop = threading.Event()
+        engine = AsyncDiscoveryEngine(
+            self.scraper, max_concurrency=1, requests_per_second=100,
+            stop=stop, on_results=lambda retailers: stop.set()
+        )
+        results = engine.run_searches(searches("liquor", "deli", "market", max_pages=2))
+
+        self.assertEqual(len(results[0]), 4)
+        self.assertEqual(results[1:], [None, None])
+        # The other searches may have fetched a first page, but no more
+        self.assertLessEqual(len(self.http.calls), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Email Generator Tests
+
+Request shape and prompt caching, against the local Anthropic stub
+(stub_anthropic.py):
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_anthropic
+from email_generator import EmailGenerator, MIN_CACHEABLE_TOKENS
+
+# Conservative for English prose and JSON schemas, so passing this means
+# the real token count clears the minimum too
+MAX_CHARS_PER_TOKEN = 4.5
+
+RETAILERS = [
+    {"retailer_id": f"r{i}", "business_name": f"Corner Market {i}", "business_type": "c-store",
+     "city": "Los Angeles", "rating": 4.5, "review_count": 120, "contact_name": "Maria Lopez"}
+    for i in range(3)
+]
+
+
+def cached_prefix(request: dict) -> str:
+    """Tools plus system blocks up to the last cache breakpoint."""
+    blocks = request["system"]
+    last = max(i for i, block in enumerate(blocks) if block.get("cache_control"))
+    return json.dumps(request["tools"]) + "".join(block["text"] for block in blocks[:last + 1])
+
+
+class PromptCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = stub_anthropic.serve(port=0, batch_delay=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"ANTHROPIC_BASE_URL": f"http://127.0.0.1:{self.server.server_port}"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        stub_anthropic.CACHED_PREFIXES.clear()
+
+    def test_cached_prefix_passes_the_minimum(self):
+        generator = EmailGenerator(api_key="stub")
+        context = generator._build_context(RETAILERS[0])
+        leads = [{"lead_id": "0", "context": context}]
+        sender = {"sender_name": "Alex", "sender_title": "Partnerships", "company": "Wingman Labs"}
+
+        for request in (generator._build_ai_request(context, **sender),
+                        generator._build_group_request(leads, **sender)):
+            self.assertGreaterEqual(len(cached_prefix(request)) / MAX_CHARS_PER_TOKEN, MIN_CACHEABLE_TOKENS)
+            self.assertNotIn("Corner Market", cached_prefix(request))
+
+    def test_repeat_requests_read_the_prefix_from_cache(self):
+        generator = EmailGenerator(api_key="stub", max_concurrency=1)
+        generator.generate_many(RETAILERS)
+
+        self.assertEqual(generator.usage.requests, 3)
+        self.assertGreater(generator.usage.cache_creation_input_tokens, 0)
+        self.assertAlmostEqual(generator.usage.cache_hit_rate, 2 / 3, places=2)
+
+    def test_stub_does_not_cache_short_prefixes(self):
+        request = {
+            "system": [{"type": "text", "text": "Write short emails.", "cache_control": {"type": "ephemeral"}}],
+            "messages": [{"role": "user", "content": "Business Name: Corner Market"}]
+        }
+        for _ in range(2):
+            usage = stub_anthropic.canned_message(request)["usage"]
+            self.assertEqual(usage["cache_creation_input_tokens"], 0)
+            self.assertEqual(usage["cache_read_input_tokens"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
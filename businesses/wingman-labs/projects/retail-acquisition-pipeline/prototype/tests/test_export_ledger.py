@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Export Ledger Tests
+
+Which leads an incremental export lets through, across ledger reloads,
+compaction and retailer ids that differ between data dirs:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export_ledger import ExportLedger
+from storage import RecordStore
+
+
+def lead(retailer_id: str, place_id: str, body: str = "Hi Maria") -> dict:
+    return {
+        "retailer_id": retailer_id,
+        "google_place_id": place_id,
+        "business_name": f"Market {place_id}",
+        "contact_email": "maria@example.com",
+        "email": {"subject": "Wingman for your shelves", "body": body}
+    }
+
+
+class ExportLedgerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.path = f"{self.tmp.name}/export_ledger.jsonl"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def export(self, leads: list) -> list:
+        """Run leads through a freshly loaded ledger; returns the ids let through."""
+        ledger = ExportLedger(self.path)
+        passed = list(ledger.new_or_changed(leads))
+        ledger.record([(retailer, "instantly_import.csv") for retailer in passed])
+        return [retailer["retailer_id"] for retailer in passed]
+
+    def test_only_new_or_changed_leads_pass(self):
+        self.assertEqual(self.export([lead("r1", "p1"), lead("r2", "p2")]), ["r1", "r2"])
+        self.assertEqual(self.export([lead("r1", "p1"), lead("r2", "p2", body="Hi again")]), ["r2"])
+        self.assertEqual(self.export([lead("r1", "p1"), lead("r2", "p2", body="Hi again")]), [])
+
+        ledger = ExportLedger(self.path)
+        list(ledger.new_or_changed([lead("r1", "p1"), lead("r3", "p3")]))
+        self.assertEqual(ledger.skipped, 1)
+
+    def test_leads_without_an_email_are_not_filtered(self):
+        incomplete = {"retailer_id": "r1", "google_place_id": "p1"}
+        self.assertEqual(self.export([incomplete]), ["r1"])
+        self.assertEqual(self.export([incomplete]), ["r1"])
+
+    def test_same_store_under_another_retailer_id_is_skipped(self):
+        self.export([lead("r1", "p1")])
+        # e.g. a shard or a fresh data_dir that gave the store a new id
+        self.assertEqual(self.export([lead("shard-7", "p1")]), [])
+
+    def test_legacy_lines_keyed_by_retailer_id_still_match(self):
+        legacy = ExportLedger(self.path)
+        old = lead("r1", "p1")
+        RecordStore(self.path, key_field="lead_key").append("exported", {
+            "lead_key": "r1", "retailer_id": "r1", "content_hash": legacy.is_new(old)[1]
+        })
+        self.assertIn(old, ExportLedger(self.path))
+        self.assertEqual(self.export([old]), [])
+
+    def test_compact_keeps_one_line_per_lead(self):
+        self.export([lead("r1", "p1"), lead("r2", "p2")])
+        self.export([lead("r1", "p1", body="Hi again")])
+
+        before, after = ExportLedger(self.path).compact()
+        self.assertEqual((before, after), (3, 2))
+        self.assertEqual(self.export([lead("r1", "p1", body="Hi again"), lead("r2", "p2")]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
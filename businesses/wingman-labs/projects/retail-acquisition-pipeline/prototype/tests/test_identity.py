@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Identity Index Tests
+
+Matching a store seen again (by place id, phone, name + address or
+proximity) to the retailer_id it was first given:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from identity import RetailerIdentityIndex, primary_key
+
+STORE = {
+    "retailer_id": "r1",
+    "google_place_id": "place-1",
+    "business_name": "The Corner Market",
+    "address": "123 North Main Street, Los Angeles, CA",
+    "zip_code": "90012",
+    "phone": "(213) 555-0100",
+    "latitude": 34.0501,
+    "longitude": -118.2401
+}
+
+
+def sighting(retailer_id: str, **fields) -> dict:
+    """A later sighting of STORE with only the given fields."""
+    return {"retailer_id": retailer_id, **fields}
+
+
+class RetailerIdentityIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.index = RetailerIdentityIndex(f"{self.tmp.name}/identity.db")
+        self.assertEqual(self.index.resolve(STORE), ("r1", True))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_matches_on_any_identity_key(self):
+        sightings = [
+            sighting("r2", google_place_id="place-1", business_name="Other Name"),
+            sighting("r3", phone="+1 213-555-0100", business_name="Other Name"),
+            sighting("r4", business_name="Corner Market", address="123 N Main St, Los Angeles, CA",
+                     zip_code="90012"),
+            sighting("r5", business_name="corner market", latitude=34.05012, longitude=-118.24008)
+        ]
+        for retailer in sightings:
+            self.assertEqual(self.index.resolve(retailer), ("r1", False), retailer)
+        self.assertEqual(len(self.index), 1)
+
+    def test_different_stores_get_their_own_ids(self):
+        others = [
+            sighting("r2", google_place_id="place-2", business_name="Valley Liquor"),
+            sighting("r3", business_name="Corner Market", latitude=34.06, longitude=-118.24)
+        ]
+        self.assertEqual(self.index.resolve_many(others), [("r2", True), ("r3", True)])
+        self.assertEqual(len(self.index), 3)
+
+    def test_matches_persist_across_opens(self):
+        self.index.close()
+        self.index = RetailerIdentityIndex(f"{self.tmp.name}/identity.db")
+        self.assertEqual(self.index.resolve(sighting("r9", phone="2135550100")), ("r1", False))
+
+    def test_lookup_many_is_read_only(self):
+        key = primary_key(STORE)
+        self.assertEqual(key, "place:place-1")
+        self.assertEqual(self.index.lookup_many([key, "place:unknown"]), {key: "r1"})
+        self.assertEqual(len(self.index), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Incremental Discovery Tests
+
+Repeated incremental runs against a fake Places API (geocoding and
+search pages are patched out), checking that capped runs leave the rest
+of an area for the next run:
+
+    python -m unittest discover tests
+"""
+
+import io
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import RetailAcquisitionPipeline
+from scraper import RetailerScraper
+
+# Stores each query returns near any location
+STORES_PER_QUERY = 3
+
+
+def fake_place(query: str, index: int) -> dict:
+    slug = query.replace(" ", "-").replace("_", "-")
+    return {
+        "id": f"place-{slug}-{index}",
+        "displayName": {"text": f"{query.title()} Shop {index}"},
+        "formattedAddress": f"{100 + index} {slug.title()} St, Los Angeles, CA 90012, USA",
+        "location": {"latitude": 34.05 + index * 0.01, "longitude": -118.24}
+    }
+
+
+class FakePlaces:
+    """Stands in for the Places calls of every RetailerScraper."""
+
+    def __init__(self):
+        self.searches = 0
+
+    def geocode(self, scraper, location):
+        return 34.05, -118.24
+
+    def search_page(self, scraper, query, lat, lng, radius, business_type, page=0, page_token=None,
+                    rectangle=None, raise_on_error=False):
+        self.searches += 1
+        places = [fake_place(query, i) for i in range(STORES_PER_QUERY)]
+        return [scraper._parse_place(place, business_type) for place in places], None
+
+
+class CappedIncrementalRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.places = FakePlaces()
+        for name in ("_geocode", "search_page"):
+            patcher = mock.patch.object(
+                RetailerScraper, name, autospec=True,
+                side_effect=getattr(self.places, name.lstrip("_"))
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+        patcher = mock.patch.dict(os.environ, env, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.total = len(RetailerScraper("fake").query_plan()) * STORES_PER_QUERY
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_pipeline(self, streaming: bool) -> list:
+        pipeline = RetailAcquisitionPipeline(
+            google_api_key="fake", data_dir=self.tmp.name, incremental=True, requests_per_second=1000
+        )
+        with redirect_stdout(io.StringIO()):
+            if streaming:
+                results = pipeline.run_streaming_pipeline(["90012"], max_retailers=5)
+            else:
+                results = pipeline.run_full_pipeline(["90012"], max_retailers=5)
+        return [r['google_place_id'] for r in results["retailers"]]
+
+    def assert_capped_runs_cover_the_area(self, streaming: bool):
+        seen = []
+        for _ in range(self.total // 5 + 1):
+            found = self.run_pipeline(streaming)
+            self.assertTrue(found, f"a run found nothing after {len(seen)} of {self.total} stores")
+            self.assertLessEqual(len(found), 5)
+            seen += found
+            if len(set(seen)) == self.total:
+                break
+
+        self.assertEqual(len(seen), len(set(seen)), "a store was processed twice")
+        self.assertEqual(len(set(seen)), self.total)
+
+        # Everything emitted: every search is fresh, nothing is searched again
+        searches = self.places.searches
+        self.assertEqual(self.run_pipeline(streaming), [])
+        self.assertEqual(self.places.searches, searches)
+
+    def test_capped_batch_runs_cover_the_area(self):
+        self.assert_capped_runs_cover_the_area(streaming=False)
+
+    def test_capped_streaming_runs_cover_the_area(self):
+        self.assert_capped_runs_cover_the_area(streaming=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Run Resume Tests
+
+Demo-data runs against the local Anthropic stub (stub_anthropic.py),
+interrupted part way and resumed from their checkpoint:
+
+    python -m unittest discover tests
+"""
+
+import io
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_anthropic
+from batch_backend import MessageBatchBackend
+from checkpoint import read_manifest
+from email_generator import EmailGenerator
+from pipeline import RetailAcquisitionPipeline
+
+# Keys that would take the pipeline out of demo mode
+API_KEYS = ("GOOGLE_PLACES_API_KEY", "ANTHROPIC_API_KEY", "APOLLO_API_KEY", "HUNTER_API_KEY")
+
+
+class StubAnthropicCase(unittest.TestCase):
+    """Demo mode, with AI calls going to a local stub_anthropic server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = stub_anthropic.serve(port=0, batch_delay=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        env = {k: v for k, v in os.environ.items() if k not in API_KEYS}
+        env["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{self.server.server_port}"
+        patcher = mock.patch.dict(os.environ, env, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def quietly(self, func, *args, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return func(*args, **kwargs)
+
+
+class BatchResumeTest(StubAnthropicCase):
+
+    def interrupted_batch_run(self) -> str:
+        """A batch run that dies while waiting on its submitted batch."""
+        pipeline = RetailAcquisitionPipeline(
+            anthropic_api_key="stub", data_dir=self.tmp.name, llm_backend="batch", max_pages=2
+        )
+        with mock.patch.object(MessageBatchBackend, "wait", side_effect=RuntimeError("killed")):
+            with self.assertRaises(RuntimeError):
+                self.quietly(pipeline.run_full_pipeline, ["90012"])
+        return pipeline.run_id
+
+    def test_resumed_batch_run_polls_its_submitted_batch(self):
+        run_id = self.interrupted_batch_run()
+        manifest = read_manifest(self.tmp.name, run_id)
+        self.assertEqual(manifest["status"], "failed")
+        self.assertEqual(len(manifest["message_batches"]), 1)
+        batches_before = len(stub_anthropic.BATCHES)
+
+        pipeline = RetailAcquisitionPipeline.from_run(run_id, data_dir=self.tmp.name, anthropic_api_key="stub")
+        self.assertEqual(pipeline.llm_backend, "batch")
+        self.assertEqual(pipeline.options["max_pages"], 2)
+
+        with mock.patch.object(MessageBatchBackend, "submit") as submit:
+            results = self.quietly(pipeline.resume)
+
+        submit.assert_not_called()
+        self.assertEqual(len(stub_anthropic.BATCHES), batches_before)
+        self.assertEqual(results["stats"]["emails_generated"], 4)
+        self.assertEqual(read_manifest(self.tmp.name, run_id)["status"], "complete")
+
+    def test_resume_with_different_options_fails_fast(self):
+        run_id = self.interrupted_batch_run()
+
+        pipeline = RetailAcquisitionPipeline(anthropic_api_key="stub", data_dir=self.tmp.name, run_id=run_id)
+        with self.assertRaisesRegex(ValueError, "llm_backend='batch'"):
+            self.quietly(pipeline.resume)
+
+    def test_throughput_options_may_change_on_resume(self):
+        run_id = self.interrupted_batch_run()
+
+        pipeline = RetailAcquisitionPipeline.from_run(
+            run_id, data_dir=self.tmp.name, anthropic_api_key="stub", llm_concurrency=2
+        )
+        results = self.quietly(pipeline.resume)
+        self.assertEqual(results["stats"]["emails_generated"], 4)
+
+
+class StreamingResumeTest(StubAnthropicCase):
+
+    def test_partial_streaming_run_resumes_only_failed_retailers(self):
+        pipeline = RetailAcquisitionPipeline(anthropic_api_key="stub", data_dir=self.tmp.name, incremental=True)
+        enrich_one = pipeline._enrich_one
+
+        def flaky_enrich(retailer):
+            if retailer['retailer_id'] == "demo-002":
+                raise RuntimeError("provider down")
+            return enrich_one(retailer)
+
+        with mock.patch.object(pipeline, "_enrich_one", side_effect=flaky_enrich):
+            first = self.quietly(pipeline.run_streaming_pipeline, ["90012"])
+        self.assertEqual(first["stats"]["failed_records"], 1)
+        self.assertEqual(read_manifest(self.tmp.name, pipeline.run_id)["status"], "partial")
+
+        resumed = RetailAcquisitionPipeline.from_run(pipeline.run_id, data_dir=self.tmp.name, anthropic_api_key="stub")
+        self.assertIsNotNone(resumed.scrape_state)
+
+        generate = EmailGenerator.generate_with_backoff
+        with mock.patch.object(EmailGenerator, "generate_with_backoff", autospec=True,
+                               side_effect=generate) as generated:
+            results = self.quietly(resumed.resume)
+
+        # Only the retailer that failed is enriched and emailed again
+        self.assertEqual([c.args[1]['retailer_id'] for c in generated.call_args_list], ["demo-002"])
+        self.assertEqual(results["stats"]["retailers_scraped"], 5)
+        self.assertEqual(results["stats"]["failed_records"], 0)
+        self.assertEqual(read_manifest(self.tmp.name, pipeline.run_id)["status"], "complete")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Scrape State Tests
+
+When a search counts as fresh and which retailers incremental runs pass
+on, against the SQLite scrape state store:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import time
+import unittest
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from identity import primary_key
+from scrape_state import ScrapeStateStore
+
+
+def retailer(retailer_id: str, place_id: str, rating: float = 4.5) -> dict:
+    return {
+        "retailer_id": retailer_id,
+        "google_place_id": place_id,
+        "business_name": f"Market {place_id}",
+        "rating": rating,
+        "scraped_at": time.time()
+    }
+
+
+class ScrapeStateStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.state = ScrapeStateStore(f"{self.tmp.name}/scrape_state.db", freshness_hours=1)
+        self.found = [retailer("r1", "p1"), retailer("r2", "p2")]
+        self.stable_ids = {primary_key(r): r["retailer_id"] for r in self.found}
+        self.state.record_search("90012|3mi", "liquor store", self.found)
+
+    def tearDown(self):
+        self.state.close()
+        self.tmp.cleanup()
+
+    def test_search_is_fresh_only_once_all_its_retailers_were_emitted(self):
+        self.assertFalse(self.state.is_fresh("90012|3mi", "liquor store"))
+
+        # A capped run emitted one of the two
+        self.state.mark_emitted(self.found[:1])
+        self.assertEqual(self.state.mark_searches(self.state.pending_searches, self.stable_ids), 0)
+        self.assertFalse(self.state.is_fresh("90012|3mi", "liquor store"))
+
+        self.state.mark_emitted(self.found[1:])
+        self.assertEqual(self.state.mark_searches(self.state.pending_searches, self.stable_ids), 1)
+        self.assertTrue(self.state.is_fresh("90012|3mi", "liquor store"))
+        self.assertFalse(self.state.is_fresh("90028|3mi", "liquor store"))
+
+    def test_search_stays_stale_if_content_changed_before_emit(self):
+        self.state.mark_emitted([self.found[0], retailer("r2", "p2", rating=3.0)])
+        self.assertEqual(self.state.mark_searches(self.state.pending_searches, self.stable_ids), 0)
+
+    def test_freshness_window_expires(self):
+        self.state.mark_emitted(self.found)
+        search = dict(self.state.pending_searches[0], scraped_at=time.time() - 2 * 3600)
+        self.state.mark_searches([search], self.stable_ids)
+        self.assertFalse(self.state.is_fresh("90012|3mi", "liquor store"))
+
+    def test_changed_ignores_volatile_fields(self):
+        self.state.mark_emitted(self.found)
+        rescraped = [retailer("r1", "p1"), retailer("r2", "p2", rating=4.0), retailer("r3", "p3")]
+        rescraped[0]["scraped_at"] = time.time() + 60
+        rescraped[0]["contact_email"] = "maria@example.com"
+
+        self.assertEqual([r["retailer_id"] for r in self.state.changed(rescraped)], ["r2", "r3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Sharded Runner Tests
+
+Location partitioning, the merge reducer and demo-data sharded runs
+(shards in spawned worker processes):
+
+    python -m unittest discover tests
+"""
+
+import io
+import os
+import sys
+import glob
+import unittest
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharded_runner import ShardedRunner, merge_records, partition, shard_of
+
+
+class PartitionTest(unittest.TestCase):
+
+    def test_locations_land_on_the_same_shard_every_time(self):
+        locations = [f"9{i:04d}" for i in range(200)]
+        shards = partition(locations + ["90012", " 90012 "], 4)
+
+        self.assertEqual(sorted(sum(shards, [])), sorted(set(locations + [" 90012 "])))
+        self.assertTrue(all(shards))
+        for index, shard in enumerate(shards):
+            self.assertTrue(all(shard_of(location, 4) == index for location in shard))
+        self.assertEqual(shard_of("Los Angeles", 4), shard_of("  los angeles ", 4))
+
+
+class MergeRecordsTest(unittest.TestCase):
+
+    def test_most_complete_sighting_of_a_store_wins(self):
+        bare = {"retailer_id": "s1-r1", "google_place_id": "p1", "business_name": "Corner Market"}
+        emailed = dict(bare, retailer_id="s2-r9", contact_email="maria@example.com", email={"body": "Hi"})
+        other = {"retailer_id": "s1-r2", "google_place_id": "p2", "business_name": "Valley Liquor"}
+
+        for records in ([bare, emailed, other], [other, emailed, bare]):
+            self.assertEqual(merge_records(records), [other, emailed])
+
+
+class ShardedRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+        patcher = mock.patch.dict(os.environ, env, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sharded_run(self) -> dict:
+        runner = ShardedRunner(data_dir=self.tmp.name, num_shards=2, processes=2)
+        with redirect_stdout(io.StringIO()):
+            return runner.run(["90012", "90028", "91423", "94110"])
+
+    def test_shards_share_the_data_dir_stores(self):
+        first = self.sharded_run()
+        second = self.sharded_run()
+
+        # Caches and indexes live once in data_dir, not per run or shard
+        self.assertEqual(glob.glob(f"{self.tmp.name}/sharded/**/*.db", recursive=True), [])
+        self.assertTrue(os.path.exists(f"{self.tmp.name}/identity.db"))
+        self.assertTrue(os.path.exists(f"{self.tmp.name}/email_cache.db"))
+
+        # Shard runs and logs stay under their sharded run
+        shard = first["shards"][0]["shard"]
+        run_dir = f"{self.tmp.name}/sharded/{first['run_id']}/{shard}"
+        self.assertTrue(os.path.exists(f"{run_dir}/shard.log"))
+        self.assertTrue(os.path.isdir(f"{run_dir}/runs/{first['shards'][0]['run_id']}"))
+
+        # The shared export ledger carries over to the next sharded run
+        self.assertEqual(first["merged"]["ready_for_outreach"], 4)
+        self.assertEqual(second["merged"]["ready_for_outreach"], 0)
+        self.assertEqual(second["merged"]["already_exported"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Website Contact Crawler Tests
+
+Crawls a small site served by http.server on localhost, so fetching,
+caching, revalidation and politeness are exercised end to end:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from site_crawler import PageCache, SiteContacts, SiteCrawler, WebsiteProvider, normalize_url, on_site_domain
+
+PAGES = {
+    "/": """<html><body>
+        <h1>Corner Market</h1>
+        <a href="/contact">Contact us</a>
+        <a href="/about-us">Our story</a>
+        <a href="/products">Products</a>
+    </body></html>""",
+    "/contact": """<html><body>
+        <p>Email <a href="mailto:maria@cornermarket.com">maria@cornermarket.com</a>
+        or call (213) 555-0142.</p>
+    </body></html>""",
+    "/about-us": """<html><body><p>Owner: Maria Lopez</p></body></html>"""
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves PAGES with ETags and records each request's path."""
+
+    requests = []
+
+    def do_GET(self):
+        FixtureHandler.requests.append(self.path)
+        body = PAGES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        etag = f'"{hash(body) & 0xffffffff:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SiteCrawlerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        cls.site = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FixtureHandler.requests = []
+        self.tmp = TemporaryDirectory()
+        self.cache = PageCache(f"{self.tmp.name}/page_cache.db")
+        self.crawlers = []
+
+    def tearDown(self):
+        for crawler in self.crawlers:
+            crawler.close()
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def crawler(self, **options) -> SiteCrawler:
+        options.setdefault("per_domain_delay", 0)
+        crawler = SiteCrawler(cache=self.cache, **options)
+        self.crawlers.append(crawler)
+        return crawler
+
+    def test_extracts_contacts_from_linked_pages(self):
+        found = self.crawler().crawl_many([{"retailer_id": "r1", "website": self.site}])
+
+        contacts = found["r1"]
+        self.assertEqual(contacts.emails, ["maria@cornermarket.com"])
+        self.assertEqual(contacts.phones, ["(213) 555-0142"])
+        self.assertEqual(contacts.owner_names, ["Maria Lopez"])
+        self.assertEqual(contacts.pages_fetched, 3)
+        self.assertNotIn("/products", FixtureHandler.requests)
+
+    def test_fresh_cache_skips_requests_and_politeness_delay(self):
+        self.crawler().crawl_many([{"retailer_id": "r1", "website": self.site}])
+        FixtureHandler.requests = []
+
+        crawler = self.crawler(per_domain_delay=5)
+        start = time.monotonic()
+        found = crawler.crawl_many([{"retailer_id": "r1", "website": self.site}])
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(FixtureHandler.requests, [])
+        self.assertEqual(crawler.stats["cached"], 3)
+        self.assertEqual(found["r1"].emails, ["maria@cornermarket.com"])
+
+    def test_stale_cache_revalidates_with_etag(self):
+        self.crawler().crawl_many([{"retailer_id": "r1", "website": self.site}])
+
+        crawler = self.crawler(max_age_hours=0)
+        found = crawler.crawl_many([{"retailer_id": "r1", "website": self.site}])
+
+        self.assertEqual(crawler.stats["not_modified"], 3)
+        self.assertEqual(crawler.stats["fetched"], 0)
+        self.assertEqual(found["r1"].owner_names, ["Maria Lopez"])
+
+    def test_per_domain_delay_spaces_requests(self):
+        crawler = self.crawler(per_domain_delay=0.2)
+        start = time.monotonic()
+        crawler.crawl_many([{"retailer_id": "r1", "website": self.site}])
+
+        # Homepage, then two linked pages one delay apart each
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+
+    def test_retailers_sharing_a_site_are_crawled_once(self):
+        host = self.site.split("://", 1)[1]
+        retailers = [
+            {"retailer_id": "r1", "website": self.site},
+            {"retailer_id": "r2", "website": f"{self.site.upper()}/"},
+            {"retailer_id": "r3", "website": host}
+        ]
+        found = self.crawler().crawl_many(retailers)
+
+        self.assertEqual(FixtureHandler.requests.count("/"), 1)
+        self.assertEqual(set(found), {"r1", "r2", "r3"})
+        self.assertIs(found["r1"], found["r3"])
+
+    def test_crawl_from_many_threads_shares_one_loop(self):
+        # Streaming enrich workers call crawl() concurrently
+        crawler = self.crawler(max_concurrency=2, per_domain_delay=0.05)
+        retailers = [{"retailer_id": f"r{i}", "website": self.site} for i in range(8)]
+
+        pool = ThreadPoolExecutor(max_workers=8)
+        try:
+            found = list(pool.map(crawler.crawl, retailers, timeout=20))
+        finally:
+            pool.shutdown(wait=False)
+
+        self.assertEqual([c.emails for c in found], [["maria@cornermarket.com"]] * 8)
+        self.assertEqual(crawler.stats["failed"], 0)
+        # The page cache dedupes refetches only once a fetch completes;
+        # domain politeness still serializes whatever does go out
+        self.assertLessEqual(FixtureHandler.requests.count("/"), 8)
+
+    def test_close_then_crawl_again(self):
+        crawler = self.crawler(max_age_hours=0)
+        crawler.crawl_many([{"retailer_id": "r1", "website": self.site}])
+        crawler.close()
+
+        found = crawler.crawl_many([{"retailer_id": "r2", "website": self.site}])
+        self.assertEqual(found["r2"].owner_names, ["Maria Lopez"])
+
+    def test_unreachable_site_yields_no_contacts(self):
+        crawler = self.crawler()
+        crawler.http.max_retries = 0
+        found = crawler.crawl_many([{"retailer_id": "r1", "website": "http://127.0.0.1:9"}])
+
+        self.assertEqual(found["r1"].emails, [])
+        self.assertEqual(crawler.stats["failed"], 1)
+
+
+class DomainMatchTest(unittest.TestCase):
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url("Shop.com"), "http://shop.com/")
+        self.assertEqual(normalize_url("https://SHOP.com/store/#top"), "https://shop.com/store")
+
+    def test_on_site_domain_uses_dot_boundary(self):
+        self.assertTrue(on_site_domain("shop.com", "shop.com"))
+        self.assertTrue(on_site_domain("mail.shop.com", "shop.com"))
+        self.assertFalse(on_site_domain("notshop.com", "shop.com"))
+        self.assertFalse(on_site_domain("shop.com", None))
+
+    def test_provider_confidence_depends_on_domain(self):
+        def confidence(url: str, email: str) -> float:
+            crawler = SiteCrawler(cache=None)
+            crawler.results["r1"] = SiteContacts(url=url, emails=[email])
+            return WebsiteProvider(crawler).lookup({"retailer_id": "r1"})["confidence"]
+
+        self.assertEqual(confidence("http://shop.com", "hello@shop.com"), 0.6)
+        self.assertEqual(confidence("http://shop.com", "hello@notshop.com"), 0.4)
+        self.assertEqual(confidence("http://", "hello@shop.com"), 0.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Record Store and Checkpoint Tests
+
+The append-only record store and the per-run checkpoint built on it,
+including what a resumed run reads back:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import RecordStore
+from checkpoint import RunCheckpoint, read_manifest
+
+
+class RecordStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.path = f"{self.tmp.name}/retailers.jsonl"
+        self.store = RecordStore(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fill(self):
+        self.store.append_many("discover", [
+            {"retailer_id": "r1", "business_name": "Corner Market"},
+            {"retailer_id": "r2", "business_name": "Valley Liquor"}
+        ])
+        self.store.append("enrich", {"retailer_id": "r1", "contact_email": "maria@example.com"})
+        self.store.append("discover", {"retailer_id": "r1", "business_name": "Corner Market & Deli"})
+
+    def test_later_entries_override_earlier_fields(self):
+        self.fill()
+        self.assertEqual(self.store.get("r1"), {
+            "retailer_id": "r1", "business_name": "Corner Market & Deli", "contact_email": "maria@example.com"
+        })
+        self.assertIsNone(self.store.get("r3"))
+        self.assertEqual(dict(self.store.iter_latest()), self.store.latest())
+        self.assertEqual([key for key, _ in self.store.iter_latest()], ["r1", "r2"])
+
+    def test_get_sees_lines_written_by_another_store(self):
+        self.fill()
+        self.assertIsNone(self.store.get("r3"))
+        RecordStore(self.path).append("discover", {"retailer_id": "r3", "business_name": "Mini Mart"})
+        self.assertEqual(self.store.get("r3")["business_name"], "Mini Mart")
+
+    def test_compact_keeps_records_and_stages(self):
+        self.fill()
+        latest = self.store.latest()
+        self.store.compact()
+
+        self.assertEqual(sum(1 for _ in self.store.iter_entries()), 2)
+        self.assertEqual(self.store.latest(), latest)
+        self.assertEqual(self.store.completed("enrich"), {"r1"})
+        self.assertEqual(self.store.completed("discover"), {"r1", "r2"})
+
+        # Appends after a compaction are indexed from the new file
+        self.store.append("enrich", {"retailer_id": "r2", "contact_email": "sam@example.com"})
+        self.assertEqual(self.store.get("r2")["contact_email"], "sam@example.com")
+
+    def test_torn_final_line_is_ignored(self):
+        self.fill()
+        with open(self.path, 'a') as f:
+            f.write('{"key": "r2", "stage": "enrich", "da')
+
+        self.assertEqual(self.store.completed("enrich"), {"r1"})
+        self.assertNotIn("contact_email", self.store.get("r2"))
+
+
+class RunCheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resumed_checkpoint_reads_back_run_state(self):
+        checkpoint = RunCheckpoint(self.tmp.name)
+        checkpoint.start("batch", {"locations": ["90012"]}, {"max_pages": 2})
+        checkpoint.store.append_many("discover", [
+            {"retailer_id": "r1", "business_name": "Corner Market"},
+            {"retailer_id": "r2", "business_name": "Valley Liquor"}
+        ])
+        checkpoint.store.append("enrich", {"retailer_id": "r2", "contact_email": "sam@example.com"})
+        checkpoint.complete_stage("discover")
+        checkpoint.finish("failed")
+
+        resumed = RunCheckpoint(self.tmp.name, checkpoint.run_id)
+        self.assertTrue(resumed.exists)
+        self.assertTrue(resumed.stage_completed("discover"))
+        self.assertFalse(resumed.stage_completed("enrich"))
+        self.assertTrue(resumed.is_done("enrich", "r2"))
+        self.assertFalse(resumed.is_done("enrich", "r1"))
+        self.assertEqual([r["retailer_id"] for r in resumed.discovered()], ["r1", "r2"])
+        self.assertEqual(resumed.record("r2")["contact_email"], "sam@example.com")
+
+        resumed.start("batch", {"locations": ["91423"]}, {"max_pages": 3})
+        manifest = read_manifest(self.tmp.name, checkpoint.run_id)
+        self.assertEqual(manifest["attempts"], 2)
+        self.assertEqual(manifest["status"], "running")
+        self.assertEqual(manifest["args"], {"locations": ["90012"]})
+        self.assertEqual(manifest["options"], {"max_pages": 2})
+
+    def test_unknown_run_has_no_manifest(self):
+        self.assertEqual(read_manifest(self.tmp.name, "no-such-run"), {})
+        self.assertFalse(RunCheckpoint(self.tmp.name, "no-such-run").exists)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Variant Assignment Tests
+
+Stable, weighted A/B assignment, including across processes with
+different string hash seeds:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import subprocess
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from variants import VariantAssigner
+
+PROTOTYPE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UNITS = [f"retailer-{i}" for i in range(4000)]
+
+
+class VariantAssignerTest(unittest.TestCase):
+
+    def test_assignment_is_stable_across_processes(self):
+        script = (
+            "from variants import VariantAssigner\n"
+            "a = VariantAssigner('subject', ['subject-0', 'subject-1'])\n"
+            "print(','.join(a.assign(f'retailer-{i}') for i in range(50)))\n"
+        )
+        outputs = {
+            subprocess.run(
+                [sys.executable, "-c", script], cwd=PROTOTYPE_DIR, capture_output=True, text=True, check=True,
+                env={**os.environ, "PYTHONHASHSEED": seed}
+            ).stdout
+            for seed in ("1", "2")
+        }
+        assigner = VariantAssigner("subject", ["subject-0", "subject-1"])
+        self.assertEqual(outputs, {",".join(assigner.assign(f"retailer-{i}") for i in range(50)) + "\n"})
+
+    def test_weights_set_each_variants_share(self):
+        groups = VariantAssigner("subject", ["a", "b", "c"], weights=[2, 1, 1]).split(UNITS)
+        self.assertEqual(sum(len(units) for units in groups.values()), len(UNITS))
+        self.assertAlmostEqual(len(groups["a"]) / len(UNITS), 0.5, delta=0.03)
+        self.assertAlmostEqual(len(groups["b"]) / len(UNITS), 0.25, delta=0.03)
+
+        self.assertEqual(VariantAssigner("subject", ["a", "b"], weights=[0, 1]).split(UNITS)["a"], [])
+
+    def test_experiments_and_salts_hash_independently(self):
+        subject = VariantAssigner("subject", ["a", "b"])
+        others = [VariantAssigner("body", ["a", "b"]), VariantAssigner("subject", ["a", "b"], salt="v2")]
+        for other in others:
+            same = sum(subject.assign(u) == other.assign(u) for u in UNITS)
+            self.assertAlmostEqual(same / len(UNITS), 0.5, delta=0.05)
+
+    def test_invalid_variants_are_rejected(self):
+        for variants, weights in (([], None), (["a", "b"], [1]), (["a", "b"], [1, -1]), (["a"], [0])):
+            with self.assertRaises(ValueError):
+                VariantAssigner("subject", variants, weights)
+
+
+if __name__ == "__main__":
+    unittest.main()
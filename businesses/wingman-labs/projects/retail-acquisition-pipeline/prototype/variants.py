@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Variant Assignment
+
+Deterministic A/B assignment. A unit (normally a retailer_id) is hashed
+with sha256 together with the experiment name and a salt, so it lands in
+the same variant in every process and on every run, independently of
+Python's per-process string hash randomization (PYTHONHASHSEED).
+Different experiments hash independently of each other.
+"""
+
+import hashlib
+from typing import Dict, List, Optional, Sequence
+
+# Resolution of bucket(): 2^52 fits exactly in a float
+_BUCKET_BITS = 52
+
+
+def stable_bucket(experiment: str, unit_id: str, salt: str = "") -> float:
+    """Uniform, stable value in [0, 1) for a unit within an experiment."""
+    digest = hashlib.sha256(f"{experiment}:{salt}:{unit_id}".encode()).digest()
+    return (int.from_bytes(digest[:8], "big") >> (64 - _BUCKET_BITS)) / (1 << _BUCKET_BITS)
+
+
+class VariantAssigner:
+    """
+    Assigns units to an experiment's variants.
+
+    Variants are ids (e.g. "subject-0"), optionally weighted; changing
+    the salt reshuffles every unit, which starts a fresh experiment.
+    """
+
+    def __init__(
+        self,
+        experiment: str,
+        variants: Sequence[str],
+        weights: Optional[Sequence[float]] = None,
+        salt: str = ""
+    ):
+        if not variants:
+            raise ValueError("An experiment needs at least one variant")
+        weights = list(weights) if weights else [1.0] * len(variants)
+        if len(weights) != len(variants) or any(w < 0 for w in weights) or not sum(weights):
+            raise ValueError("Need one non-negative weight per variant")
+
+        self.experiment = experiment
+        self.variants: List[str] = list(variants)
+        self.salt = salt
+
+        # Cumulative upper bounds of each variant's share of [0, 1)
+        total = float(sum(weights))
+        self._bounds = []
+        running = 0.0
+        for w in weights:
+            running += w / total
+            self._bounds.append(running)
+
+    def bucket(self, unit_id: str) -> float:
+        return stable_bucket(self.experiment, str(unit_id), self.salt)
+
+    def index(self, unit_id: str) -> int:
+        """Position of the unit's variant in self.variants."""
+        bucket = self.bucket(unit_id)
+        for i, bound in enumerate(self._bounds):
+            if bucket < bound:
+                return i
+        return len(self.variants) - 1
+
+    def assign(self, unit_id: str) -> str:
+        """The unit's variant id."""
+        return self.variants[self.index(unit_id)]
+
+    def split(self, unit_ids: Sequence[str]) -> Dict[str, List[str]]:
+        """Units grouped by variant id (for reporting an experiment)."""
+        groups: Dict[str, List[str]] = {v: [] for v in self.variants}
+        for unit_id in unit_ids:
+            groups[self.assign(unit_id)].append(unit_id)
+        return groups
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Wingman Labs Retail Acquisition Pipeline
+Lead Warehouse
+
+Indexed SQLite (WAL) database holding the latest state of every lead
+across runs: retailer, contact, generated email and export history, one
+table each, keyed by retailer_id. The pipeline writes to it alongside
+each run's JSONL log with bulk upserts, so questions like "liquor stores
+in 90028 that haven't been emailed" are an index lookup instead of a
+scan over every run's records:
+
+    python warehouse.py --business-type liquor --zip 90028
+    python warehouse.py --import data/runs/*/retailers.jsonl   # backfill
+"""
+
+import json
+import time
+import argparse
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from db import SQLiteStore
+from storage import RecordStore, entry_stages
+
+RETAILER_COLUMNS = [
+    "business_name", "business_type", "address", "city", "state", "zip_code",
+    "phone", "website", "google_place_id", "rating", "review_count",
+    "latitude", "longitude", "source", "scraped_at"
+]
+
+# contacts column -> pipeline record field
+CONTACT_FIELDS = {
+    "name": "contact_name",
+    "email": "contact_email",
+    "phone": "contact_phone",
+    "title": "contact_title",
+    "source": "enrichment_source",
+    "confidence": "enrichment_confidence",
+    "status": "enrichment_status"
+}
+
+EMAIL_COLUMNS = ["subject", "body", "follow_up_1", "follow_up_2", "personalization_notes", "variant"]
+
+
+def _upsert_sql(table: str, columns: List[str]) -> str:
+    """INSERT ... ON CONFLICT(retailer_id) DO UPDATE for every column."""
+    return (
+        f"INSERT INTO {table} (retailer_id, {', '.join(columns)}, updated_at) "
+        f"VALUES ({', '.join('?' * (len(columns) + 2))}) "
+        f"ON CONFLICT(retailer_id) DO UPDATE SET "
+        + ", ".join(f"{c} = excluded.{c}" for c in columns + ["updated_at"])
+    )
+
+
+class LeadWarehouse(SQLiteStore):
+    """Latest retailer/contact/email/export state per retailer_id."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS retailers (
+            retailer_id TEXT PRIMARY KEY,
+            business_name TEXT,
+            business_type TEXT,
+            address TEXT,
+            city TEXT,
+            state TEXT,
+            zip_code TEXT,
+            phone TEXT,
+            website TEXT,
+            google_place_id TEXT,
+            rating REAL,
+            review_count INTEGER,
+            latitude REAL,
+            longitude REAL,
+            source TEXT,
+            scraped_at TEXT,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS retailers_type_zip ON retailers (business_type, zip_code);
+        CREATE INDEX IF NOT EXISTS retailers_zip ON retailers (zip_code);
+        CREATE INDEX IF NOT EXISTS retailers_city ON retailers (city, business_type);
+
+        CREATE TABLE IF NOT EXISTS contacts (
+            retailer_id TEXT PRIMARY KEY,
+            name TEXT,
+            email TEXT,
+            phone TEXT,
+            title TEXT,
+            source TEXT,
+            confidence REAL,
+            status TEXT,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS contacts_email ON contacts (email);
+
+        CREATE TABLE IF NOT EXISTS emails (
+            retailer_id TEXT PRIMARY KEY,
+            subject TEXT,
+            body TEXT,
+            follow_up_1 TEXT,
+            follow_up_2 TEXT,
+            personalization_notes TEXT,
+            variant TEXT,
+            updated_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS exports (
+            retailer_id TEXT NOT NULL,
+            export_file TEXT NOT NULL,
+            exported_at TEXT NOT NULL,
+            PRIMARY KEY (retailer_id, export_file)
+        );
+    """
+
+    def upsert_retailers(self, retailers: Iterable[Dict]) -> int:
+        """Insert or update discovered retailers in one transaction."""
+        now = datetime.utcnow().isoformat()
+        rows = [
+            (r['retailer_id'], *(r.get(c) for c in RETAILER_COLUMNS), now)
+            for r in retailers
+        ]
+        return self._executemany(_upsert_sql("retailers", RETAILER_COLUMNS), rows)
+
+    def upsert_contacts(self, records: Iterable[Dict]) -> int:
+        """Insert or update enrichment results (pipeline contact_* fields)."""
+        now = datetime.utcnow().isoformat()
+        rows = [
+            (r['retailer_id'], *(r.get(f) for f in CONTACT_FIELDS.values()), now)
+            for r in records
+        ]
+        return self._executemany(_upsert_sql("contacts", list(CONTACT_FIELDS)), rows)
+
+    def upsert_emails(self, records: Iterable[Dict]) -> int:
+        """Insert or update generated emails (pipeline personalize fields)."""
+        now = datetime.utcnow().isoformat()
+        rows = []
+        for r in records:
+            email = r.get('email') or {}
+            rows.append((
+                r['retailer_id'],
+                email.get('subject'),
+                email.get('body'),
+                email.get('follow_up_1'),
+                email.get('follow_up_2'),
+                r.get('personalization_notes'),
+                r.get('email_variant'),
+                now
+            ))
+        return self._executemany(_upsert_sql("emails", EMAIL_COLUMNS), rows)
+
+    def mark_exported(self, retailer_ids: Iterable[str], export_file: str) -> int:
+        """Record that these retailers were written to an outreach import file."""
+        now = datetime.utcnow().isoformat()
+        return self._executemany(
+            "INSERT OR REPLACE INTO exports (retailer_id, export_file, exported_at) VALUES (?, ?, ?)",
+            [(retailer_id, export_file, now) for retailer_id in retailer_ids]
+        )
+
+    def record(self, stage: str, records: List[Dict]):
+        """Upsert one pipeline stage's records (discover, enrich or personalize)."""
+        if stage == "discover":
+            self.upsert_retailers(records)
+        elif stage == "enrich":
+            self.upsert_contacts(records)
+        elif stage == "personalize":
+            self.upsert_emails(records)
+
+    def unemailed(
+        self,
+        business_type: Optional[str] = None,
+        zip_code: Optional[str] = None,
+        city: Optional[str] = None,
+        ready_only: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Retailers with a contact email that were never exported for
+        outreach, optionally filtered (each filter uses an index).
+
+        ready_only: only leads that already have a generated email
+        """
+        where = ["c.email IS NOT NULL", "NOT EXISTS (SELECT 1 FROM exports x WHERE x.retailer_id = r.retailer_id)"]
+        params: List = []
+        for column, value in (("business_type", business_type), ("zip_code", zip_code), ("city", city)):
+            if value is not None:
+                where.append(f"r.{column} = ?")
+                params.append(value)
+        if ready_only:
+            where.append("e.subject IS NOT NULL")
+
+        sql = (
+            "SELECT r.retailer_id, r.business_name, r.business_type, r.city, r.zip_code, "
+            "c.name, c.email, c.confidence, e.subject IS NOT NULL "
+            "FROM retailers r JOIN contacts c USING (retailer_id) "
+            "LEFT JOIN emails e USING (retailer_id) "
+            f"WHERE {' AND '.join(where)} ORDER BY r.retailer_id"
+        )
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        keys = ["retailer_id", "business_name", "business_type", "city", "zip_code",
+                "contact_name", "contact_email", "enrichment_confidence", "has_email"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("retailers", "contacts", "emails", "exports")
+            }
+
+    def import_store(self, store: RecordStore) -> int:
+        """Backfill from a run's JSONL log; returns the retailers imported."""
+        by_stage: Dict[str, List[Dict]] = {}
+        for entry in store.iter_entries():
+            stages = entry_stages(entry)
+            if stages == ["compacted"]:
+                # Compacted before lines kept their stages
+                stages = ["discover", "enrich", "personalize"]
+            for stage in stages:
+                by_stage.setdefault(stage, []).append(entry["data"])
+
+        # Compacted lines carry every stage's fields; skip stages they hadn't reached
+        self.upsert_retailers(r for r in by_stage.get("discover", []) if r.get('business_name'))
+        self.upsert_contacts(r for r in by_stage.get("enrich", []) if 'contact_email' in r)
+        self.upsert_emails(r for r in by_stage.get("personalize", []) if r.get('email'))
+        return len(by_stage.get("discover", []))
+
+    def _executemany(self, sql: str, rows: List[tuple]) -> int:
+        with self._lock:
+            self._conn.executemany(sql, rows)
+            self._conn.commit()
+        return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query or backfill the lead warehouse")
+    parser.add_argument("--data-dir", default="data", help="Data directory")
+    parser.add_argument("--business-type", help="e.g. liquor, c-store, vape")
+    parser.add_argument("--zip", dest="zip_code", help="Zip code")
+    parser.add_argument("--city", help="City")
+    parser.add_argument("--ready-only", action="store_true", help="Only leads with a generated email")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--import", dest="import_paths", nargs="+", metavar="JSONL",
+                        help="Backfill from run logs (data/runs/*/retailers.jsonl)")
+    args = parser.parse_args()
+
+    warehouse = LeadWarehouse(f"{args.data_dir}/warehouse.db")
+
+    if args.import_paths:
+        for path in args.import_paths:
+            print(f"Imported {warehouse.import_store(RecordStore(path))} retailers from {path}")
+        print(json.dumps(warehouse.counts()))
+        return
+
+    start = time.perf_counter()
+    leads = warehouse.unemailed(args.business_type, args.zip_code, args.city, args.ready_only, args.limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for lead in leads:
+        print(f"{lead['retailer_id']}  {lead['business_type'] or '':<12} {lead['zip_code'] or '':<6} "
+              f"{lead['business_name']}  <{lead['contact_email']}>{'' if lead['has_email'] else '  (no email yet)'}")
+    print(f"{len(leads)} leads not yet emailed ({elapsed_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()